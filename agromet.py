@@ -0,0 +1,258 @@
+#-------------------------------------------------------------------------------
+# Name:         agromet
+# Purpose:      Cliente de la API de Agromet (INIA). Consulta las muestras de las
+#               estaciones meteorológicas en paralelo a través de http_client (sesión
+#               keep-alive, timeout, reintentos y circuit breaker), con límite de concurrencia.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import constants as const
+import contextvars
+import threading
+import time
+import json
+import re
+import os
+import logs
+import spans
+import http_client
+
+#-------------------------------------------------------------------------------
+# Configuracion AGROMET
+#-------------------------------------------------------------------------------
+url_agromet = const.URL_API_AGROMET
+userkey_agromet = const.USERKEY_AGROMET
+
+FORMATO_VENTANA = '%Y-%m-%d %H:%M'
+
+# Variables consultadas por estación (el id de cada una se guarda en el campo 'id_' + variable)
+VARIABLES = (
+    'direccion_viento',
+    'humedad_media',
+    'temperatura_media',
+    'velocidad_viento_max',
+    'velocidad_viento_media',
+)
+
+_lock = threading.RLock()
+_estado = None
+_estadisticas = {'peticiones': 0, 'bytes': 0, 'parse_s': 0.0}
+
+# Objeto JSON sin llaves anidadas (una muestra)
+_patron_muestra = re.compile(rb'\{[^{}]*\}')
+
+
+def get_response(url, params, stream=False):
+    """Realiza un GET a la API con timeout y reintentos (http_client). Retorna None si falla."""
+    return http_client.get(url, params, stream=stream, timeout=const.AGROMET_TIMEOUT, reintentos=const.AGROMET_REINTENTOS)
+
+
+def get_json(url, params):
+    """Realiza un GET a la API y retorna la respuesta en JSON, None si falla."""
+    response = get_response(url, params)
+    if response is None:
+        return None
+    return response.json()
+
+
+def leer_ultima_muestra(chunks):
+    """
+    Lee la respuesta de /muestras por partes y retorna (última muestra, bytes leídos,
+    segundos de lectura) sin construir la lista completa. Las muestras son objetos planos,
+    por lo que basta con ubicar el último objeto sin llaves anidadas de la respuesta.
+    """
+    ultima = None
+    pendiente = b''
+    leidos = 0
+    duracion = 0.0
+    for chunk in chunks:
+        inicio = time.perf_counter()
+        leidos += len(chunk)
+        pendiente += chunk
+        fin = 0
+        for m in _patron_muestra.finditer(pendiente):
+            ultima = m.group(0)
+            fin = m.end()
+        # Conservo solo lo que puede ser el inicio de un objeto incompleto
+        resto = pendiente.rfind(b'{', fin)
+        pendiente = pendiente[resto:] if resto >= 0 else b''
+        duracion += time.perf_counter() - inicio
+
+    if ultima is None:
+        return None, leidos, duracion
+    inicio = time.perf_counter()
+    muestra = json.loads(ultima)
+    duracion += time.perf_counter() - inicio
+    return (muestra if 'valor' in muestra else None), leidos, duracion
+
+
+def _parse_fecha(texto):
+    for formato in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M'):
+        try:
+            return datetime.strptime(texto, formato)
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def cargar_estado():
+    """Carga la fecha de la última muestra leída por variable desde el archivo de estado."""
+    global _estado
+    with _lock:
+        if _estado is None:
+            _estado = {}
+            if os.path.exists(const.AGROMET_ESTADO):
+                try:
+                    with open(const.AGROMET_ESTADO, encoding='utf-8') as f:
+                        _estado = json.load(f)
+                except ValueError:
+                    logs.obtener_logger().error("Archivo de estado de Agromet inválido, se ignora")
+    return _estado
+
+
+def guardar_estado():
+    """Guarda el estado de las últimas muestras (escritura atómica)."""
+    with _lock:
+        if _estado is None:
+            return
+        archivo = const.AGROMET_ESTADO
+        temporal = archivo + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(_estado, f)
+        os.replace(temporal, archivo)
+
+
+def calcular_ventana(idEmaVariable, referencia):
+    """
+    Retorna (desde, hasta) a consultar para una variable, según la fecha y hora de referencia (datetime).
+    En modo 'dia' se consulta el día completo de la referencia. En modo 'ultima' se consulta una
+    ventana alrededor de la referencia, partiendo desde la última muestra ya leída si es más reciente.
+    """
+    if const.AGROMET_MODO_CONSULTA != 'ultima':
+        fecha = referencia.strftime('%Y-%m-%d')
+        return fecha, fecha
+
+    ventana = timedelta(minutes=const.AGROMET_VENTANA_MINUTOS)
+    desde = referencia - ventana
+    hasta = referencia + ventana
+    ultima = _parse_fecha(cargar_estado().get(str(idEmaVariable)))
+    if ultima is not None and desde <= ultima < hasta:
+        desde = ultima + timedelta(minutes=1)
+
+    return desde.strftime(FORMATO_VENTANA), hasta.strftime(FORMATO_VENTANA)
+
+
+def get_data_variable(idEmaVariable, referencia, url_base=None):
+    """
+    Retorna el valor de la última muestra de una variable.
+    Retorna None si no se pudo consultar o si no hay muestras (nuevas) en la ventana o el día.
+    """
+    muestra = get_muestra_variable(idEmaVariable, referencia, url_base)
+    return muestra[0] if muestra is not None else None
+
+
+def get_muestra_variable(idEmaVariable, referencia, url_base=None):
+    """
+    Retorna (valor, fecha) de la última muestra de una variable.
+    Retorna None si no se pudo consultar o si no hay muestras (nuevas) en la ventana o el día.
+    """
+    desde, hasta = calcular_ventana(idEmaVariable, referencia)
+    params = {
+        'idEmaVariable': idEmaVariable,
+        'desde': desde,
+        'hasta': hasta,
+        'user': userkey_agromet,
+    }
+    response = get_response((url_base or url_agromet) + 'muestras/', params, stream=True)
+    if response is None:
+        return None
+
+    with response:
+        muestra, leidos, duracion = leer_ultima_muestra(response.iter_content(chunk_size=16384))
+
+    with _lock:
+        _estadisticas['peticiones'] += 1
+        _estadisticas['bytes'] += leidos
+        _estadisticas['parse_s'] += duracion
+        if muestra is not None and muestra.get('fecha') is not None:
+            cargar_estado()[str(idEmaVariable)] = muestra['fecha']
+
+    if muestra is None:
+        return None
+    return muestra['valor'], muestra.get('fecha')
+
+
+def aplicar_cambios(row, valores, campos):
+    """
+    Copia en la fila (campos desde la posición 1) los valores del diccionario que cambiaron.
+    Retorna True si la fila cambió y debe escribirse.
+    """
+    cambio = False
+    for i, campo in enumerate(campos, 1):
+        if campo in valores and row[i] != valores[campo]:
+            row[i] = valores[campo]
+            cambio = True
+    return cambio
+
+
+def get_muestras(estaciones, referencia, variables=VARIABLES, url_base=None, max_workers=None):
+    """
+    Retorna la muestra de cada variable por estación, consultando todas las variables
+    de todas las estaciones como un solo lote en paralelo.
+    Las variables que no se pudieron consultar no se incluyen en la muestra de la estación.
+    La fecha de cada muestra se retorna en 'fechas' ({variable: fecha}).
+    """
+    cargar_estado()
+    with _lock:
+        _estadisticas.update({'peticiones': 0, 'bytes': 0, 'parse_s': 0.0})
+
+    tareas = []
+    for estacion in estaciones:
+        for variable in variables:
+            id_variable = estacion['id_' + variable]
+            if id_variable is not None:
+                tareas.append((estacion['id_estacion'], variable, id_variable))
+
+    def consultar(contexto, tarea):
+        return contexto.run(get_muestra_variable, tarea[2], referencia, url_base)
+
+    # Cada tarea corre con una copia del contexto (pipeline y run id para logs y métricas)
+    contextos = [contextvars.copy_context() for _ in tareas]
+    with ThreadPoolExecutor(max_workers=max_workers or const.AGROMET_CONCURRENCIA) as executor:
+        valores = list(executor.map(consultar, contextos, tareas))
+
+    por_estacion = {}
+    fallidas = 0
+    for (id_estacion, variable, _), resultado in zip(tareas, valores):
+        if resultado is None:
+            fallidas += 1
+            continue
+        valor, fecha = resultado
+        muestra = por_estacion.setdefault(id_estacion, {'fechas': {}})
+        muestra[variable] = float(valor)
+        muestra['fechas'][variable] = fecha
+
+    muestras = []
+    for id_estacion, valores_estacion in por_estacion.items():
+        muestra = {"id_estacion": int(id_estacion)}
+        muestra.update(valores_estacion)
+        muestras.append(muestra)
+
+    if fallidas > 0:
+        logs.obtener_logger().info("Sin muestras nuevas o con error en {0} variables de Agromet".format(fallidas))
+
+    guardar_estado()
+
+    # Reporto los bytes transferidos y el tiempo de lectura de las respuestas
+    with _lock:
+        estadisticas = dict(_estadisticas, parse_s=round(_estadisticas['parse_s'], 4), modo=const.AGROMET_MODO_CONSULTA)
+    logs.obtener_logger().info("Muestreo Agromet", extra={'datos': estadisticas})
+    spans.anotar(filas=len(muestras), bytes=estadisticas['bytes'], parse_s=estadisticas['parse_s'])
+
+    return muestras
@@ -0,0 +1,983 @@
+#-------------------------------------------------------------------------------
+# Name:         benchmark
+# Purpose:      Benchmarks de rendimiento de los procesos, ejecutables sin arcpy
+#               contra servicios locales simulados y datos sintéticos.
+#               Uso: python benchmark.py <benchmark> (sin argumentos lista los disponibles)
+#               Solo miden tiempos; las pruebas de comportamiento están en tests/
+#               (python -m pytest).
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import threading
+import time
+import json
+import sys
+import os
+
+# Los benchmarks no usan la geodatabase, pero constants exige las variables del workspace
+for variable in ('FOLDER_WORKSPACE', 'FOLDER_WORKSPACE_LOCAL', 'WORKSPACE_DATASET',
+                 'WORKSPACE_DATASET_CAPAS_MINISTERIO', 'USER_GEODATOS', 'USER_GEODATOS_SCRIPT',
+                 'FILE_CONAF_KML', 'USE_FILE_KML'):
+    os.environ.setdefault(variable, '')
+os.environ.setdefault('METRICAS_MODO', 'ninguno')
+
+
+#-------------------------------------------------------------------------------
+# Servicios simulados
+#-------------------------------------------------------------------------------
+class ServidorLocal:
+    """Servidor http local en un hilo en segundo plano (keep-alive habilitado)."""
+
+    def __init__(self, handler):
+        handler.protocol_version = 'HTTP/1.1'
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.servidor.daemon_threads = True
+        self.servidor.request_queue_size = 256
+        self.url = 'http://127.0.0.1:{0}/'.format(self.servidor.server_address[1])
+
+    def __enter__(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class StubAgromet(BaseHTTPRequestHandler):
+    """Simula /muestras/ de Agromet: una muestra cada 10 minutos desde medianoche."""
+
+    latencia = 0.05
+    muestras_por_dia = 72
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        time.sleep(self.latencia)
+        if not url.path.startswith('/muestras'):
+            self.send_error(404)
+            return
+        id_variable = int(params['idEmaVariable'][0])
+        desde = params['desde'][0]
+        hasta = params['hasta'][0]
+        # Las fechas sin hora abarcan el día completo
+        if len(hasta) == 10:
+            hasta += ' 23:59'
+        fecha = desde[:10]
+        muestras = [{
+            'fecha': '{0} {1:02d}:{2:02d}:00'.format(fecha, (i * 10) // 60, (i * 10) % 60),
+            'valor': float((id_variable * 7 + i) % 360),
+        } for i in range(self.muestras_por_dia)]
+        muestras = [m for m in muestras if desde <= m['fecha'][:16] <= hasta]
+        self.responder({'muestras': muestras})
+
+    def responder(self, data):
+        cuerpo = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def snapshots_sec(hora, comunas=346):
+    """Respuesta sintética de GetPorFecha para una hora: cortes de fondo y una tormenta de 3 días."""
+    import random
+    rng = random.Random(hora.strftime('%Y%m%d%H'))
+    registros = []
+    dia = hora.timetuple().tm_yday
+    tormenta = 10 <= hora.day <= 12
+    for i in range(comunas):
+        # Cortes de fondo persistentes en pocas comunas, que cambian cada algunas horas
+        if i % 23 == dia % 23 or (tormenta and i % 3 == 0):
+            base = (i * 37 + dia * 11 + (hora.hour // 4 if not tormenta else hora.hour)) % 900 + 1
+            for empresa in range(1 + i % 2):
+                registros.append({'NOMBRE_COMUNA': 'COMUNA {0}'.format(i), 'EMPRESA': empresa,
+                                  'CLIENTES_AFECTADOS': base * (10 if tormenta else 1)})
+    rng.shuffle(registros)
+    return registros
+
+
+class StubSec(BaseHTTPRequestHandler):
+    """Simula GetPorFecha de la SEC (POST con anho/mes/dia/hora)."""
+
+    latencia = 0.1
+
+    def do_POST(self):
+        from datetime import datetime
+        largo = int(self.headers.get('Content-Length', 0))
+        raw = json.loads(self.rfile.read(largo))
+        time.sleep(self.latencia)
+        hora = datetime(int(raw['anho']), int(raw['mes']), int(raw['dia']), int(raw['hora']))
+        cuerpo = json.dumps(snapshots_sec(hora)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubCaido(BaseHTTPRequestHandler):
+    """Simula un servicio colgado: responde después de 'demora' segundos."""
+
+    demora = 2.0
+
+    def do_GET(self):
+        time.sleep(self.demora)
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubRapido(BaseHTTPRequestHandler):
+    """
+    Responde de inmediato un cuerpo pequeño. Cada conexión nueva espera 'costo_conexion'
+    segundos, simulando el handshake TCP/TLS con un servidor remoto.
+    """
+
+    disable_nagle_algorithm = True
+    costo_conexion = 0.02
+
+    def setup(self):
+        time.sleep(self.costo_conexion)
+        super().setup()
+
+    def do_GET(self):
+        cuerpo = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def estaciones_sinteticas(cantidad):
+    """Retorna estaciones con ids de variables consecutivos, como los lee mainAgromet."""
+    variables = ('direccion_viento', 'humedad_media', 'temperatura_media',
+                 'velocidad_viento_max', 'velocidad_viento_media')
+    estaciones = []
+    for i in range(cantidad):
+        estacion = {'id_estacion': i + 1, 'nombre': 'EMA {0}'.format(i + 1), 'comuna': 'Comuna'}
+        for j, variable in enumerate(variables):
+            estacion['id_' + variable] = (i + 1) * 10 + j
+        estaciones.append(estacion)
+    return estaciones
+
+
+def puntos_sinteticos(cantidad, semilla=0):
+    """Retorna (lons, lats) aleatorios dentro del territorio continental de Chile."""
+    import numpy as np
+    rng = np.random.default_rng(semilla)
+    return rng.uniform(-73.5, -70.0, cantidad), rng.uniform(-42.0, -30.0, cantidad)
+
+
+def imprimir_tabla(titulo, columnas, filas):
+    textos = [[v if not isinstance(v, float) else '%.4f' % v for v in fila] for fila in filas]
+    anchos = [max([14, len(str(c))] + [len(str(f[i])) for f in textos]) for i, c in enumerate(columnas)]
+    print('\n' + titulo)
+    print(' | '.join('{0:>{1}}'.format(c, a) for c, a in zip(columnas, anchos)))
+    for fila in textos:
+        print(' | '.join('{0:>{1}}'.format(v, a) for v, a in zip(fila, anchos)))
+
+
+def ajustar(**valores):
+    """Fija valores de configuración (variables de entorno) y descarta los ya leídos por constants."""
+    import constants as const
+    for nombre, valor in valores.items():
+        os.environ[nombre] = str(valor)
+    const.ajustes.recargar()
+
+
+#-------------------------------------------------------------------------------
+# Benchmarks
+#-------------------------------------------------------------------------------
+def bench_agromet_muestras():
+    """Tiempo de muestreo de Agromet serial vs concurrente (1 y 5 variables) según cantidad de estaciones."""
+    from datetime import datetime
+    import tempfile
+    import constants as const
+    import agromet
+
+    filas = []
+    una_variable = ('direccion_viento',)
+    with ServidorLocal(StubAgromet) as stub, tempfile.TemporaryDirectory() as carpeta:
+        ajustar(AGROMET_ESTADO=os.path.join(carpeta, 'estado.json'))
+        for cantidad in (10, 50, 100, 200):
+            estaciones = estaciones_sinteticas(cantidad)
+            # Cada consulta parte sin estado previo (sin muestras ya leídas)
+            agromet._estado = {}
+            inicio = time.perf_counter()
+            serial = agromet.get_muestras(estaciones, datetime(2026, 1, 15, 12, 0), una_variable, url_base=stub.url, max_workers=1)
+            t_serial = time.perf_counter() - inicio
+            agromet._estado = {}
+            inicio = time.perf_counter()
+            concurrente = agromet.get_muestras(estaciones, datetime(2026, 1, 15, 12, 0), una_variable, url_base=stub.url)
+            t_concurrente = time.perf_counter() - inicio
+            agromet._estado = {}
+            inicio = time.perf_counter()
+            cinco = agromet.get_muestras(estaciones, datetime(2026, 1, 15, 12, 0), agromet.VARIABLES, url_base=stub.url)
+            t_cinco = time.perf_counter() - inicio
+            filas.append((cantidad, t_serial, t_concurrente, t_cinco, t_serial / t_cinco))
+
+    imprimir_tabla('Muestreo Agromet (latencia stub {0}s, concurrencia {1})'.format(
+        StubAgromet.latencia, const.AGROMET_CONCURRENCIA),
+        ('estaciones', 'serial 1 var', 'concur. 1 var', 'concur. 5 var', 'serial1/conc5'), filas)
+
+
+def bench_agromet_ventana():
+    """Bytes transferidos y tiempo de lectura consultando el día completo vs la ventana de la última muestra."""
+    from datetime import datetime
+    import tempfile
+    import agromet
+
+    estaciones = estaciones_sinteticas(100)
+    filas = []
+    por_dia = StubAgromet.muestras_por_dia
+    with ServidorLocal(StubAgromet) as stub, tempfile.TemporaryDirectory() as carpeta:
+        ajustar(AGROMET_ESTADO=os.path.join(carpeta, 'estado.json'))
+        # Muestras publicadas hasta las 21:50, y 10 minutos después hasta las 22:00
+        for modo, descripcion, publicadas, referencia in (('dia', 'dia completo', 132, datetime(2026, 1, 15, 21, 50)),
+                                                          ('ultima', 'ventana', 132, datetime(2026, 1, 15, 21, 50)),
+                                                          ('ultima', 'incremental', 133, datetime(2026, 1, 15, 22, 0))):
+            ajustar(AGROMET_MODO_CONSULTA=modo)
+            StubAgromet.muestras_por_dia = publicadas
+            if descripcion == 'ventana':
+                # Primera consulta por ventana, sin estado previo
+                agromet._estado = {}
+            inicio = time.perf_counter()
+            muestras = agromet.get_muestras(estaciones, referencia, url_base=stub.url)
+            total = time.perf_counter() - inicio
+            e = agromet._estadisticas
+            filas.append((descripcion, len(muestras), e['bytes'], e['parse_s'], total))
+    StubAgromet.muestras_por_dia = por_dia
+
+    imprimir_tabla('Consulta Agromet a las 22:00 (100 estaciones x 5 variables)',
+                   ('modo', 'estaciones', 'bytes', 'lectura (s)', 'total (s)'), filas)
+
+
+def bench_agromet_join():
+    """Actualización de 1.000 estaciones: ciclos anidados (antes) vs join por diccionario."""
+    import random
+    import agromet
+
+    cantidad = 1000
+    variables = agromet.VARIABLES
+    random.seed(1)
+    tabla = [[i + 1] + [float(random.randint(0, 359)) for _ in variables] for i in range(cantidad)]
+    # La mitad de las estaciones trae valores nuevos
+    muestras = []
+    for fila in tabla:
+        muestra = {'id_estacion': fila[0]}
+        for j, variable in enumerate(variables, 1):
+            muestra[variable] = fila[j] + (1.0 if fila[0] % 2 == 0 else 0.0)
+        muestras.append(muestra)
+
+    # mainAgromet antes: por cada fila se recorren todas las muestras
+    filas = [list(f) for f in tabla]
+    escrituras = 0
+    inicio = time.perf_counter()
+    for row in filas:
+        for k in muestras:
+            if row[0] == k['id_estacion']:
+                for j, variable in enumerate(variables, 1):
+                    row[j] = k[variable]
+                escrituras += 1
+    t_anidado = time.perf_counter() - inicio
+    resultados = [('obtener_variables (antes)', t_anidado, escrituras)]
+
+    # utils.actualizar_agromet antes: un cursor completo por estación, escribiendo todas las filas
+    filas = [list(f) for f in tabla]
+    escrituras = 0
+    inicio = time.perf_counter()
+    for k in muestras:
+        for row in filas:
+            if row[0] == k['id_estacion']:
+                for j, variable in enumerate(variables, 1):
+                    row[j] = k[variable]
+            escrituras += 1
+    t_por_estacion = time.perf_counter() - inicio
+    resultados.append(('actualizar_agromet (antes)', t_por_estacion, escrituras))
+
+    # Ahora: diccionario por estación y una pasada, escribiendo solo las filas que cambian
+    filas = [list(f) for f in tabla]
+    escrituras = 0
+    inicio = time.perf_counter()
+    muestras_por_estacion = {k['id_estacion']: k for k in muestras}
+    for row in filas:
+        k = muestras_por_estacion.get(row[0])
+        if k is not None and agromet.aplicar_cambios(row, k, variables):
+            escrituras += 1
+    t_join = time.perf_counter() - inicio
+    resultados.append(('join por diccionario', t_join, escrituras))
+
+    imprimir_tabla('Actualización de {0} estaciones (updateRow contados como escrituras)'.format(cantidad),
+                   ('método', 'tiempo (s)', 'escrituras', 'speedup'),
+                   [(m, t, e, t_por_estacion / t) for m, t, e in resultados])
+
+
+def bench_agromet_historial(dias=30, estaciones=400):
+    """Disco, memoria y consultas del historial Agromet (muestras cada 10 min, 5 variables)."""
+    from datetime import datetime, timedelta
+    import tempfile
+    import tracemalloc
+    import numpy as np
+    import agromet
+    import historial_agromet
+
+    dias, estaciones = int(dias), int(estaciones)
+    variables = len(agromet.VARIABLES)
+    por_dia = 144 * estaciones * variables
+    inicio_temporada = datetime(2026, 1, 1)
+    filas = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        ajustar(AGROMET_HISTORIAL_DIR=carpeta)
+        rng = np.random.default_rng(1)
+        inicio = time.perf_counter()
+        for d in range(dias):
+            dia = inicio_temporada + timedelta(days=d)
+            base = historial_agromet._epoch(dia)
+            fecha = base + np.repeat(np.arange(144, dtype='<u4') * 600, estaciones * variables)
+            estacion = np.tile(np.repeat(np.arange(1, estaciones + 1, dtype='<i4'), variables), 144)
+            variable = np.tile(np.arange(variables, dtype='u1'), 144 * estaciones)
+            valor = rng.uniform(0, 360, por_dia).astype('<f4')
+            historial_agromet.escribir(dia.date(), {'fecha': fecha, 'estacion': estacion,
+                                                    'variable': variable, 'valor': valor})
+        t_escritura = time.perf_counter() - inicio
+        filas.append(('escritura {0} días'.format(dias), t_escritura, por_dia * dias, ''))
+
+        inicio = time.perf_counter()
+        historial_agromet.mantener(inicio_temporada + timedelta(days=dias))
+        filas.append(('compactación', time.perf_counter() - inicio, por_dia * dias, ''))
+
+        disco = historial_agromet.tamano_en_disco()
+        fin = inicio_temporada + timedelta(days=dias)
+
+        consultas = (
+            ('serie 1 estación/1 var', lambda: historial_agromet.serie(7, 'direccion_viento', inicio_temporada, fin)),
+            ('1 día todas estaciones', lambda: historial_agromet.consultar(inicio_temporada, inicio_temporada + timedelta(hours=23, minutes=59))),
+            ('50 estaciones, 7 días', lambda: historial_agromet.consultar(inicio_temporada, inicio_temporada + timedelta(days=7), list(range(1, 51)))),
+        )
+        for nombre, consulta in consultas:
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            resultado = consulta()
+            duracion = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            largo = len(resultado[0]) if isinstance(resultado, tuple) else len(resultado['valor'])
+            filas.append((nombre, duracion, largo, pico))
+
+    imprimir_tabla('Historial Agromet ({0} estaciones, {1} días)'.format(estaciones, dias),
+                   ('operación', 'tiempo (s)', 'registros', 'memoria pico (B)'), filas)
+    bytes_muestra = disco / float(por_dia * dias)
+    temporada = 182
+    print('\nDisco: {0:.1f} MB ({1:.2f} bytes/muestra)'.format(disco / 1e6, bytes_muestra))
+    print('Estimado temporada de {0} días: {1:.0f} MB en disco, {2:.1f} MB por día en memoria'.format(
+        temporada, bytes_muestra * por_dia * temporada / 1e6, bytes_muestra * por_dia / 1e6))
+
+
+def bench_buffer_viento(incendios=500, estaciones=400):
+    """Estación más cercana (KD-tree vs fuerza bruta) y buffers según viento vs círculo fijo."""
+    import numpy as np
+    import geometria
+
+    incendios, estaciones = int(incendios), int(estaciones)
+    lon_e, lat_e = puntos_sinteticos(estaciones, 1)
+    lon_i, lat_i = puntos_sinteticos(incendios, 2)
+    rng = np.random.default_rng(3)
+    direccion = rng.uniform(0, 360, estaciones)
+    velocidad = rng.uniform(0, 40, estaciones)
+
+    filas = []
+    inicio = time.perf_counter()
+    arbol = geometria.ArbolKD(lon_e, lat_e)
+    filas.append(('construir KD-tree', time.perf_counter() - inicio, estaciones))
+
+    inicio = time.perf_counter()
+    cercanas = arbol.consultar(lon_i, lat_i)[0][:, 0].tolist()
+    filas.append(('KD-tree por lote', time.perf_counter() - inicio, incendios))
+
+    inicio = time.perf_counter()
+    fuerza_bruta = [int(np.argmin(geometria.distancia_km(x, y, lon_e, lat_e))) for x, y in zip(lon_i, lat_i)]
+    filas.append(('fuerza bruta', time.perf_counter() - inicio, incendios))
+
+    inicio = time.perf_counter()
+    poligonos = [geometria.poligono_viento(x, y, 2.0, direccion[k], velocidad[k])
+                 for x, y, k in zip(lon_i, lat_i, cercanas)]
+    filas.append(('polígonos viento', time.perf_counter() - inicio, incendios))
+    imprimir_tabla('Buffer según viento ({0} incendios, {1} estaciones)'.format(incendios, estaciones),
+                   ('operación', 'tiempo (s)', 'incendios'), filas)
+
+    # Activos sintéticos alrededor de cada incendio: cuántos se marcan a favor y en contra del viento
+    filas = []
+    totales = {'circulo': [0, 0], 'viento': [0, 0]}
+    for x, y, k, poligono in zip(lon_i, lat_i, cercanas, poligonos):
+        distancia = rng.uniform(0, 6, 200)
+        angulo = rng.uniform(0, 2 * np.pi, 200)
+        km_lon = geometria.KM_POR_GRADO * np.cos(np.radians(y))
+        lons = x + distancia * np.sin(angulo) / km_lon
+        lats = y + distancia * np.cos(angulo) / geometria.KM_POR_GRADO
+        este, norte = geometria.vector_viento(direccion[k])
+        a_favor = (np.sin(angulo) * este + np.cos(angulo) * norte) > 0
+        circulo = distancia <= 2.0
+        viento = geometria.dentro_de_poligono(lons, lats, poligono)
+        for nombre, mascara in (('circulo', circulo), ('viento', viento)):
+            totales[nombre][0] += int((mascara & a_favor).sum())
+            totales[nombre][1] += int((mascara & ~a_favor).sum())
+    for nombre, (favor, contra) in totales.items():
+        filas.append((nombre, favor, contra, favor + contra))
+    imprimir_tabla('Activos marcados (200 por incendio, hasta 6 km)',
+                   ('buffer', 'a favor', 'en contra', 'total'), filas)
+
+
+def bench_buffer_lod(incendios=500, vertices=360, tolerancias='0,5,25,100'):
+    """Niveles de detalle del buffer visor: vértices, bytes WKB y error de área por tolerancia."""
+    import numpy as np
+    import geometria
+
+    incendios, vertices = int(incendios), int(vertices)
+    tolerancias = [float(t) for t in str(tolerancias).split(',')]
+    lons, lats = puntos_sinteticos(incendios, semilla=7)
+    rng = np.random.default_rng(7)
+    # Círculos de 2 km y elipses según el viento, como los deja crear_buffer (lon/lat, WKB)
+    wkbs = [geometria.escribir_wkb_poligonos([[geometria.poligono_viento(
+        lon, lat, 2.0, float(rng.uniform(0, 360)) if i % 2 else None, float(rng.uniform(0, 40)),
+        vertices=vertices)]]) for i, (lon, lat) in enumerate(zip(lons, lats))]
+
+    def area(anillo):
+        x, y = anillo[:, 0], anillo[:, 1]
+        return abs(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])) / 2
+
+    filas = []
+    base = sum(len(w) for w in wkbs)
+    for tolerancia in tolerancias:
+        inicio = time.perf_counter()
+        simplificados = [geometria.simplificar_wkb(w, tolerancia) for w in wkbs]
+        segundos = time.perf_counter() - inicio
+        total = sum(len(w) for w in simplificados)
+        anillos = [geometria.leer_wkb_poligonos(w)[0][0] for w in simplificados]
+        originales = [geometria.leer_wkb_poligonos(w)[0][0] for w in wkbs]
+        error = max(abs(area(s) / area(o) - 1) for s, o in zip(anillos, originales)) * 100
+        filas.append((tolerancia, np.mean([len(a) for a in anillos]), total / 1024.0,
+                      (1 - total / float(base)) * 100, error, segundos * 1000))
+
+    imprimir_tabla('Niveles de detalle del buffer visor ({0} incendios, {1} vértices por buffer)'.format(
+        incendios, vertices), ('tolerancia (m)', 'vértices', 'WKB (KB)', 'reducción (%)',
+                               'error área máx. (%)', 'simplificar (ms)'), filas)
+
+
+def bench_cercania(pares=100000, vertices=8):
+    """Distancia instalación-incendio (near_dist) en un lote: vectorizada vs por par, mitad puntos y mitad líneas."""
+    import numpy as np
+    import geometria
+
+    pares, vertices = int(pares), int(vertices)
+    lon_i, lat_i = puntos_sinteticos(pares, semilla=3)
+    rng = np.random.default_rng(3)
+    # Instalaciones a menos de ~5 km de su incendio; las líneas avanzan ~1 km por vértice
+    lon_a = lon_i + rng.uniform(-0.05, 0.05, pares)
+    lat_a = lat_i + rng.uniform(-0.05, 0.05, pares)
+    rumbo = rng.uniform(0, 2 * np.pi, pares)
+    pasos = np.arange(vertices) / geometria.KM_POR_GRADO
+    trazos = [np.column_stack((lon_a[j] + np.cos(rumbo[j]) * pasos, lat_a[j] + np.sin(rumbo[j]) * pasos))
+              if j % 2 else np.array([[lon_a[j], lat_a[j]]]) for j in range(pares)]
+    segmentos = sum(max(len(t) - 1, 1) for t in trazos)
+
+    inicio = time.perf_counter()
+    km = geometria.distancia_trazos_km(trazos, lon_i, lat_i)
+    t_lote = time.perf_counter() - inicio
+
+    # Por par (un cálculo por instalación), sobre una muestra y extrapolado al total
+    muestra = min(pares, 5000)
+    inicio = time.perf_counter()
+    km_par = [min(float(geometria.distancia_segmento_km(lon_i[j], lat_i[j], t[k][0], t[k][1],
+                                                        t[min(k + 1, len(t) - 1)][0], t[min(k + 1, len(t) - 1)][1]))
+                  for k in range(max(len(t) - 1, 1)))
+              for j, t in enumerate(trazos[:muestra])]
+    t_par = (time.perf_counter() - inicio) * pares / float(muestra)
+
+    # Error respecto de la distancia haversine a cada línea muestreada cada ~1 m
+    error = 0.0
+    for j in range(1, min(pares, 200), 2):
+        t = np.linspace(0, 1, 1000)[:, None]
+        densos = np.concatenate([a + t * (b - a) for a, b in zip(trazos[j][:-1], trazos[j][1:])])
+        exacta = geometria.distancia_km(lon_i[j], lat_i[j], densos[:, 0], densos[:, 1]).min()
+        error = max(error, abs(km[j] - exacta) * 1000)
+
+    imprimir_tabla('Cercanía instalación-incendio ({0} pares, {1} segmentos)'.format(pares, segmentos),
+                   ('pares', 'lote (s)', 'por par (s, extrapolado)', 'aceleración', 'pares/s',
+                    'error máx. (m)'),
+                   [(pares, t_lote, t_par, '{0:.0f}x'.format(t_par / t_lote), pares / t_lote, error)])
+
+
+def bench_estaciones_cercanas(estaciones=400, k=3):
+    """k estaciones más cercanas por lote de incendios: KD-tree vs matriz de distancias."""
+    import numpy as np
+    import geometria
+
+    estaciones, k = int(estaciones), int(k)
+    lon_e, lat_e = puntos_sinteticos(estaciones, 1)
+    arbol = geometria.ArbolKD(lon_e, lat_e)
+    filas = []
+    for incendios in (10, 100, 1000, 10000):
+        lon_i, lat_i = puntos_sinteticos(incendios, 2)
+        inicio = time.perf_counter()
+        ids, _ = arbol.consultar(lon_i, lat_i, k)
+        t_arbol = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        ids_bruta = []
+        for x, y in zip(lon_i, lat_i):
+            d = geometria.distancia_km(x, y, lon_e, lat_e)
+            ids_bruta.append(np.argsort(d, kind='stable')[:k])
+        t_bruta = time.perf_counter() - inicio
+        filas.append((incendios, t_arbol, t_bruta, '{0:.1f}x'.format(t_bruta / t_arbol)))
+    imprimir_tabla('Estaciones más cercanas ({0} estaciones, k={1})'.format(estaciones, k),
+                   ('incendios', 'KD-tree (s)', 'por incendio (s)', 'aceleración'), filas)
+
+
+def bench_sec_join(registros=5000):
+    """Clientes afectados de la SEC en 346 comunas: ciclos anidados (antes) vs join por diccionario."""
+    import random
+    import sec
+
+    registros = int(registros)
+    random.seed(1)
+    comunas = ['COMUNA {0}'.format(i) for i in range(346)]
+    tabla = [[c, random.randint(1000, 200000), 0, 0, None] for c in comunas]
+    # Algunas comunas de la SEC no existen en la capa
+    nombres = comunas[:330] + ['OTRA {0}'.format(i) for i in range(10)]
+    data = [{'NOMBRE_COMUNA': random.choice(nombres), 'CLIENTES_AFECTADOS': random.randint(1, 500)}
+            for _ in range(registros)]
+
+    # Antes: por cada comuna se recorren todos los registros, acumulando la lista de nombres
+    filas = [list(f) for f in tabla]
+    inicio = time.perf_counter()
+    lista = []
+    encontradas = []
+    escrituras = 0
+    for row in filas:
+        for k in data:
+            lista.append(k['NOMBRE_COMUNA'])
+            if row[0] == k['NOMBRE_COMUNA']:
+                encontradas.append(k['NOMBRE_COMUNA'])
+                row[2] = row[2] + k['CLIENTES_AFECTADOS']
+                row[3] = row[2] / row[1] * 100
+                escrituras += 1
+    nuevas_antes = set(lista) - set(encontradas)
+    t_antes = time.perf_counter() - inicio
+    resultados = [('ciclos anidados (antes)', t_antes, escrituras, len(lista))]
+
+    # Ahora: suma por comuna y una pasada
+    filas = [list(f) for f in tabla]
+    inicio = time.perf_counter()
+    afectados_por_comuna = sec.agrupar_por_comuna(data)
+    encontradas = set()
+    escrituras = 0
+    for row in filas:
+        afectados = afectados_por_comuna.get(row[0])
+        if afectados is None:
+            continue
+        encontradas.add(row[0])
+        row[2] = row[2] + afectados
+        row[3] = row[2] / row[1] * 100
+        escrituras += 1
+    nuevas = set(afectados_por_comuna) - encontradas
+    t_join = time.perf_counter() - inicio
+    resultados.append(('join por diccionario', t_join, escrituras, len(afectados_por_comuna)))
+
+    imprimir_tabla('SEC: 346 comunas x {0} registros (updateRow contados como escrituras)'.format(registros),
+                   ('método', 'tiempo (s)', 'escrituras', 'nombres en memoria', 'speedup'),
+                   [(m, t, e, n, t_antes / t) for m, t, e, n in resultados])
+
+
+def bench_sec_ciclos(ciclos=24):
+    """Filas escritas por ciclo SEC: limpiar + actualizar (antes) vs reconciliación en una pasada."""
+    import random
+    import sec
+
+    ciclos = int(ciclos)
+    random.seed(2)
+    comunas = ['COMUNA {0}'.format(i) for i in range(346)]
+    clientes = {c: random.randint(1000, 200000) for c in comunas}
+    # Cortes activos que evolucionan lentamente entre ciclos horarios
+    cortes = {c: random.randint(1, 2000) for c in random.sample(comunas, 40)}
+
+    filas_antes = [[c, clientes[c], 0, 0, None] for c in comunas]
+    filas_ahora = [list(f) for f in filas_antes]
+    escrituras_antes = escrituras_ahora = 0
+    t_antes = t_ahora = 0.0
+    for ciclo in range(ciclos):
+        for c in random.sample(list(cortes), 4):
+            cortes.pop(c)
+        for c in random.sample(comunas, 4):
+            cortes[c] = random.randint(1, 2000)
+        data = [{'NOMBRE_COMUNA': c, 'CLIENTES_AFECTADOS': n} for c, n in cortes.items()]
+        ahora = ciclo + 1
+
+        # Antes: una pasada que deja todo en cero y otra que escribe las comunas con cortes
+        inicio = time.perf_counter()
+        for row in filas_antes:
+            row[2], row[3], row[4] = 0, 0, None
+            escrituras_antes += 1
+        afectados_por_comuna = sec.agrupar_por_comuna(data)
+        for row in filas_antes:
+            if row[0] in afectados_por_comuna:
+                row[2] += afectados_por_comuna[row[0]]
+                row[3] = row[2] / row[1] * 100
+                row[4] = ahora
+                escrituras_antes += 1
+        t_antes += time.perf_counter() - inicio
+
+        # Ahora: una pasada, escribiendo las comunas con cortes (renueva la fecha) y las que cambian
+        inicio = time.perf_counter()
+        afectados_por_comuna = sec.agrupar_por_comuna(data)
+        for row in filas_ahora:
+            afectados = afectados_por_comuna.get(row[0], 0)
+            porcentaje = afectados / row[1] * 100 if row[1] else 0
+            if afectados > 0 or sec.cambio_afectados(row[2], row[3], row[4], afectados, porcentaje):
+                row[2], row[3], row[4] = afectados, porcentaje, ahora if afectados > 0 else None
+                escrituras_ahora += 1
+        t_ahora += time.perf_counter() - inicio
+
+    imprimir_tabla('SEC: {0} ciclos, 346 comunas, ~40 con cortes (updateRow por ciclo)'.format(ciclos),
+                   ('método', 'tiempo (s)', 'escrituras/ciclo'),
+                   [('limpiar + actualizar (antes)', t_antes, escrituras_antes / float(ciclos)),
+                    ('reconciliación', t_ahora, escrituras_ahora / float(ciclos))])
+
+
+def bench_sec_comunas(registros=5000):
+    """Resolución de nombres SEC: comparación exacta + escaneo por nombre (antes) vs índice normalizado."""
+    import random
+    import tempfile
+    import sec
+
+    registros = int(registros)
+    random.seed(3)
+    silabas = ('CHI', 'LLA', 'ÑU', 'ÑO', 'PU', 'CÓN', 'TAL', 'HUE', 'QUI', 'RAN', 'GUA', 'LÍN')
+    capa = []
+    for oid in range(1, 347):
+        nombre = ' '.join(''.join(random.choice(silabas) for _ in range(3)) for _ in range(random.randint(1, 2)))
+        capa.append((oid, nombre, nombre))
+    # La SEC entrega una parte de los nombres sin tildes, en otro formato o con errores menores
+    def variante(nombre):
+        r = random.random()
+        if r < 0.5:
+            return nombre
+        if r < 0.8:
+            return sec.normalizar_comuna(nombre).title()
+        if r < 0.95:
+            return nombre.replace(' ', '-').lower()
+        return sec.normalizar_comuna(nombre)[:-1]
+    variantes = {oid: variante(nombre) for oid, nombre, _ in capa}
+    data = [{'NOMBRE_COMUNA': variantes[random.randint(1, 346)], 'CLIENTES_AFECTADOS': 1} for _ in range(registros)]
+
+    # Antes: coincidencia exacta con NOM_SEC y un escaneo de la capa por cada nombre no encontrado
+    inicio = time.perf_counter()
+    por_nombre = sec.agrupar_por_comuna(data)
+    nom_sec = {c[2] for c in capa}
+    no_encontradas = [n for n in por_nombre if n not in nom_sec]
+    reparadas = 0
+    for comuna in no_encontradas:
+        for oid, nom_saidi, _ in capa:
+            if comuna == nom_saidi:
+                reparadas += 1
+    t_antes = time.perf_counter() - inicio
+    resueltos_antes = sum(por_nombre[n] for n in por_nombre if n in nom_sec)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        archivo = os.path.join(carpeta, 'sec_comunas.json')
+        inicio = time.perf_counter()
+        indice = sec.IndiceComunas(capa)
+        afectados, _, no_resueltas = indice.agrupar(data)
+        indice.guardar(archivo)
+        t_frio = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        indice = sec.IndiceComunas.cargar(archivo)
+        afectados, _, no_resueltas = indice.agrupar(data)
+        t_cache = time.perf_counter() - inicio
+
+    imprimir_tabla('SEC: {0} registros, {1} nombres distintos, 346 comunas'.format(registros, len(por_nombre)),
+                   ('método', 'tiempo (s)', 'registros asignados', 'nombres sin resolver'),
+                   [('exacto + escaneo (antes)', t_antes, resueltos_antes, len(no_encontradas) - reparadas),
+                    ('índice (construcción)', t_frio, sum(afectados.values()), len(no_resueltas)),
+                    ('índice (desde caché)', t_cache, sum(afectados.values()), len(no_resueltas))])
+
+
+def bench_sec_historial(dias=30):
+    """Historial SEC: un mes de consultas horarias como deltas, consultas de máximos y backfill."""
+    from datetime import datetime, timedelta
+    import tempfile
+    import historial_sec
+
+    dias = int(dias)
+    inicio_mes = datetime(2026, 7, 1)
+    horas = [inicio_mes + timedelta(hours=h) for h in range(24 * dias)]
+    respuestas = [snapshots_sec(h) for h in horas]
+    bytes_json = sum(len(json.dumps(r)) for r in respuestas)
+    filas = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        ajustar(SEC_HISTORIAL_DIR=carpeta)
+        historial_sec._codigos = None
+
+        inicio = time.perf_counter()
+        cambios = sum(historial_sec.agregar(h, r) for h, r in zip(horas, respuestas))
+        filas.append(('agregar {0} horas'.format(len(horas)), time.perf_counter() - inicio, cambios))
+        disco = historial_sec.tamano_en_disco()
+
+        fin_mes = horas[-1]
+        inicio = time.perf_counter()
+        picos = historial_sec.pico(inicio_mes, fin_mes)
+        filas.append(('pico del mes', time.perf_counter() - inicio, len(picos)))
+
+        ventana = (inicio_mes + timedelta(days=10, hours=6), inicio_mes + timedelta(days=11, hours=18))
+        inicio = time.perf_counter()
+        picos = historial_sec.pico(*ventana)
+        filas.append(('pico 36 horas', time.perf_counter() - inicio, len(picos)))
+
+        inicio = time.perf_counter()
+        vigentes = historial_sec.estado(inicio_mes + timedelta(days=11, hours=13))
+        filas.append(('estado a una hora', time.perf_counter() - inicio, len(vigentes)))
+
+        imprimir_tabla('Historial SEC ({0} días, 346 comunas)'.format(dias),
+                       ('operación', 'tiempo (s)', 'registros'), filas)
+        print('\nRespuestas JSON: {0:.1f} MB, historial en disco: {1:.1f} KB ({2:.0f}x menor), '
+              'consultas completas (346 x int32): {3:.1f} KB'.format(
+                  bytes_json / 1e6, disco / 1e3, bytes_json / float(disco), len(horas) * 346 * 4 / 1e3))
+
+    # Backfill de 3 días contra GetPorFecha simulado
+    filas = []
+    with ServidorLocal(StubSec) as servidor:
+        for workers in (1, 8, 16):
+            with tempfile.TemporaryDirectory() as carpeta:
+                ajustar(SEC_HISTORIAL_DIR=carpeta)
+                historial_sec._codigos = None
+                inicio = time.perf_counter()
+                guardadas, fallidas = historial_sec.backfill(
+                    datetime(2026, 7, 10), datetime(2026, 7, 12, 23), servidor.url, max_workers=workers)
+                filas.append((workers, time.perf_counter() - inicio, guardadas, fallidas))
+    imprimir_tabla('Backfill 72 horas (latencia simulada {0} s)'.format(StubSec.latencia),
+                   ('concurrencia', 'tiempo (s)', 'horas', 'fallidas'), filas)
+
+
+def bench_http_client(peticiones=200):
+    """Conexión nueva por petición (urlopen) vs sesión keep-alive, y servicio colgado con/sin circuit breaker."""
+    import urllib.request
+    import http_client
+
+    peticiones = int(peticiones)
+    filas = []
+    with ServidorLocal(StubRapido) as servidor:
+        inicio = time.perf_counter()
+        for _ in range(peticiones):
+            urllib.request.urlopen(servidor.url).read()
+        t_urlopen = time.perf_counter() - inicio
+        filas.append(('urlopen (antes)', t_urlopen, t_urlopen / peticiones * 1000))
+
+        inicio = time.perf_counter()
+        for _ in range(peticiones):
+            http_client.get(servidor.url).content
+        t_sesion = time.perf_counter() - inicio
+        filas.append(('http_client keep-alive', t_sesion, t_sesion / peticiones * 1000))
+    imprimir_tabla('{0} peticiones GET (conexión nueva: {1} s)'.format(peticiones, StubRapido.costo_conexion),
+                   ('cliente', 'tiempo (s)', 'ms/petición'), filas)
+
+    # Servicio que tarda 2 s y responde 503: 20 peticiones seguidas (p. ej. 20 incendios)
+    filas = []
+    with ServidorLocal(StubCaido) as servidor:
+        for nombre, fallos in (('sin circuit breaker', 10 ** 6), ('con circuit breaker', 3)):
+            http_client._circuitos.clear()
+            ajustar(HTTP_CIRCUITO_FALLOS=fallos)
+            inicio = time.perf_counter()
+            resultados = [http_client.get(servidor.url, timeout=0.5, reintentos=0) for _ in range(20)]
+            filas.append((nombre, time.perf_counter() - inicio, sum(r is None for r in resultados)))
+    imprimir_tabla('Servicio colgado (timeout 0.5 s, 20 peticiones)',
+                   ('modo', 'tiempo (s)', 'fallidas'), filas)
+
+
+def bench_scheduler(segundos=3):
+    """Scheduler con pipelines simulados: solapamiento, turnos omitidos y latencia de detención."""
+    import mainScheduler
+
+    segundos = float(segundos)
+    activas = {}
+    maximo = {}
+    lock = threading.Lock()
+
+    def pipeline(nombre, duracion):
+        def main():
+            with lock:
+                activas[nombre] = activas.get(nombre, 0) + 1
+                maximo[nombre] = max(maximo.get(nombre, 0), activas[nombre])
+            time.sleep(duracion)
+            with lock:
+                activas[nombre] -= 1
+        return main
+
+    filas = []
+    for exclusivo in (False, True):
+        ajustar(SCHEDULER_EXCLUSIVO=exclusivo)
+        maximo.clear()
+        # conaf supera su intervalo (0.35 s cada 0.2 s); sec y agromet caben en el suyo
+        tareas = [mainScheduler.Tarea('conaf', pipeline('conaf', 0.35), 0.2),
+                  mainScheduler.Tarea('sec', pipeline('sec', 0.05), 0.25),
+                  mainScheduler.Tarea('agromet', pipeline('agromet', 0.1), 0.5)]
+        inicio = time.perf_counter()
+        threading.Timer(segundos, mainScheduler.solicitar_detencion).start()
+        # ejecutar() retorna cuando terminan las ejecuciones en curso
+        mainScheduler.ejecutar(tareas)
+        detencion = time.perf_counter() - inicio - segundos
+        for tarea in tareas:
+            filas.append(('si' if exclusivo else 'no', tarea.nombre, tarea.ejecuciones, tarea.omitidas,
+                          maximo.get(tarea.nombre, 0), detencion))
+
+    imprimir_tabla('Scheduler {0:g} s (conaf 0.35 s cada 0.2 s, sec 0.05 s cada 0.25 s, agromet 0.1 s cada 0.5 s)'.format(
+        segundos), ('exclusivo', 'pipeline', 'ejecuciones', 'omitidas', 'máx. simultáneas', 'detención (s)'), filas)
+
+
+def bench_lease(solicitudes=6, duracion=0.3):
+    """Leases por pipeline: ejecuciones solapadas por política, toma de leases vencidos y heartbeat."""
+    import tempfile
+    import constants as const
+    import lease
+
+    solicitudes, duracion = int(solicitudes), float(duracion)
+    activas = [0]
+    maximo = [0]
+    ejecuciones = [0]
+    lock = threading.Lock()
+
+    def pipeline():
+        with lock:
+            ejecuciones[0] += 1
+            activas[0] += 1
+            maximo[0] = max(maximo[0], activas[0])
+        time.sleep(duracion)
+        with lock:
+            activas[0] -= 1
+
+    filas = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        ajustar(LEASE_DIR=carpeta)
+        # Una solicitud cada duracion / 3: cada ejecución se solapa con las dos siguientes
+        for politica in ('omitir', 'agrupar'):
+            ejecuciones[0] = maximo[0] = 0
+            hilos = []
+            inicio = time.perf_counter()
+            for _ in range(solicitudes):
+                hilo = threading.Thread(target=lease.ejecutar, args=('conaf', pipeline, politica))
+                hilo.start()
+                hilos.append(hilo)
+                time.sleep(duracion / 3)
+            for hilo in hilos:
+                hilo.join()
+            filas.append((politica, solicitudes, ejecuciones[0], maximo[0], time.perf_counter() - inicio))
+        imprimir_tabla('Solicitudes solapadas ({0} cada {1:.2f} s, ejecución de {2:g} s)'.format(
+            solicitudes, duracion / 3, duracion),
+            ('política', 'solicitudes', 'ejecuciones', 'máx. simultáneas', 'total (s)'), filas)
+
+        # Lease abandonado por un proceso caído (sin renovar por más de ttl)
+        ruta = os.path.join(carpeta, 'sec.lease')
+        with open(ruta, 'w') as archivo:
+            json.dump({'pipeline': 'sec', 'token': 'caido', 'renovado': time.time() - const.LEASE_TTL_SEGUNDOS - 1}, archivo)
+        inicio = time.perf_counter()
+        tomado = lease.Lease('sec')
+        resultado = tomado.adquirir()
+        filas = [('lease vencido', 'tomado' if resultado else 'no tomado', (time.perf_counter() - inicio) * 1000)]
+        tomado.liberar()
+
+        # Una ejecución más larga que el ttl mantiene su lease gracias al heartbeat
+        ajustar(LEASE_TTL_SEGUNDOS=0.2)
+        largo = lease.Lease('agromet')
+        largo.adquirir()
+        time.sleep(0.6)
+        inicio = time.perf_counter()
+        segundo = lease.Lease('agromet')
+        resultado = segundo.adquirir()
+        filas.append(('ejecución de 3 x ttl', 'tomado' if resultado else 'no tomado',
+                      (time.perf_counter() - inicio) * 1000))
+        largo.liberar()
+        if resultado:
+            segundo.liberar()
+        imprimir_tabla('Toma de leases', ('caso', 'resultado', 'tiempo (ms)'), filas)
+
+
+def bench_importtime(carpeta=None):
+    """Costo de importación en frío (python -X importtime) de cada punto de entrada."""
+    import subprocess
+
+    carpeta = carpeta or os.path.dirname(os.path.abspath(__file__))
+    pesados = ('arcpy', 'bs4', 'requests', 'numpy')
+    filas = []
+    for modulo in ('utils', 'envia_email', 'testMail', 'mainAgromet', 'mainSec', 'mainConaf', 'mainScheduler'):
+        proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + modulo],
+                                 cwd=carpeta, capture_output=True, text=True)
+        tiempos = {}
+        for linea in proceso.stderr.splitlines():
+            partes = linea.split('|')
+            if linea.startswith('import time:') and len(partes) == 3 and partes[1].strip().isdigit():
+                tiempos[partes[2].strip()] = int(partes[1])
+        if proceso.returncode != 0:
+            error = proceso.stderr.strip().splitlines()[-1]
+            filas.append((modulo, '-', error[:60]))
+            continue
+        cargados = [p for p in pesados if p in tiempos]
+        filas.append((modulo, tiempos.get(modulo, 0) / 1000.0, ', '.join(cargados) or '-'))
+
+    imprimir_tabla('Importación en frío ({0})'.format(carpeta),
+                   ('módulo', 'tiempo (ms)', 'dependencias pesadas cargadas'), filas)
+
+
+def bench_replay(ciclos=4, *incendios):
+    """Replay de una temporada Conaf contra un servidor local: ciclos/s, etapas y memoria."""
+    import replay
+
+    replay.medir(tuple(int(i) for i in incendios) or (10, 100, 300, 1000, 5000), int(ciclos))
+
+
+BENCHMARKS = {
+    'agromet_muestras': bench_agromet_muestras,
+    'agromet_ventana': bench_agromet_ventana,
+    'agromet_join': bench_agromet_join,
+    'agromet_historial': bench_agromet_historial,
+    'buffer_viento': bench_buffer_viento,
+    'buffer_lod': bench_buffer_lod,
+    'cercania': bench_cercania,
+    'estaciones_cercanas': bench_estaciones_cercanas,
+    'sec_join': bench_sec_join,
+    'sec_ciclos': bench_sec_ciclos,
+    'sec_comunas': bench_sec_comunas,
+    'sec_historial': bench_sec_historial,
+    'http_client': bench_http_client,
+    'scheduler': bench_scheduler,
+    'lease': bench_lease,
+    'importtime': bench_importtime,
+    'replay': bench_replay,
+}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print('Benchmarks disponibles:')
+        for nombre, funcion in BENCHMARKS.items():
+            print('  {0:<24} {1}'.format(nombre, funcion.__doc__))
+        sys.exit(1)
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
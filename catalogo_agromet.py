@@ -0,0 +1,217 @@
+#-------------------------------------------------------------------------------
+# Name:         catalogo_agromet
+# Purpose:      Catálogo persistente de las variables de cada estación de Agromet.
+#               Mapea el nombre de cada variable a su idEmaVariable por estación.
+#               Solo se consultan a la API las estaciones nuevas o con error, y las
+#               entradas vencidas (TTL) se revalidan en segundo plano, registrando
+#               los cambios de ids detectados.
+#               Junto al catálogo se guarda el índice espacial (KD-tree) de las estaciones.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import unicodedata
+import threading
+import time
+import json
+import os
+import constants as const
+import logs
+import agromet
+import geometria
+
+# Palabras que identifican cada variable dentro del nombre entregado por la API
+PALABRAS_VARIABLE = {
+    'direccion_viento': ('direccion', 'viento'),
+    'humedad_media': ('humedad', 'media'),
+    'temperatura_media': ('temperatura', 'media'),
+    'velocidad_viento_max': ('velocidad', 'max'),
+    'velocidad_viento_media': ('velocidad', 'media'),
+}
+
+# Campos de la respuesta que pueden contener el nombre de la variable
+CAMPOS_NOMBRE = ('nombre', 'variable', 'nombreVariable', 'descripcion')
+
+_lock = threading.RLock()
+_catalogo = None
+_revalidacion = None
+
+
+def normalizar(texto):
+    """Quita tildes y pasa a minúsculas."""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def mapear_variables(variables):
+    """
+    Retorna {variable: idEmaVariable} a partir de la lista 'variables' de la API,
+    identificando cada variable por su nombre y no por su posición.
+    """
+    ids = {}
+    for v in variables:
+        nombre = next((v[c] for c in CAMPOS_NOMBRE if v.get(c)), None)
+        if nombre is None:
+            continue
+        nombre = normalizar(nombre)
+        for variable, palabras in PALABRAS_VARIABLE.items():
+            if variable not in ids and all(p in nombre for p in palabras):
+                ids[variable] = int(v['idEmaVariable'])
+                break
+
+    # Si la API no entrega nombres, uso el orden histórico de las variables
+    if len(ids) == 0 and not any(v.get(c) for v in variables for c in CAMPOS_NOMBRE):
+        logs.obtener_logger().info("La API de Agromet no entrega nombres de variables, se usa el orden")
+        ids = {variable: int(v['idEmaVariable']) for variable, v in zip(PALABRAS_VARIABLE, variables)}
+    return ids
+
+
+def cargar():
+    """Carga el catálogo desde disco (una vez por proceso)."""
+    global _catalogo
+    with _lock:
+        if _catalogo is None:
+            _catalogo = {}
+            if os.path.exists(const.AGROMET_CATALOGO):
+                try:
+                    with open(const.AGROMET_CATALOGO, encoding='utf-8') as f:
+                        _catalogo = json.load(f)
+                except ValueError:
+                    logs.obtener_logger().error("Catálogo de Agromet inválido, se reconstruye")
+    return _catalogo
+
+
+def guardar():
+    """Guarda el catálogo en disco (escritura atómica)."""
+    with _lock:
+        if _catalogo is None:
+            return
+        archivo = const.AGROMET_CATALOGO
+        temporal = archivo + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(_catalogo, f, ensure_ascii=False, indent=1)
+        os.replace(temporal, archivo)
+
+
+def consultar_estacion(id_estacion, url_base=None):
+    """Consulta las variables de una estación. Retorna {variable: id} o None si falla."""
+    params = {'ema': id_estacion, 'user': agromet.userkey_agromet}
+    data = agromet.get_json((url_base or agromet.url_agromet) + 'variables', params)
+    if data is None or not data.get('variables'):
+        return None
+    ids = mapear_variables(data['variables'])
+    if len(ids) == 0:
+        return None
+    return ids
+
+
+def refrescar(ids_estaciones, url_base=None, max_workers=None):
+    """
+    Consulta en paralelo las variables de las estaciones indicadas y actualiza el catálogo.
+    Retorna la cantidad de estaciones cuyos ids cambiaron.
+    """
+    ids_estaciones = [str(i) for i in ids_estaciones]
+    if len(ids_estaciones) == 0:
+        return 0
+
+    def consultar(contexto, id_estacion):
+        return contexto.run(consultar_estacion, id_estacion, url_base)
+
+    contextos = [contextvars.copy_context() for _ in ids_estaciones]
+    with ThreadPoolExecutor(max_workers=max_workers or const.AGROMET_CONCURRENCIA) as executor:
+        resultados = list(executor.map(consultar, contextos, ids_estaciones))
+
+    catalogo = cargar()
+    cambios = 0
+    ahora = time.time()
+    with _lock:
+        for id_estacion, ids in zip(ids_estaciones, resultados):
+            anterior = catalogo.get(id_estacion)
+            if ids is None:
+                # Conservo los ids anteriores, pero marco la estación para reintentarla
+                entrada = anterior or {'variables': {}}
+                entrada['error'] = True
+                entrada['actualizado'] = entrada.get('actualizado', 0)
+                catalogo[id_estacion] = entrada
+                continue
+            if anterior is not None and anterior.get('variables') and anterior['variables'] != ids:
+                cambios += 1
+                logs.obtener_logger().info("Cambio de variables en estación {0}".format(id_estacion),
+                                           extra={'datos': {'antes': anterior['variables'], 'ahora': ids}})
+            catalogo[id_estacion] = {'variables': ids, 'actualizado': ahora, 'error': False}
+
+    guardar()
+    return cambios
+
+
+def pendientes(ids_estaciones):
+    """Retorna las estaciones nuevas o cuya consulta falló."""
+    catalogo = cargar()
+    return [i for i in ids_estaciones if str(i) not in catalogo or catalogo[str(i)].get('error')]
+
+
+def vencidas(ids_estaciones):
+    """Retorna las estaciones cuya entrada superó el TTL."""
+    catalogo = cargar()
+    limite = time.time() - const.AGROMET_CATALOGO_TTL_HORAS * 3600
+    return [i for i in ids_estaciones if str(i) in catalogo and catalogo[str(i)].get('actualizado', 0) < limite]
+
+
+def revalidar_en_segundo_plano(ids_estaciones, url_base=None):
+    """Revalida en un hilo en segundo plano las entradas vencidas del catálogo."""
+    global _revalidacion
+    ids = vencidas(ids_estaciones)
+    if len(ids) == 0 or (_revalidacion is not None and _revalidacion.is_alive()):
+        return None
+    contexto = contextvars.copy_context()
+    _revalidacion = threading.Thread(target=contexto.run, args=(refrescar, ids, url_base),
+                                     name='revalidacion-catalogo-agromet', daemon=True)
+    _revalidacion.start()
+    return _revalidacion
+
+
+def esperar_revalidacion(timeout=None):
+    """Espera que termine la revalidación en segundo plano (al finalizar el proceso)."""
+    if _revalidacion is not None:
+        _revalidacion.join(timeout)
+
+
+def guardar_indice(ids_estaciones, lons, lats):
+    """Construye y guarda el KD-tree de las estaciones. Retorna el árbol."""
+    arbol = geometria.ArbolKD(lons, lats, ids_estaciones)
+    arbol.guardar(const.AGROMET_INDICE)
+    return arbol
+
+
+def cargar_indice():
+    """Retorna el KD-tree de las estaciones guardado, o None si no existe o es inválido."""
+    if not os.path.exists(const.AGROMET_INDICE):
+        return None
+    try:
+        return geometria.ArbolKD.cargar(const.AGROMET_INDICE)
+    except (OSError, ValueError, KeyError):
+        logs.obtener_logger().error("Índice de estaciones de Agromet inválido, se ignora")
+        return None
+
+
+def obtener_variables(ids_estaciones, url_base=None):
+    """
+    Retorna {id_estacion: {variable: idEmaVariable}} desde el catálogo.
+    Consulta antes las estaciones nuevas o con error, y revalida en segundo plano las vencidas.
+    """
+    nuevas = pendientes(ids_estaciones)
+    if len(nuevas) > 0:
+        logs.obtener_logger().info("Consultando variables de {0} estaciones nuevas o con error".format(len(nuevas)))
+        refrescar(nuevas, url_base)
+
+    revalidar_en_segundo_plano(ids_estaciones, url_base)
+
+    catalogo = cargar()
+    with _lock:
+        return {i: dict(catalogo[str(i)]['variables']) for i in ids_estaciones
+                if str(i) in catalogo and catalogo[str(i)].get('variables')}
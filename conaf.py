@@ -0,0 +1,111 @@
+#-------------------------------------------------------------------------------
+# Name:         conaf
+# Purpose:      Lectura de los datos de incendios de Conaf sin arcpy: placemarks del KML,
+#               ficha de cada incendio (popup.php) y agrupación de las instalaciones
+#               afectadas para las alertas. Lo usan mainConaf y el arnés de replay.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import constants as const
+import diferido
+import http_client
+
+bs4 = diferido.importar('bs4')
+
+#-------------------------------------------------------------------------------
+# Configuracion CONAF
+#-------------------------------------------------------------------------------
+# Namespace del KML
+NMSP = '{http://www.opengis.net/kml/2.2}'
+# Ficha (iframe) de cada incendio
+url_popup = const.URL_POPUP_CONAF
+key_conaf = const.KEY_CONAF
+
+
+def leer_kml(data):
+    """
+    Retorna los placemarks del KML de Conaf (ElementTree o Element) como
+    [{'id_incendio', 'nombre_incendio', 'coordenadas': [(lon, lat), ...]}].
+    Los placemarks sin punto se retornan con 'coordenadas' vacío.
+    """
+    placemarks = []
+    for pm in data.iterfind('.//{0}Placemark'.format(NMSP)):
+        coordenadas = []
+        for ls in pm.iterfind('{0}Point/{0}coordinates'.format(NMSP)):
+            longitud, latitud = ls.text.strip().split(',')[:2]
+            coordenadas.append((float(longitud), float(latitud)))
+        placemarks.append({
+            'id_incendio': pm.find('{0}ExtendedData/{0}SchemaData/{0}SimpleData'.format(NMSP)).text,
+            'nombre_incendio': pm.find('{0}name'.format(NMSP)).text,
+            'coordenadas': coordenadas,
+        })
+    return placemarks
+
+
+def descargar_popup(id_incendio, url=None):
+    """Retorna el html de la ficha del incendio (bytes), o None si no se pudo obtener."""
+    respuesta = http_client.get(url or url_popup, params={'id': id_incendio, 'key': key_conaf})
+    return respuesta.content if respuesta is not None else None
+
+
+def leer_popup(html, id_incendio):
+    """
+    Retorna [fecha_inicio, comuna, superficie, estado] desde el html de la ficha del incendio
+    (lista vacía si la ficha no contiene el incendio).
+    """
+    sopa = bs4.BeautifulSoup(html, "html.parser")
+
+    # Busco sobre el div dentro del iframe que contiene la información adicional del incendio.
+    entradas = sopa.find_all('div', {'id': 'tabla-ficha-' + id_incendio + '_div'})
+
+    data = []
+    for entrada in entradas:
+        # fecha y hora de inicio del incendio
+        data.append(entrada.find('span', {'class': 'incendio-fecha'}).getText())
+        # comuna del incendio
+        data.append(entrada.find('span', {'class': 'incendio-comuna'}).getText())
+        # superficie afectada
+        data.append(entrada.find('span', {'class': 'incendio-superficie'}).getText())
+        # Estado del incendio
+        data.append(entrada.find('strong').getText())
+    return data
+
+
+def ordenar_por_cercania(instalaciones):
+    """Ordena las instalaciones por distancia al incendio (near_dist); las sin distancia quedan al final."""
+    return sorted(instalaciones, key=lambda i: (i.get('near_dist') is None, i.get('near_dist') or 0))
+
+
+def agrupar_por_incendio(instalaciones):
+    """
+    Agrupa por incendio (id_incendio) la data de las instalaciones afectadas, ordenada por
+    cercanía: primero los incendios con la instalación más cercana y, en cada uno, las
+    instalaciones de la más cercana a la más lejana.
+    """
+    data = {}
+    for instalacion in ordenar_por_cercania(instalaciones):
+        if instalacion['id_incendio'] == '':
+            continue
+        grupo = data.get(instalacion['id_incendio'])
+        if grupo is None:
+            grupo = data[instalacion['id_incendio']] = {
+                'comuna': instalacion['comuna_incendio'],
+                'superficie': instalacion['superficie_incendio'],
+                'instalaciones': [],
+            }
+        grupo['instalaciones'].append(instalacion)
+    return data
+
+
+def agrupar_por_correo(instalaciones):
+    """Agrupa por mail (E_MAIL) la data de las instalaciones afectadas (conserva el orden recibido)."""
+    data = {}
+    for instalacion in instalaciones:
+        if instalacion['e_mail'] == '':
+            continue
+        data.setdefault(instalacion['e_mail'], {'instalaciones': []})['instalaciones'].append(instalacion)
+    return data
@@ -10,25 +10,264 @@
 #-------------------------------------------------------------------------------
 
 from decouple import config
+import os
+
+# Ruta absoluta del script (base de las rutas relativas del .env)
+script_dir = os.path.dirname(__file__)
+
+
+def _env(nombre, **opciones):
+    """Retorna la definición de un valor del .env (se lee al resolverse)."""
+    return lambda ajustes: config(nombre, **opciones)
+
+
+def _ruta(nombre, default):
+    """Como _env, para archivos y carpetas: una ruta relativa se resuelve desde la carpeta del script."""
+    return lambda ajustes: os.path.join(script_dir, config(nombre, default=default))
+
+
+def _lista(valor):
+    """Cast de una lista separada por comas."""
+    return [v.strip() for v in valor.split(',') if v.strip()]
+
+
+def _niveles_detalle(tolerancias, escalas):
+    """Retorna los pares (tolerancia, escala) de los niveles de detalle; ambas listas deben tener el mismo largo."""
+    if not tolerancias or len(tolerancias) != len(escalas):
+        raise ValueError(
+            "BUFFER_VISOR_LOD_TOLERANCIAS_M ({0} valores) y BUFFER_VISOR_LOD_ESCALAS ({1} valores) deben "
+            "definir la misma cantidad de niveles de detalle (al menos uno)".format(len(tolerancias), len(escalas)))
+    return list(zip(tolerancias, escalas))
+
+
+class Ajustes:
+    """
+    Configuración del proyecto. Cada valor se resuelve desde el .env (o variables de
+    entorno) en su primer acceso y queda cacheado, de modo que importar un módulo no
+    exige que el .env tenga todas las variables. recargar() vuelve a leerlas.
+    """
+
+    def __init__(self, definiciones):
+        self._definiciones = definiciones
+        self._valores = {}
+
+    def __getattr__(self, nombre):
+        if nombre.startswith('_'):
+            raise AttributeError(nombre)
+        try:
+            return self._valores[nombre]
+        except KeyError:
+            pass
+        if nombre not in self._definiciones:
+            raise AttributeError("Configuración desconocida: {0}".format(nombre))
+        valor = self._valores[nombre] = self._definiciones[nombre](self)
+        return valor
+
+    def __dir__(self):
+        return list(self._definiciones)
+
+    def recargar(self):
+        """Descarta los valores resueltos (se vuelven a leer en el próximo acceso)."""
+        self._valores.clear()
+
+
+ajustes = Ajustes({
+    # **********************************************************************************************
+    # Workspace
+    'WORKSPACE': _env('FOLDER_WORKSPACE'),
+    'WORKSPACE_LOCAL': _env('FOLDER_WORKSPACE_LOCAL'),
+    'DATASET': _env('WORKSPACE_DATASET'),
+    'DATASET_MINISTERIO': _env('WORKSPACE_DATASET_CAPAS_MINISTERIO'),
+    'USER_DATOS': _env('USER_GEODATOS'),
+    'USER_DATOS_SCRIPT': _env('USER_GEODATOS_SCRIPT'),
+    # **********************************************************************************************
+
+    # **********************************************************************************************
+    # Conaf
+    'URL_FILE_CONAF': _env('FILE_CONAF_KML'),
+    # Condición que indica si se va a urilizar un archivo kml local o la api de conaf
+    # para obtener los incendios
+    'USE_FILE_KML': _env('USE_FILE_KML'),
+    # **********************************************************************************************
+
+    # **********************************************************************************************
+    # Correo
+    'EMAIL_HOST': _env('EMAIL_HOST'),
+    'EMAIL_PORT': _env('EMAIL_PORT'),
+    'EMAIL_USERNAME': _env('EMAIL_USERNAME'),
+    'EMAIL_PASSWORD': _env('EMAIL_PASSWORD'),
+    'EMAIL_TO_ADMIN': _env('EMAIL_TO_ADMIN'),
+    'EMAIL_FROM': _env('EMAIL_FROM'),
+    # Flag para enviar o no el mail
+    'EMAIL_SEND': _env('EMAIL_SEND'),
+    # **********************************************************************************************
+
+    # **********************************************************************************************
+    # Buffer incendios
+    # 'fijo': círculo de BUFFER_DISTANCIA_KM, 'viento': elipse elongada según el viento de la estación más cercana
+    'BUFFER_MODO': _env('BUFFER_MODO', default='fijo'),
+    'BUFFER_DISTANCIA_KM': _env('BUFFER_DISTANCIA_KM', default=2, cast=float),
+    # Distancia máxima (km) a la estación meteorológica para usar su viento
+    'BUFFER_VIENTO_MAX_KM': _env('BUFFER_VIENTO_MAX_KM', default=50, cast=float),
+    # Velocidad del viento (unidad de Agromet) que duplica la elongación del buffer, y elongación máxima
+    'BUFFER_VIENTO_REFERENCIA': _env('BUFFER_VIENTO_REFERENCIA', default=20, cast=float),
+    'BUFFER_VIENTO_ELONGACION_MAX': _env('BUFFER_VIENTO_ELONGACION_MAX', default=3, cast=float),
+    # Vértices de los buffers publicados en el visor: densificación de las curvas (desviación máxima
+    # en grados, 0 = la de arcpy)
+    'BUFFER_VISOR_DENSIFICAR_GRADOS': _env('BUFFER_VISOR_DENSIFICAR_GRADOS', default=0, cast=float),
+    # Niveles de detalle del buffer visor: tolerancia de simplificación (metros, 0 = geometría completa)
+    # y escala mínima (denominador) desde la que el visor muestra cada nivel
+    'BUFFER_VISOR_LOD_TOLERANCIAS_M': _env('BUFFER_VISOR_LOD_TOLERANCIAS_M', default='0',
+                                           cast=lambda v: [float(t) for t in v.split(',') if t.strip()]),
+    'BUFFER_VISOR_LOD_ESCALAS': _env('BUFFER_VISOR_LOD_ESCALAS', default='0',
+                                     cast=lambda v: [int(e) for e in v.split(',') if e.strip()]),
+    # Pares (tolerancia, escala mínima) de cada nivel de detalle
+    'BUFFER_VISOR_LODS': lambda a: _niveles_detalle(a.BUFFER_VISOR_LOD_TOLERANCIAS_M, a.BUFFER_VISOR_LOD_ESCALAS),
+    # **********************************************************************************************
+
+    'INCENDIOS': lambda a: a.USER_DATOS_SCRIPT + "INCENDIOS_CONAF",
+    # Capa con puntos afectados
+    'PUNTOS_AFECTADOS': lambda a: a.USER_DATOS_SCRIPT + "PUNTOS_AFECTADOS",
+    # Capa con lineas afectadas
+    'LINEAS_AFECTADAS': lambda a: a.USER_DATOS_SCRIPT + "LINEAS_AFECTADAS",
+    # Capa de lectura de incendios de AGOL
+    'BUFFER_VISOR': lambda a: a.USER_DATOS_SCRIPT + 'output_buffer_visor',
+    # Estaciones meteorológicas
+    'ESTACIONES_METEOROLOGICAS': lambda a: a.USER_DATOS_SCRIPT + "ESTACIONES_METEOROLOGICAS",
+    # Capa comunas
+    'COMUNAS_SEC': lambda a: a.USER_DATOS_SCRIPT + "BASE_COMUNA_SEC",
+
+    # Tables siggre
+    'TABLES_SIGGRE': lambda a: ['{0}{1}'.format(a.USER_DATOS, tabla) for tabla in TABLAS_SIGGRE],
+
+    # **********************************************************************************************
+    # Agromet
+    # Cantidad máxima de peticiones simultáneas a la API
+    'AGROMET_CONCURRENCIA': _env('AGROMET_CONCURRENCIA', default=16, cast=int),
+    # Timeout por petición (segundos)
+    'AGROMET_TIMEOUT': _env('AGROMET_TIMEOUT', default=10, cast=float),
+    # Cantidad de reintentos ante errores de red o respuestas 5xx
+    'AGROMET_REINTENTOS': _env('AGROMET_REINTENTOS', default=3, cast=int),
+    # 'ultima': consulta solo una ventana alrededor de la hora consultada, 'dia': consulta el día completo
+    'AGROMET_MODO_CONSULTA': _env('AGROMET_MODO_CONSULTA', default='ultima'),
+    # Minutos hacia atrás y hacia adelante de la hora consultada en modo 'ultima'
+    'AGROMET_VENTANA_MINUTOS': _env('AGROMET_VENTANA_MINUTOS', default=30, cast=int),
+    # Archivo con la fecha de la última muestra leída por variable
+    'AGROMET_ESTADO': _ruta('AGROMET_ESTADO', 'agromet_estado.json'),
+    # Catálogo de variables por estación e índice espacial de las estaciones (se reconstruye en
+    # cada actualización de Agromet)
+    'AGROMET_CATALOGO': _ruta('AGROMET_CATALOGO', 'agromet_catalogo.json'),
+    'AGROMET_INDICE': _ruta('AGROMET_INDICE', 'agromet_estaciones.npz'),
+    # Tiempo de vida de una entrada del catálogo antes de revalidarla (horas)
+    'AGROMET_CATALOGO_TTL_HORAS': _env('AGROMET_CATALOGO_TTL_HORAS', default=24 * 7, cast=float),
+    # Historial de muestras y días que se conservan las particiones
+    'AGROMET_HISTORIAL_DIR': _ruta('AGROMET_HISTORIAL_DIR', 'historial_agromet'),
+    'AGROMET_HISTORIAL_RETENCION_DIAS': _env('AGROMET_HISTORIAL_RETENCION_DIAS', default=365, cast=int),
+    # **********************************************************************************************
+
+    # **********************************************************************************************
+    # SEC
+    # Timeout por petición (segundos)
+    'SEC_TIMEOUT': _env('SEC_TIMEOUT', default=30, cast=float),
+    # Índice local de nombres de comunas
+    'SEC_INDICE_COMUNAS': _ruta('SEC_INDICE_COMUNAS', 'sec_comunas.json'),
+    # Archivo JSON opcional con alias adicionales {"nombre SEC": "nombre en la capa"}
+    'SEC_ALIAS_COMUNAS': _env('SEC_ALIAS_COMUNAS', default=''),
+    # Similitud mínima (0 a 1) para la coincidencia aproximada; 0 la desactiva
+    'SEC_FUZZY_CORTE': _env('SEC_FUZZY_CORTE', default=0.88, cast=float),
+    # Historial de clientes afectados y peticiones simultáneas a GetPorFecha al recargar un rango de fechas
+    'SEC_HISTORIAL_DIR': _ruta('SEC_HISTORIAL_DIR', 'historial_sec'),
+    'SEC_BACKFILL_CONCURRENCIA': _env('SEC_BACKFILL_CONCURRENCIA', default=8, cast=int),
+    # **********************************************************************************************
+
+    # **********************************************************************************************
+    # Cliente http
+    # Timeout por defecto de cada petición (segundos)
+    'HTTP_TIMEOUT': _env('HTTP_TIMEOUT', default=15, cast=float),
+    # Reintentos por defecto ante errores de red o respuestas 5xx
+    'HTTP_REINTENTOS': _env('HTTP_REINTENTOS', default=2, cast=int),
+    # Conexiones keep-alive por host
+    'HTTP_POOL': _env('HTTP_POOL', default=16, cast=int),
+    # Peticiones fallidas consecutivas (ya agotados sus reintentos) que abren el circuito de un host
+    # y segundos que permanece abierto
+    'HTTP_CIRCUITO_FALLOS': _env('HTTP_CIRCUITO_FALLOS', default=5, cast=int),
+    'HTTP_CIRCUITO_ESPERA': _env('HTTP_CIRCUITO_ESPERA', default=60, cast=float),
+    # **********************************************************************************************
+
+    # **********************************************************************************************
+    # Edición y publicación
+    # Las capas del dataset están versionadas (sesión de edición multiusuario)
+    'EDICION_VERSIONADA': _env('EDICION_VERSIONADA', default=True, cast=bool),
+    # Publicación de las capas del visor: 'directa' (sesión de edición sobre la versión publicada) o
+    # 'version' (se construye en una versión hija y se publica con reconcile y post)
+    'PUBLICACION_MODO': _env('PUBLICACION_MODO', default='directa'),
+    # Versión hija donde se construye el resultado y versión publicada (la que leen los servicios)
+    'PUBLICACION_VERSION': _env('PUBLICACION_VERSION', default='VISOR_STAGING'),
+    'PUBLICACION_VERSION_PADRE': _env('PUBLICACION_VERSION_PADRE', default='sde.DEFAULT'),
+    # Archivo de conexión (.sde) a la versión hija: la sesión de edición del modo 'version' se abre sobre él
+    'PUBLICACION_CONEXION': _env('PUBLICACION_CONEXION', default=''),
+    # **********************************************************************************************
+
+    # **********************************************************************************************
+    # Leases
+    # Carpeta local con los archivos de lease
+    'LEASE_DIR': _ruta('LEASE_DIR', 'leases'),
+    # Segundos sin renovar tras los que un lease se considera abandonado (el heartbeat renueva cada ttl / 3)
+    'LEASE_TTL_SEGUNDOS': _env('LEASE_TTL_SEGUNDOS', default=120, cast=float),
+    # Política por pipeline cuando ya hay una ejecución en curso: 'omitir' o 'agrupar'
+    'LEASE_POLITICAS': lambda a: {
+        'conaf': config('LEASE_POLITICA_CONAF', default='agrupar'),
+        'sec': config('LEASE_POLITICA_SEC', default='omitir'),
+        'agromet': config('LEASE_POLITICA_AGROMET', default='omitir'),
+    },
+    # Carpeta de las FileGDB temporales de cada ejecución (por defecto, junto a FOLDER_WORKSPACE_LOCAL)
+    'LEASE_CARPETA_TEMPORAL': _env('LEASE_CARPETA_TEMPORAL', default=''),
+    # **********************************************************************************************
+
+    # **********************************************************************************************
+    # Scheduler
+    # Pipelines que ejecuta el scheduler
+    'SCHEDULER_PIPELINES': _env('SCHEDULER_PIPELINES', default='conaf,sec,agromet', cast=_lista),
+    # Intervalo entre ejecuciones de cada pipeline (minutos)
+    'SCHEDULER_INTERVALOS': lambda a: {
+        'conaf': config('SCHEDULER_CONAF_MINUTOS', default=10, cast=float),
+        'sec': config('SCHEDULER_SEC_MINUTOS', default=20, cast=float),
+        'agromet': config('SCHEDULER_AGROMET_MINUTOS', default=60, cast=float),
+    },
+    # Ejecuta un solo pipeline a la vez: arcpy.env y la sesión de geoprocesamiento son del proceso
+    'SCHEDULER_EXCLUSIVO': _env('SCHEDULER_EXCLUSIVO', default=True, cast=bool),
+    # **********************************************************************************************
+
+    # **********************************************************************************************
+    # Logs y métricas
+    # Archivos de salida (JSON lines, un registro por línea): uno por pipeline y día, p. ej. log-conaf-2026-10-19.txt
+    'LOG_FILE': _env('LOG_FILE', default='log.txt'),
+    'ERROR_LOG_FILE': _env('ERROR_LOG_FILE', default='error-log.txt'),
+    # Días de logs que se conservan por pipeline
+    'LOG_RESPALDOS': _env('LOG_RESPALDOS', default=10, cast=int),
+    # 'archivo' (textfile collector), 'puerto' (servidor http local) o 'ninguno'
+    'METRICAS_MODO': _env('METRICAS_MODO', default='archivo'),
+    'METRICAS_TEXTFILE_DIR': _ruta('METRICAS_TEXTFILE_DIR', 'metricas'),
+    'METRICAS_PUERTO': _env('METRICAS_PUERTO', default=9464, cast=int),
+    # Carpeta donde se guardan los resúmenes de etapas por ejecución
+    'METRICAS_DIR': _ruta('METRICAS_DIR', 'metricas'),
+    # **********************************************************************************************
+})
+
+
+def __getattr__(nombre):
+    """Los valores configurables se leen desde 'ajustes' (const.WORKSPACE, const.INCENDIOS, ...)."""
+    try:
+        return getattr(ajustes, nombre)
+    except AttributeError:
+        raise AttributeError("module 'constants' has no attribute '{0}'".format(nombre)) from None
 
-# **********************************************************************************************
-# Workspace
-WORKSPACE = config('FOLDER_WORKSPACE')
-WORKSPACE_LOCAL = config('FOLDER_WORKSPACE_LOCAL')
-DATASET = config('WORKSPACE_DATASET')
-DATASET_MINISTERIO = config('WORKSPACE_DATASET_CAPAS_MINISTERIO')
-USER_DATOS = config('USER_GEODATOS')
-USER_DATOS_SCRIPT = config('USER_GEODATOS_SCRIPT')
-# **********************************************************************************************
 
 # **********************************************************************************************
 # Conaf
-URL_FILE_CONAF = config('FILE_CONAF_KML')
 URL_API_CONAF = "http://sidco.conaf.cl/mapa/data-minagri.php?key=mEiNnE2k18"
-
-# Condición que indica si se va a urilizar un archivo kml local o la api de conaf
-# para obtener los incendios
-USE_FILE_KML = config('USE_FILE_KML')
+URL_POPUP_CONAF = "http://sidco.conaf.cl/mapa/popup.php"
+KEY_CONAF = "mEiNnE2k18"
 # **********************************************************************************************
 
 # **********************************************************************************************
@@ -41,37 +280,24 @@ USERKEY_AGROMET = "9532d75b835b8074ff3407fd701bd9ba1e8d292d"
 # SEC
 URL_API_SEC = "https://apps.sec.cl/IntEnLineaBetaV50/ClientesAfectados/GetPorFecha"
 # **********************************************************************************************
-# **********************************************************************************************
 
-INCENDIOS = USER_DATOS_SCRIPT + "INCENDIOS_CONAF"
-# Capa con puntos afectados
-PUNTOS_AFECTADOS = USER_DATOS_SCRIPT + "PUNTOS_AFECTADOS"
-# Capa con lineas afectadas
-LINEAS_AFECTADAS = USER_DATOS_SCRIPT + "LINEAS_AFECTADAS"
 # Capa de salida del buffer por cada incendio
 BUFFER_INCENDIOS = 'output_buffer'
-# Capa de lectura de incendios de AGOL
-BUFFER_VISOR = USER_DATOS_SCRIPT + 'output_buffer_visor'
-# Estaciones meteorológicas
-ESTACIONES_METEOROLOGICAS = USER_DATOS_SCRIPT + "ESTACIONES_METEOROLOGICAS"
-# Capa comunas
-COMUNAS_SEC = USER_DATOS_SCRIPT + "BASE_COMUNA_SEC"
-
-
-# Tables siggre
-TABLES_SIGGRE = [
-    '{0}IE_GENERACION'.format(USER_DATOS), 
-    '{0}IE_TAP_OFF'.format(USER_DATOS), 
-    '{0}IE_CONCESION_ELECTRICA'.format(USER_DATOS), 
-    '{0}IE_LINEA_DE_TRANSMISION'.format(USER_DATOS), 
-    '{0}IE_SUBESTACION'.format(USER_DATOS), 
-    '{0}IE_ALIMENTADOR'.format(USER_DATOS), 
-    '{0}IHC_OLEODUCTO'.format(USER_DATOS), 
-    '{0}IHC_GASODUCTO'.format(USER_DATOS), 
-    '{0}IHC_TERMINAL_MARITIMO'.format(USER_DATOS), 
-    '{0}IHC_ALMACENAMIENTO_DE_COMBUSTIBLE'.format(USER_DATOS), 
-    '{0}IHC_PLANTA_SATELITE_DE_REGASIFICACION'.format(USER_DATOS), 
-    '{0}IHC_ESTACION_DE_SERVICIO'.format(USER_DATOS), 
+
+# Tablas siggre (sin el prefijo USER_DATOS, ver TABLES_SIGGRE en ajustes)
+TABLAS_SIGGRE = [
+    'IE_GENERACION',
+    'IE_TAP_OFF',
+    'IE_CONCESION_ELECTRICA',
+    'IE_LINEA_DE_TRANSMISION',
+    'IE_SUBESTACION',
+    'IE_ALIMENTADOR',
+    'IHC_OLEODUCTO',
+    'IHC_GASODUCTO',
+    'IHC_TERMINAL_MARITIMO',
+    'IHC_ALMACENAMIENTO_DE_COMBUSTIBLE',
+    'IHC_PLANTA_SATELITE_DE_REGASIFICACION',
+    'IHC_ESTACION_DE_SERVICIO',
 ]
 
 LINE_TABLES = [
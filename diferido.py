@@ -0,0 +1,59 @@
+#-------------------------------------------------------------------------------
+# Name:         diferido
+# Purpose:      Importación diferida de módulos pesados (arcpy, bs4, requests, numpy).
+#               El proxy retornado por importar() carga el módulo en el primer acceso
+#               a uno de sus atributos, de modo que importar utils o envia_email no
+#               paga el inicio de ArcGIS si la herramienta no lo necesita.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import importlib
+import threading
+import sys
+
+_lock = threading.Lock()
+
+
+class ModuloDiferido:
+    """Proxy de un módulo que se importa en el primer acceso a un atributo."""
+
+    def __init__(self, nombre):
+        object.__setattr__(self, '_nombre', nombre)
+        object.__setattr__(self, '_modulo', None)
+
+    def _cargar(self):
+        modulo = self._modulo
+        if modulo is None:
+            with _lock:
+                modulo = self._modulo
+                if modulo is None:
+                    modulo = importlib.import_module(self._nombre)
+                    object.__setattr__(self, '_modulo', modulo)
+        return modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._cargar(), atributo)
+
+    def __setattr__(self, atributo, valor):
+        setattr(self._cargar(), atributo, valor)
+
+    def __dir__(self):
+        return dir(self._cargar())
+
+    def __repr__(self):
+        estado = 'cargado' if self._modulo is not None else 'sin cargar'
+        return '<módulo diferido {0} ({1})>'.format(self._nombre, estado)
+
+
+def importar(nombre):
+    """Retorna el módulo si ya está importado, o un proxy que lo importa en el primer uso."""
+    return sys.modules.get(nombre) or ModuloDiferido(nombre)
+
+
+def cargado(nombre):
+    """Indica si el módulo ya fue importado en el proceso."""
+    return nombre in sys.modules
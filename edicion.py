@@ -0,0 +1,268 @@
+#-------------------------------------------------------------------------------
+# Name:         edicion
+# Purpose:      Unidad de trabajo de un ciclo sobre las capas publicadas en el visor
+#               (buffers, puntos y líneas afectadas). Los truncados, eliminaciones e
+#               inserciones se acumulan por capa y se confirman juntos en una sola
+#               sesión de edición (arcpy.da.Editor), de modo que el visor nunca muestra
+#               capas a medio truncar. Si una etapa que alimenta la publicación falla,
+#               la unidad se descarta y las capas quedan como en el ciclo anterior.
+#               Con PUBLICACION_MODO = 'version' el resultado se construye en una versión
+#               hija (fuera de la versión que leen los servicios), editándola a través de su
+#               propia conexión (PUBLICACION_CONEXION), y se publica con un post.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import contextvars
+import traceback
+import time
+import os
+import constants as const
+import diferido
+import logs
+import spans
+import metricas
+
+arcpy = diferido.importar('arcpy')
+
+_unidad_actual = contextvars.ContextVar('unidad_de_trabajo', default=None)
+
+
+class UnidadDeTrabajo:
+    """Ediciones pendientes por capa del dataset: truncar, eliminar por valor de un campo e insertar filas."""
+
+    def __init__(self, workspace, dataset=None):
+        self.workspace = workspace
+        self.dataset = dataset or const.DATASET
+        self.capas = {}
+        self.fallos = []
+
+    def _capa(self, capa):
+        cambios = self.capas.get(capa)
+        if cambios is None:
+            cambios = self.capas[capa] = {'truncar': False, 'eliminar': {}, 'campos': None, 'filas': []}
+        return cambios
+
+    def truncar(self, capa):
+        """Elimina todas las filas de la capa (y lo pendiente de insertar hasta ahora)."""
+        cambios = self._capa(capa)
+        cambios['truncar'] = True
+        cambios['eliminar'].clear()
+        cambios['filas'] = []
+
+    def eliminar(self, capa, campo, valores):
+        """Elimina las filas de la capa cuyo campo tenga alguno de los valores."""
+        if not valores:
+            return
+        cambios = self._capa(capa)
+        if not cambios['truncar']:
+            cambios['eliminar'].setdefault(campo, set()).update(valores)
+
+    def insertar(self, capa, campos, filas):
+        """Inserta filas (tuplas en el orden de campos) en la capa."""
+        cambios = self._capa(capa)
+        if cambios['campos'] is not None and cambios['campos'] != list(campos):
+            raise ValueError("Campos distintos para la capa {0}: {1}".format(capa, campos))
+        cambios['campos'] = list(campos)
+        cambios['filas'].extend(filas)
+
+    def fallo(self, etapa):
+        """Registra el fallo de una etapa: la unidad no se confirmará."""
+        self.fallos.append(etapa)
+
+    def pendientes(self):
+        return any(c['truncar'] or c['eliminar'] or c['filas'] for c in self.capas.values())
+
+    def _aplicar(self, fc, cambios):
+        filas = 0
+        if cambios['truncar']:
+            # TruncateTable no se permite en capas versionadas ni dentro de una sesión de edición
+            with arcpy.da.UpdateCursor(fc, ['OID@']) as cursor:
+                for _ in cursor:
+                    cursor.deleteRow()
+                    filas += 1
+        for campo, valores in cambios['eliminar'].items():
+            if not valores:
+                continue
+            expression = clausula_in(fc, campo, valores)
+            with arcpy.da.UpdateCursor(fc, [campo], where_clause=expression) as cursor:
+                for _ in cursor:
+                    cursor.deleteRow()
+                    filas += 1
+        if cambios['filas']:
+            with arcpy.da.InsertCursor(fc, cambios['campos']) as cursor:
+                for fila in cambios['filas']:
+                    cursor.insertRow(fila)
+            filas += len(cambios['filas'])
+        return filas
+
+    def confirmar(self):
+        """
+        Aplica las ediciones pendientes y las confirma (según PUBLICACION_MODO). Si alguna
+        etapa falló o la edición falla, se revierte todo. Retorna True si se confirmó.
+        """
+        if self.fallos:
+            self.descartar()
+            print("Edición descartada por fallo en: " + ', '.join(self.fallos))
+            logs.obtener_logger().warning("Edición descartada por fallo en: " + ', '.join(self.fallos))
+            metricas.incrementar('ediciones_total', resultado='descartada')
+            self.fallos = []
+            return False
+        if not self.pendientes():
+            return True
+
+        try:
+            if const.PUBLICACION_MODO == 'version':
+                self._publicar_version()
+            else:
+                self._confirmar_directa()
+        except:
+            print("Failed confirmar edición (%s)" % traceback.format_exc())
+            logs.obtener_logger().error("Failed confirmar edición ({0})".format(traceback.format_exc()))
+            metricas.incrementar('ediciones_total', resultado='revertida')
+            return False
+        finally:
+            self.capas = {}
+
+        metricas.incrementar('ediciones_total', resultado='confirmada')
+        return True
+
+    def _editar(self, destinos, workspace=None):
+        """Aplica los cambios de cada capa sobre su destino en una sesión de edición del workspace."""
+        editor = arcpy.da.Editor(workspace or self.workspace)
+        try:
+            editor.startEditing(False, const.EDICION_VERSIONADA)
+            editor.startOperation()
+            for capa, cambios in self.capas.items():
+                spans.anotar(filas=self._aplicar(destinos[capa], cambios))
+            editor.stopOperation()
+            editor.stopEditing(True)
+        except:
+            if editor.isEditing:
+                try:
+                    editor.abortOperation()
+                except:
+                    pass
+                editor.stopEditing(False)
+            raise
+
+    def _confirmar_directa(self):
+        """Edita las capas publicadas en una sesión de edición sobre la versión de la conexión."""
+        with spans.span('confirmar_edicion', capas=len(self.capas)):
+            inicio = time.perf_counter()
+            try:
+                self._editar({capa: os.path.join(self.workspace, self.dataset, capa) for capa in self.capas})
+            finally:
+                metricas.observar('edicion_confirmacion_segundos', time.perf_counter() - inicio)
+
+    def _publicar_version(self):
+        """
+        Construye el resultado en una versión hija (PUBLICACION_VERSION) creada desde la versión
+        publicada y lo publica con reconcile y post: los lectores de la versión publicada ven el
+        estado anterior hasta el post, y luego el nuevo completo. La sesión de edición se abre
+        sobre la conexión a la versión hija (PUBLICACION_CONEXION). Si algo falla o el post no
+        se realiza (conflictos), la versión hija se elimina y la publicada queda intacta.
+        """
+        conexion = conexion_hija()
+        nombre = None
+        try:
+            with spans.span('construir_version', capas=len(self.capas)):
+                inicio = time.perf_counter()
+                nombre = preparar_version(self.workspace)
+                self._editar({capa: os.path.join(conexion, self.dataset, capa) for capa in self.capas}, conexion)
+                metricas.observar('publicacion_segundos', time.perf_counter() - inicio, fase='construir')
+
+            with spans.span('publicar_version'):
+                inicio = time.perf_counter()
+                resultado = arcpy.management.ReconcileVersions(self.workspace, 'ALL_VERSIONS', const.PUBLICACION_VERSION_PADRE, nombre,
+                                                               'LOCK_ACQUIRED', 'ABORT_CONFLICTS', 'BY_OBJECT',
+                                                               'FAVOR_EDIT_VERSION', 'POST', 'KEEP_VERSION')
+                # Con ABORT_CONFLICTS el tool termina sin error pero sin post: lo informa como advertencia
+                if resultado.maxSeverity > 0:
+                    raise RuntimeError("Versión {0} sin publicar: {1}".format(nombre, resultado.getMessages(1)))
+                metricas.observar('publicacion_segundos', time.perf_counter() - inicio, fase='publicar')
+        except:
+            # Lo construido en la versión hija se descarta (sin conexiones abiertas, para poder eliminarla)
+            arcpy.management.ClearWorkspaceCache(conexion)
+            if nombre is not None:
+                eliminar_version(self.workspace, nombre)
+            raise
+        # La conexión a la versión hija no queda abierta: el próximo ciclo la elimina y la vuelve a crear
+        arcpy.management.ClearWorkspaceCache(conexion)
+
+    def descartar(self):
+        """Descarta las ediciones pendientes (las capas quedan como estaban)."""
+        self.capas = {}
+
+
+def texto_sql(valor):
+    """Literal de texto SQL: el valor entre comillas simples, con sus comillas simples duplicadas."""
+    return "'{0}'".format(str(valor).replace("'", "''"))
+
+
+def clausula_in(fc, campo, valores):
+    """Retorna la cláusula '<campo> IN (...)' de la capa para los valores (texto)."""
+    return "{0} IN ({1})".format(arcpy.AddFieldDelimiters(fc, campo), ', '.join(texto_sql(v) for v in valores))
+
+
+def conexion_hija():
+    """Retorna el archivo de conexión a la versión hija, validando que apunte a PUBLICACION_VERSION."""
+    conexion, staging = const.PUBLICACION_CONEXION, const.PUBLICACION_VERSION
+    if not conexion or not os.path.exists(conexion):
+        raise RuntimeError("PUBLICACION_CONEXION no existe ({0}): se requiere una conexión .sde a la versión {1}".format(
+            conexion, staging))
+    version = arcpy.Describe(conexion).connectionProperties.version
+    if version.split('.')[-1].strip('"').upper() != staging.upper():
+        raise RuntimeError("PUBLICACION_CONEXION apunta a la versión {0}, no a {1}".format(version, staging))
+    return conexion
+
+
+def buscar_version(workspace, nombre=None):
+    """Retorna el nombre completo (DUEÑO.NOMBRE) de la versión, o None si no existe."""
+    nombre = (nombre or const.PUBLICACION_VERSION).upper()
+    for version in arcpy.da.ListVersions(workspace):
+        if version.name.split('.')[-1].strip('"').upper() == nombre:
+            return version.name
+    return None
+
+
+def eliminar_version(workspace, nombre):
+    """Elimina la versión hija (sin reconciliar), registrando el error si no se pudo."""
+    try:
+        arcpy.management.DeleteVersion(workspace, nombre)
+    except:
+        logs.obtener_logger().error("Failed eliminar versión {0} ({1})".format(nombre, traceback.format_exc()))
+
+
+def preparar_version(workspace):
+    """
+    Crea la versión hija desde el estado actual de la versión publicada (la de un ciclo
+    anterior se elimina) y retorna su nombre completo.
+    """
+    anterior = buscar_version(workspace)
+    if anterior is not None:
+        arcpy.management.DeleteVersion(workspace, anterior)
+    arcpy.management.CreateVersion(workspace, const.PUBLICACION_VERSION_PADRE, const.PUBLICACION_VERSION, 'PRIVATE')
+    return buscar_version(workspace)
+
+
+def iniciar(workspace, dataset=None):
+    """Inicia la unidad de trabajo del ciclo en el hilo actual y la retorna."""
+    unidad = UnidadDeTrabajo(workspace, dataset)
+    _unidad_actual.set(unidad)
+    return unidad
+
+
+def actual():
+    """Retorna la unidad de trabajo del ciclo en curso, o None."""
+    return _unidad_actual.get()
+
+
+def fallo(etapa):
+    """Registra el fallo de una etapa en la unidad de trabajo en curso, si existe."""
+    unidad = _unidad_actual.get()
+    if unidad is not None:
+        unidad.fallo(etapa)
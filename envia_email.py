@@ -11,24 +11,18 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from decouple import config
 import template_html as template
+import constants as const
 import traceback
 import utils
+import metricas
 
 #-------------------------------------------------------------------------------
 # Configuracion correo
 #-------------------------------------------------------------------------------
-host = config('EMAIL_HOST')
-port = config('EMAIL_PORT')
-smtp_server = host + ':' + port
-username = config('EMAIL_USERNAME')
-password = config('EMAIL_PASSWORD')
-destinatario_admin = config('EMAIL_TO_ADMIN')
-email_from = config('EMAIL_FROM')
-
-# Flag para enviar o no el mail
-enviar_mail = config('EMAIL_SEND')
+# Los datos del servidor y destinatarios se leen desde const.ajustes al enviar
+# (EMAIL_HOST, EMAIL_PORT, EMAIL_USERNAME, EMAIL_PASSWORD, EMAIL_TO_ADMIN, EMAIL_FROM, EMAIL_SEND)
+ajustes = const.ajustes
 
 
 # Envio alerta de email a la empresa responsable de la instalación
@@ -37,7 +31,7 @@ def enviar_email_empresa(destinatario, subject, texto_instalaciones, nombre_ince
         # Construyo los encabezados
         message = MIMEMultipart("alternative")
         message["Subject"] = subject
-        message["From"] = email_from
+        message["From"] = ajustes.EMAIL_FROM
         message["To"] = destinatario
 
         # Construyo el cuerpo del correo en HTML
@@ -61,8 +55,8 @@ def enviar_email_admin(id_incendio, comuna_incendio, superficie, subject, texto_
         # Construyo los encabezados
         message = MIMEMultipart("alternative")
         message["Subject"] = subject
-        message["From"] = email_from
-        message["To"] = destinatario_admin
+        message["From"] = ajustes.EMAIL_FROM
+        message["To"] = ajustes.EMAIL_TO_ADMIN
 
         # Construyo el cuerpo del correo en HTML
         # Obtengo el template para el envío de correo a una empresa
@@ -71,7 +65,7 @@ def enviar_email_admin(id_incendio, comuna_incendio, superficie, subject, texto_
         message.attach(part)
 
         # Envío el correo
-        send(destinatario_admin, message)
+        send(ajustes.EMAIL_TO_ADMIN, message)
     except:
         print("Failed enviar_email_admin (%s)" %
               traceback.format_exc())
@@ -85,8 +79,8 @@ def enviar_email_admin_extinguido(id_incendio, comuna_incendio, subject, fecha_i
         # Construyo los encabezados
         message = MIMEMultipart("alternative")
         message["Subject"] = subject
-        message["From"] = email_from
-        message["To"] = destinatario_admin
+        message["From"] = ajustes.EMAIL_FROM
+        message["To"] = ajustes.EMAIL_TO_ADMIN
 
         # Construyo el cuerpo del correo en HTML
         # Obtengo el template para el envío de correo a una empresa
@@ -95,7 +89,7 @@ def enviar_email_admin_extinguido(id_incendio, comuna_incendio, subject, fecha_i
         message.attach(part)
 
         # Envío el correo
-        send(destinatario_admin, message)
+        send(ajustes.EMAIL_TO_ADMIN, message)
     except:
         print("Failed enviar_email_admin_extinguido (%s)" %
               traceback.format_exc())
@@ -106,14 +100,16 @@ def enviar_email_admin_extinguido(id_incendio, comuna_incendio, subject, fecha_i
 # Envio el correo
 def send(to, message):
     try:
-        if enviar_mail == 'true':
+        if ajustes.EMAIL_SEND == 'true':
             # Creo el objeto para el envío del correo
-            server = smtplib.SMTP(smtp_server)
+            server = smtplib.SMTP(ajustes.EMAIL_HOST + ':' + ajustes.EMAIL_PORT)
             server.starttls()
-            server.login(username, password)
-            server.sendmail(username, to, message.as_string())
+            server.login(ajustes.EMAIL_USERNAME, ajustes.EMAIL_PASSWORD)
+            server.sendmail(ajustes.EMAIL_USERNAME, to, message.as_string())
             server.quit()
+            metricas.incrementar('correos_total', resultado='enviado')
     except:
+        metricas.incrementar('correos_total', resultado='fallido')
         print("Failed send (%s)" % traceback.format_exc())
         utils.error_log("Failed send (%s)" %
                         traceback.format_exc())
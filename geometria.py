@@ -0,0 +1,364 @@
+#-------------------------------------------------------------------------------
+# Name:         geometria
+# Purpose:      Utilidades geométricas sin arcpy (NumPy) para los buffers de incendios.
+#               KD-tree para ubicar las estaciones meteorológicas más cercanas a cada
+#               incendio, construcción de buffers elongados según la dirección y
+#               velocidad del viento, simplificación (Douglas-Peucker) de los buffers
+#               que se publican en el visor y distancia de las instalaciones afectadas
+#               (puntos y líneas) a su incendio.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import numpy as np
+import struct
+import os
+
+# Radio medio de la tierra (km) y km por grado de latitud
+RADIO_TIERRA_KM = 6371.0088
+KM_POR_GRADO = np.pi * RADIO_TIERRA_KM / 180.0
+
+
+def distancia_km(lon1, lat1, lon2, lat2):
+    """Distancia haversine en km (acepta escalares o arrays)."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(v, dtype=float)) for v in (lon1, lat1, lon2, lat2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def distancia_segmento_km(lon, lat, lon1, lat1, lon2, lat2):
+    """
+    Distancia (km) de cada punto (lon, lat) a su segmento (lon1, lat1)-(lon2, lat2), por pares
+    (arrays del mismo largo). El punto más cercano del segmento se busca en una proyección
+    equirectangular centrada en el punto y la distancia a él se mide con haversine.
+    Un segmento de largo 0 es un punto.
+    """
+    lon, lat, lon1, lat1, lon2, lat2 = (np.asarray(v, dtype=float) for v in (lon, lat, lon1, lat1, lon2, lat2))
+    escala_x = np.cos(np.radians(lat))
+    # Coordenadas (grados de latitud equivalentes) de los extremos respecto del punto
+    ax, ay = ((lon1 - lon + 180.0) % 360.0 - 180.0) * escala_x, lat1 - lat
+    bx, by = ((lon2 - lon + 180.0) % 360.0 - 180.0) * escala_x, lat2 - lat
+    dx, dy = bx - ax, by - ay
+    largo = dx * dx + dy * dy
+    t = np.clip(-(ax * dx + ay * dy) / np.where(largo > 0, largo, 1.0), 0.0, 1.0)
+    cx, cy = ax + t * dx, ay + t * dy
+    return distancia_km(lon, lat, lon + cx / np.maximum(escala_x, 1e-12), lat + cy)
+
+
+def distancia_trazos_km(trazos, lons, lats):
+    """
+    Distancia mínima (km) de cada trazo a su punto de referencia (lons[i], lats[i]), en una
+    sola operación vectorizada sobre todos los segmentos. Cada trazo es un array (n, 2) de
+    vértices (lon, lat): un punto (n = 1) o una línea (n > 1, segmentos consecutivos).
+    """
+    largos = np.array([len(t) for t in trazos], dtype=np.int64)
+    if len(largos) == 0:
+        return np.zeros(0)
+    if (largos == 0).any():
+        raise ValueError("Trazo sin vértices")
+    vertices = np.concatenate([np.asarray(t, dtype=float).reshape(-1, 2) for t in trazos])
+    fin = np.cumsum(largos)
+    # Cada vértice forma un segmento con el siguiente; el último de cada trazo solo cuenta
+    # (como segmento de largo 0) si el trazo es un punto
+    siguiente = np.arange(1, len(vertices) + 1)
+    siguiente[fin - 1] = fin - 1
+    usar = np.ones(len(vertices), dtype=bool)
+    usar[fin - 1] = largos == 1
+    dueno = np.repeat(np.arange(len(largos)), largos)[usar]
+    inicio, final = vertices[usar], vertices[siguiente[usar]]
+    d = distancia_segmento_km(np.asarray(lons, dtype=float)[dueno], np.asarray(lats, dtype=float)[dueno],
+                              inicio[:, 0], inicio[:, 1], final[:, 0], final[:, 1])
+    segmentos = np.maximum(largos - 1, 1)
+    return np.minimum.reduceat(d, np.concatenate(([0], np.cumsum(segmentos)[:-1])))
+
+
+def a_cartesianas(lons, lats):
+    """Convierte lon/lat (grados) a vectores unitarios (x, y, z) sobre la esfera."""
+    lons = np.radians(np.asarray(lons, dtype=float))
+    lats = np.radians(np.asarray(lats, dtype=float))
+    return np.column_stack((np.cos(lats) * np.cos(lons), np.cos(lats) * np.sin(lons), np.sin(lats)))
+
+
+def cuerda_a_km(cuerda):
+    """Convierte la distancia de cuerda entre vectores unitarios a distancia de arco (km)."""
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.minimum(np.asarray(cuerda) / 2, 1.0))
+
+
+class ArbolKD:
+    """
+    KD-tree sobre las coordenadas de un conjunto de puntos lon/lat (estaciones).
+    Los puntos se indexan como vectores unitarios en 3D, donde la distancia euclidiana
+    (cuerda) ordena igual que la distancia sobre la esfera. Las consultas se resuelven
+    por lotes: cada nodo se visita una vez con todos los puntos de consulta que aún
+    pueden tener un vecino más cercano dentro de su caja.
+    """
+
+    def __init__(self, lons, lats, ids=None, tamano_hoja=64):
+        self.lons = np.asarray(lons, dtype=float)
+        self.lats = np.asarray(lats, dtype=float)
+        self.ids = np.asarray(ids if ids is not None else np.arange(len(self.lons)))
+        puntos = a_cartesianas(self.lons, self.lats)
+
+        # Cada nodo: (inicio, fin, izquierdo, derecho) sobre self.orden, y su caja envolvente
+        self.orden = np.arange(len(puntos))
+        nodos, cajas = [], []
+        pendientes = [(0, len(puntos), -1, 0)] if len(puntos) else []
+        while pendientes:
+            inicio, fin, padre, lado = pendientes.pop()
+            indice = len(nodos)
+            if padre >= 0:
+                nodos[padre][2 + lado] = indice
+            bloque = puntos[self.orden[inicio:fin]]
+            minimo, maximo = bloque.min(axis=0), bloque.max(axis=0)
+            nodos.append([inicio, fin, -1, -1])
+            cajas.append(np.concatenate((minimo, maximo)))
+            if fin - inicio > tamano_hoja:
+                eje = int(np.argmax(maximo - minimo))
+                medio = (fin - inicio) // 2
+                particion = np.argpartition(bloque[:, eje], medio)
+                self.orden[inicio:fin] = self.orden[inicio:fin][particion]
+                pendientes.append((inicio + medio, fin, indice, 1))
+                pendientes.append((inicio, inicio + medio, indice, 0))
+        self.nodos = np.array(nodos, dtype=np.int64).reshape(-1, 4)
+        self.cajas = np.array(cajas, dtype=float).reshape(-1, 6)
+        self.puntos = puntos[self.orden]
+
+    def __len__(self):
+        return len(self.lons)
+
+    def consultar(self, lons, lats, k=1):
+        """
+        Retorna (ids, distancias_km) de los k puntos más cercanos a cada punto de consulta,
+        como arrays de forma (consultas, k) ordenados por distancia.
+        """
+        consultas = a_cartesianas(np.atleast_1d(lons), np.atleast_1d(lats))
+        k = min(int(k), len(self))
+        mejores_d = np.full((len(consultas), k), np.inf)
+        mejores_i = np.full((len(consultas), k), -1, dtype=np.int64)
+        if k > 0 and len(consultas):
+            self._visitar(0, np.arange(len(consultas)), consultas, mejores_d, mejores_i)
+        return self.ids[self.orden[mejores_i]], cuerda_a_km(mejores_d)
+
+    def _visitar(self, nodo, q, consultas, mejores_d, mejores_i):
+        inicio, fin, izquierdo, derecho = self.nodos[nodo]
+        caja = self.cajas[nodo]
+        puntos = consultas[q]
+        # Descarto las consultas cuya caja está más lejos que su k-ésimo vecino actual
+        exceso = np.maximum(np.maximum(caja[:3] - puntos, puntos - caja[3:]), 0)
+        cota = np.sqrt((exceso ** 2).sum(axis=1))
+        vigentes = cota < mejores_d[q, -1]
+        q, puntos = q[vigentes], puntos[vigentes]
+        if len(q) == 0:
+            return
+
+        if izquierdo < 0:
+            d = np.sqrt(((puntos[:, None, :] - self.puntos[None, inicio:fin, :]) ** 2).sum(axis=2))
+            candidatos_d = np.hstack((mejores_d[q], d))
+            candidatos_i = np.hstack((mejores_i[q], np.broadcast_to(np.arange(inicio, fin), d.shape)))
+            k = mejores_d.shape[1]
+            orden = np.argsort(candidatos_d, axis=1, kind='stable')[:, :k]
+            mejores_d[q] = np.take_along_axis(candidatos_d, orden, axis=1)
+            mejores_i[q] = np.take_along_axis(candidatos_i, orden, axis=1)
+            return
+
+        # Cada consulta visita primero el hijo más cercano, para podar antes el otro
+        centro_izq = self.cajas[izquierdo].reshape(2, 3).mean(axis=0)
+        centro_der = self.cajas[derecho].reshape(2, 3).mean(axis=0)
+        primero_izq = (((puntos - centro_izq) ** 2).sum(axis=1) <=
+                       ((puntos - centro_der) ** 2).sum(axis=1))
+        for grupo, orden_hijos in ((q[primero_izq], (izquierdo, derecho)),
+                                   (q[~primero_izq], (derecho, izquierdo))):
+            if len(grupo):
+                for hijo in orden_hijos:
+                    self._visitar(hijo, grupo, consultas, mejores_d, mejores_i)
+
+    def guardar(self, archivo):
+        """Guarda el árbol en un archivo .npz (escritura atómica)."""
+        temporal = archivo + '.tmp.npz'
+        np.savez(temporal, lons=self.lons, lats=self.lats, ids=self.ids, orden=self.orden,
+                 nodos=self.nodos, cajas=self.cajas, puntos=self.puntos)
+        os.replace(temporal, archivo)
+
+    @classmethod
+    def cargar(cls, archivo):
+        """Carga un árbol guardado con guardar()."""
+        with np.load(archivo, allow_pickle=False) as datos:
+            arbol = cls.__new__(cls)
+            for nombre in ('lons', 'lats', 'ids', 'orden', 'nodos', 'cajas', 'puntos'):
+                setattr(arbol, nombre, datos[nombre])
+        return arbol
+
+
+def vector_viento(direccion):
+    """
+    Retorna el vector unitario (este, norte) hacia donde avanza el viento.
+    La dirección meteorológica indica desde dónde sopla (grados desde el norte, horario).
+    """
+    rumbo = np.radians((float(direccion) + 180.0) % 360.0)
+    return np.sin(rumbo), np.cos(rumbo)
+
+
+def ejes_viento(distancia, velocidad=None, velocidad_referencia=20.0, elongacion_max=3.0):
+    """
+    Retorna (semieje mayor, semieje menor) de la elipse para una distancia base.
+    La elongación crece con la velocidad del viento (sin velocidad se asume la de referencia)
+    y conserva el área del círculo original.
+    """
+    elongacion = 1.0 + (float(velocidad) if velocidad is not None else velocidad_referencia) / velocidad_referencia
+    elongacion = min(max(elongacion, 1.0), elongacion_max)
+    raiz = np.sqrt(elongacion)
+    return distancia * raiz, distancia / raiz
+
+
+def poligono_viento(lon, lat, distancia_km_base, direccion, velocidad=None, vertices=72,
+                    velocidad_referencia=20.0, elongacion_max=3.0):
+    """
+    Retorna los vértices (lon, lat) de un buffer elíptico elongado en el sentido del viento.
+    El incendio queda a un semieje menor del borde contra el viento y la elipse se
+    extiende a favor del viento. Si no hay dirección, retorna un círculo.
+    """
+    if direccion is None:
+        a = b = float(distancia_km_base)
+        este, norte = 0.0, 1.0
+    else:
+        a, b = ejes_viento(float(distancia_km_base), velocidad, velocidad_referencia, elongacion_max)
+        este, norte = vector_viento(direccion)
+
+    # Centro desplazado a favor del viento
+    desplazamiento = a - b
+    t = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    u = desplazamiento + a * np.cos(t)      # eje a favor del viento (km)
+    v = b * np.sin(t)                       # eje perpendicular (km)
+    dx = u * este + v * norte
+    dy = u * norte - v * este
+
+    km_lon = KM_POR_GRADO * max(np.cos(np.radians(lat)), 1e-6)
+    lons = lon + dx / km_lon
+    lats = lat + dy / KM_POR_GRADO
+    puntos = np.column_stack((lons, lats))
+    # Anillo cerrado
+    return np.vstack((puntos, puntos[:1]))
+
+
+def dentro_de_poligono(lons, lats, anillo):
+    """Retorna la máscara de los puntos dentro de un anillo cerrado de (lon, lat) (ray casting vectorizado)."""
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    anillo = np.asarray(anillo, dtype=float)
+    dentro = np.zeros(len(lons), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(anillo[:-1], anillo[1:]):
+        cruza = ((y1 > lats) != (y2 > lats)) & (lons < (x2 - x1) * (lats - y1) / (y2 - y1 + 1e-300) + x1)
+        dentro ^= cruza
+    return dentro
+
+
+def simplificar_anillo(xy, tolerancia, escala_x=1.0, escala_y=1.0):
+    """
+    Simplifica un anillo cerrado (Douglas-Peucker). La tolerancia se mide en las coordenadas
+    escaladas (x * escala_x, y * escala_y). Conserva al menos 3 vértices distintos.
+    """
+    xy = np.asarray(xy, dtype=float)
+    n = len(xy) - 1
+    if tolerancia <= 0 or n <= 3:
+        return xy
+    puntos = xy[:-1] * (escala_x, escala_y)
+
+    # El anillo se divide en dos tramos: del primer vértice al más alejado de él, y de vuelta
+    lejano = int(np.argmax(((puntos - puntos[0]) ** 2).sum(axis=1)))
+    conservar = np.zeros(n + 1, dtype=bool)
+    conservar[[0, lejano, n]] = True
+    cerrado = np.vstack((puntos, puntos[:1]))
+    pendientes = [(0, lejano), (lejano, n)]
+    while pendientes:
+        inicio, fin = pendientes.pop()
+        if fin - inicio < 2:
+            continue
+        a, b = cerrado[inicio], cerrado[fin]
+        intermedios = cerrado[inicio + 1:fin]
+        ab = b - a
+        largo = (ab ** 2).sum()
+        if largo == 0:
+            distancias = np.sqrt(((intermedios - a) ** 2).sum(axis=1))
+        else:
+            distancias = np.abs(ab[0] * (intermedios[:, 1] - a[1]) - ab[1] * (intermedios[:, 0] - a[0])) / np.sqrt(largo)
+        maximo = int(np.argmax(distancias))
+        if distancias[maximo] > tolerancia:
+            medio = inicio + 1 + maximo
+            conservar[medio] = True
+            pendientes.append((inicio, medio))
+            pendientes.append((medio, fin))
+
+    indices = np.flatnonzero(conservar)
+    if len(indices) < 4:
+        indices = np.unique(np.linspace(0, n, 4).round().astype(int))
+    return xy[indices]
+
+
+def leer_wkb_poligonos(wkb):
+    """Retorna los polígonos de un WKB Polygon o MultiPolygon 2D como [[anillo (n x 2), ...], ...]."""
+    datos = memoryview(wkb)
+
+    def leer_poligono(posicion):
+        orden = '<' if datos[posicion] == 1 else '>'
+        cantidad_anillos = struct.unpack_from(orden + 'I', datos, posicion + 5)[0]
+        posicion += 9
+        anillos = []
+        for _ in range(cantidad_anillos):
+            cantidad = struct.unpack_from(orden + 'I', datos, posicion)[0]
+            posicion += 4
+            anillos.append(np.frombuffer(datos, dtype=orden + 'f8', count=cantidad * 2,
+                                         offset=posicion).reshape(-1, 2))
+            posicion += cantidad * 16
+        return anillos, posicion
+
+    orden = '<' if datos[0] == 1 else '>'
+    tipo = struct.unpack_from(orden + 'I', datos, 1)[0]
+    if tipo == 3:
+        return [leer_poligono(0)[0]]
+    if tipo != 6:
+        raise ValueError("WKB no soportado (tipo {0})".format(tipo))
+    poligonos = []
+    posicion = 9
+    for _ in range(struct.unpack_from(orden + 'I', datos, 5)[0]):
+        anillos, posicion = leer_poligono(posicion)
+        poligonos.append(anillos)
+    return poligonos
+
+
+def escribir_wkb_poligonos(poligonos):
+    """Retorna el WKB (little endian) de los polígonos: Polygon si es uno solo, si no MultiPolygon."""
+    def poligono(anillos):
+        partes = [struct.pack('<BII', 1, 3, len(anillos))]
+        for anillo in anillos:
+            partes.append(struct.pack('<I', len(anillo)))
+            partes.append(np.ascontiguousarray(anillo, dtype='<f8').tobytes())
+        return b''.join(partes)
+
+    if len(poligonos) == 1:
+        return poligono(poligonos[0])
+    return struct.pack('<BII', 1, 6, len(poligonos)) + b''.join(poligono(p) for p in poligonos)
+
+
+def simplificar_wkb(wkb, tolerancia_m, metros_por_unidad=None):
+    """
+    Simplifica cada anillo de un WKB de polígonos con una tolerancia en metros. Sin
+    metros_por_unidad las coordenadas se tratan como lon/lat (grados).
+    """
+    if tolerancia_m <= 0:
+        return wkb
+    poligonos = []
+    for anillos in leer_wkb_poligonos(wkb):
+        simplificados = []
+        for anillo in anillos:
+            if metros_por_unidad:
+                escala_x = escala_y = metros_por_unidad
+            else:
+                escala_y = KM_POR_GRADO * 1000
+                escala_x = escala_y * max(np.cos(np.radians(anillo[:, 1].mean())), 1e-6)
+            simplificados.append(simplificar_anillo(anillo, tolerancia_m, escala_x, escala_y))
+        poligonos.append(simplificados)
+    return escribir_wkb_poligonos(poligonos)
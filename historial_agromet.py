@@ -0,0 +1,206 @@
+#-------------------------------------------------------------------------------
+# Name:         historial_agromet
+# Purpose:      Historial local (solo agregar) de las muestras de Agromet.
+#               Cada día es una partición con una columna binaria por campo
+#               (fecha, estacion, variable, valor), de modo que las consultas por
+#               estación y rango de fechas se resuelven con NumPy sobre memmaps.
+#               Incluye compactación (orden y eliminación de duplicados) y retención.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from datetime import datetime, timedelta
+import numpy as np
+import traceback
+import threading
+import shutil
+import os
+import constants as const
+import logs
+import agromet
+
+# Columnas de cada partición y su tipo
+COLUMNAS = (
+    ('fecha', np.dtype('<u4')),      # segundos desde epoch (UTC local del servicio)
+    ('estacion', np.dtype('<i4')),
+    ('variable', np.dtype('u1')),    # posición en agromet.VARIABLES
+    ('valor', np.dtype('<f4')),
+)
+FORMATO_DIA = '%Y-%m-%d'
+MARCA_COMPACTADO = '.compactado'
+
+_lock = threading.Lock()
+
+
+def _carpeta_dia(dia):
+    return os.path.join(const.AGROMET_HISTORIAL_DIR, dia.strftime(FORMATO_DIA))
+
+
+def _epoch(fecha):
+    return int((fecha - datetime(1970, 1, 1)).total_seconds())
+
+
+def agregar(muestras, ahora=None):
+    """
+    Agrega al historial las muestras retornadas por agromet.get_muestras.
+    Usa la fecha de cada muestra ('fechas') y, si no viene, la fecha de la consulta.
+    Retorna la cantidad de registros agregados.
+    """
+    ahora = ahora or datetime.now()
+    indices = {variable: i for i, variable in enumerate(agromet.VARIABLES)}
+    por_dia = {}
+    for muestra in muestras:
+        fechas = muestra.get('fechas', {})
+        for variable, i in indices.items():
+            if variable not in muestra:
+                continue
+            fecha = agromet._parse_fecha(fechas.get(variable)) or ahora
+            por_dia.setdefault(fecha.date(), []).append(
+                (_epoch(fecha), muestra['id_estacion'], i, muestra[variable]))
+
+    total = 0
+    for dia, registros in por_dia.items():
+        columnas = list(zip(*registros))
+        escribir(dia, {nombre: np.asarray(valores, dtype=tipo)
+                       for (nombre, tipo), valores in zip(COLUMNAS, columnas)})
+        total += len(registros)
+    return total
+
+
+def escribir(dia, columnas):
+    """Agrega columnas (dict de arrays del mismo largo) a la partición del día."""
+    carpeta = _carpeta_dia(dia)
+    with _lock:
+        os.makedirs(carpeta, exist_ok=True)
+        for nombre, tipo in COLUMNAS:
+            with open(os.path.join(carpeta, nombre + '.bin'), 'ab') as f:
+                f.write(np.ascontiguousarray(columnas[nombre], dtype=tipo).tobytes())
+        marca = os.path.join(carpeta, MARCA_COMPACTADO)
+        if os.path.exists(marca):
+            os.remove(marca)
+
+
+def leer_particion(carpeta):
+    """Retorna las columnas de una partición como memmaps (truncadas al largo común)."""
+    largos = []
+    for nombre, tipo in COLUMNAS:
+        ruta = os.path.join(carpeta, nombre + '.bin')
+        largos.append(os.path.getsize(ruta) // tipo.itemsize if os.path.exists(ruta) else 0)
+    largo = min(largos)
+    if largo == 0:
+        return None
+    return {nombre: np.memmap(os.path.join(carpeta, nombre + '.bin'), dtype=tipo, mode='r', shape=(largo,))
+            for nombre, tipo in COLUMNAS}
+
+
+def dias(desde, hasta):
+    """Retorna las carpetas de las particiones existentes entre dos fechas."""
+    carpetas = []
+    dia = desde.date()
+    while dia <= hasta.date():
+        carpeta = _carpeta_dia(dia)
+        if os.path.isdir(carpeta):
+            carpetas.append(carpeta)
+        dia += timedelta(days=1)
+    return carpetas
+
+
+def consultar(desde, hasta, estaciones=None, variable=None):
+    """
+    Retorna las muestras entre dos fechas como arrays de NumPy
+    {'fecha': datetime64[s], 'estacion', 'variable', 'valor'}, filtrando
+    opcionalmente por estaciones (lista de ids) y nombre de variable.
+    """
+    inicio, fin = _epoch(desde), _epoch(hasta)
+    codigo = agromet.VARIABLES.index(variable) if variable is not None else None
+    filtro_estaciones = np.asarray(estaciones, dtype='<i4') if estaciones is not None else None
+
+    partes = {nombre: [] for nombre, _ in COLUMNAS}
+    for carpeta in dias(desde, hasta):
+        columnas = leer_particion(carpeta)
+        if columnas is None:
+            continue
+        mascara = (columnas['fecha'] >= inicio) & (columnas['fecha'] <= fin)
+        if codigo is not None:
+            mascara &= columnas['variable'] == codigo
+        if filtro_estaciones is not None:
+            mascara &= np.isin(columnas['estacion'], filtro_estaciones)
+        for nombre, _ in COLUMNAS:
+            partes[nombre].append(np.asarray(columnas[nombre][mascara]))
+
+    resultado = {nombre: (np.concatenate(partes[nombre]) if partes[nombre] else np.empty(0, dtype=tipo))
+                 for nombre, tipo in COLUMNAS}
+    resultado['fecha'] = resultado['fecha'].astype('datetime64[s]')
+    return resultado
+
+
+def serie(id_estacion, variable, desde, hasta):
+    """Retorna (fechas, valores) ordenados de una variable de una estación."""
+    datos = consultar(desde, hasta, [id_estacion], variable)
+    orden = np.argsort(datos['fecha'], kind='stable')
+    return datos['fecha'][orden], datos['valor'][orden]
+
+
+def compactar(carpeta):
+    """Ordena la partición por estación, variable y fecha, y elimina las muestras duplicadas."""
+    with _lock:
+        columnas = leer_particion(carpeta)
+        if columnas is None:
+            return 0
+        orden = np.lexsort((columnas['fecha'], columnas['variable'], columnas['estacion']))
+        ordenadas = {nombre: np.asarray(columnas[nombre])[orden] for nombre, _ in COLUMNAS}
+        del columnas
+        # La última muestra leída prevalece sobre las anteriores con la misma clave
+        clave_siguiente = np.ones(len(orden), dtype=bool)
+        clave_siguiente[:-1] = ((ordenadas['estacion'][1:] != ordenadas['estacion'][:-1]) |
+                                (ordenadas['variable'][1:] != ordenadas['variable'][:-1]) |
+                                (ordenadas['fecha'][1:] != ordenadas['fecha'][:-1]))
+        for nombre, tipo in COLUMNAS:
+            temporal = os.path.join(carpeta, nombre + '.bin.tmp')
+            ordenadas[nombre][clave_siguiente].astype(tipo).tofile(temporal)
+            os.replace(temporal, os.path.join(carpeta, nombre + '.bin'))
+        open(os.path.join(carpeta, MARCA_COMPACTADO), 'w').close()
+        return int(len(orden) - clave_siguiente.sum())
+
+
+def mantener(hoy=None):
+    """Compacta las particiones de días anteriores y elimina las que superan la retención."""
+    hoy = (hoy or datetime.now()).date()
+    limite = hoy - timedelta(days=const.AGROMET_HISTORIAL_RETENCION_DIAS)
+    carpeta_historial = const.AGROMET_HISTORIAL_DIR
+    compactadas = eliminadas = 0
+    try:
+        if not os.path.isdir(carpeta_historial):
+            return compactadas, eliminadas
+
+        for nombre in sorted(os.listdir(carpeta_historial)):
+            carpeta = os.path.join(carpeta_historial, nombre)
+            try:
+                dia = datetime.strptime(nombre, FORMATO_DIA).date()
+            except ValueError:
+                continue
+            if dia < limite:
+                shutil.rmtree(carpeta)
+                eliminadas += 1
+            elif dia < hoy and not os.path.exists(os.path.join(carpeta, MARCA_COMPACTADO)):
+                compactar(carpeta)
+                compactadas += 1
+
+        if compactadas or eliminadas:
+            logs.obtener_logger().info("Historial Agromet: {0} particiones compactadas, {1} eliminadas".format(
+                compactadas, eliminadas))
+    except:
+        print("Failed mantener (%s)" % traceback.format_exc())
+        logs.obtener_logger().error("Failed historial_agromet.mantener (%s)" % traceback.format_exc())
+    return compactadas, eliminadas
+
+
+def tamano_en_disco():
+    """Retorna el tamaño total del historial en bytes."""
+    total = 0
+    for raiz, _, archivos in os.walk(const.AGROMET_HISTORIAL_DIR):
+        total += sum(os.path.getsize(os.path.join(raiz, a)) for a in archivos)
+    return total
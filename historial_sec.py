@@ -0,0 +1,311 @@
+#-------------------------------------------------------------------------------
+# Name:         historial_sec
+# Purpose:      Historial local de los clientes afectados por comuna entregados por la SEC.
+#               Cada consulta horaria se guarda como delta respecto de la anterior: solo
+#               se registran las comunas cuyo valor cambió. Cada día es una partición
+#               independiente (la primera consulta del día registra todas las comunas con
+#               clientes afectados), lo que permite recargar días pasados en paralelo.
+#               Uso para recargar un rango de fechas desde GetPorFecha:
+#                   python historial_sec.py backfill 2026-10-01 2026-10-07
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+import contextvars
+import threading
+import json
+import sys
+import os
+import constants as const
+import logs
+import sec
+
+# Columnas de los cambios de cada partición y su tipo
+COLUMNAS = (
+    ('fecha', np.dtype('<u4')),      # segundos desde epoch de la hora consultada
+    ('comuna', np.dtype('<u2')),     # código de la comuna en comunas.json
+    ('afectados', np.dtype('<i4')),  # clientes afectados desde esa hora
+)
+# Horas consultadas de la partición (también las que no tuvieron cambios)
+CONSULTAS = ('consultas', np.dtype('<u4'))
+FORMATO_DIA = '%Y-%m-%d'
+
+_lock = threading.RLock()
+_codigos = None
+
+
+def _carpeta_dia(dia):
+    return os.path.join(const.SEC_HISTORIAL_DIR, dia.strftime(FORMATO_DIA))
+
+
+def _epoch(fecha):
+    return int((fecha - datetime(1970, 1, 1)).total_seconds())
+
+
+def _fecha(epoch):
+    return datetime(1970, 1, 1) + timedelta(seconds=int(epoch))
+
+
+def _hora(fecha):
+    return fecha.replace(minute=0, second=0, microsecond=0)
+
+
+def codigos_comunas():
+    """Retorna la tabla {nombre normalizado: código} de las comunas registradas en el historial."""
+    global _codigos
+    with _lock:
+        if _codigos is None:
+            _codigos = {}
+            archivo = os.path.join(const.SEC_HISTORIAL_DIR, 'comunas.json')
+            if os.path.exists(archivo):
+                with open(archivo, encoding='utf-8') as f:
+                    _codigos = json.load(f)
+    return _codigos
+
+
+def codificar(registros):
+    """Retorna {código: clientes afectados} de los registros de la SEC, registrando las comunas nuevas."""
+    valores = {}
+    with _lock:
+        codigos = codigos_comunas()
+        nuevas = False
+        for comuna, afectados in sec.agrupar_por_comuna(registros).items():
+            nombre = sec.normalizar_comuna(comuna)
+            if nombre not in codigos:
+                codigos[nombre] = len(codigos) + 1
+                nuevas = True
+            codigo = codigos[nombre]
+            valores[codigo] = valores.get(codigo, 0) + int(afectados)
+        if nuevas:
+            os.makedirs(const.SEC_HISTORIAL_DIR, exist_ok=True)
+            archivo = os.path.join(const.SEC_HISTORIAL_DIR, 'comunas.json')
+            with open(archivo + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(codigos, f, ensure_ascii=False, indent=1)
+            os.replace(archivo + '.tmp', archivo)
+    return valores
+
+
+def nombres_comunas():
+    """Retorna {código: nombre normalizado}."""
+    return {codigo: nombre for nombre, codigo in codigos_comunas().items()}
+
+
+def leer_dia(carpeta):
+    """Retorna (columnas de cambios, horas consultadas) de una partición, o None si no existe."""
+    ruta = os.path.join(carpeta, CONSULTAS[0] + '.bin')
+    if not os.path.exists(ruta):
+        return None
+    consultas = np.fromfile(ruta, dtype=CONSULTAS[1])
+    largos = [os.path.getsize(os.path.join(carpeta, nombre + '.bin')) // tipo.itemsize
+              if os.path.exists(os.path.join(carpeta, nombre + '.bin')) else 0
+              for nombre, tipo in COLUMNAS]
+    largo = min(largos)
+    columnas = {nombre: np.fromfile(os.path.join(carpeta, nombre + '.bin'), dtype=tipo, count=largo)
+                for nombre, tipo in COLUMNAS}
+    return columnas, consultas
+
+
+def consultas_dia(carpeta):
+    """Reconstruye las consultas completas de una partición {fecha: {código: afectados}}."""
+    datos = leer_dia(carpeta)
+    if datos is None:
+        return {}
+    columnas, consultas = datos
+    resultado = {}
+    estado = {}
+    cambios = 0
+    for epoch in consultas:
+        while cambios < len(columnas['fecha']) and columnas['fecha'][cambios] == epoch:
+            estado[int(columnas['comuna'][cambios])] = int(columnas['afectados'][cambios])
+            cambios += 1
+        resultado[_fecha(epoch)] = {c: v for c, v in estado.items() if v != 0}
+    return resultado
+
+
+def _deltas(anterior, actual):
+    """Comunas cuyo valor cambió entre dos consultas (las que dejan de aparecer vuelven a cero)."""
+    cambios = {c: v for c, v in actual.items() if anterior.get(c, 0) != v}
+    cambios.update({c: 0 for c, v in anterior.items() if v != 0 and c not in actual})
+    return sorted(cambios.items())
+
+
+def escribir_dia(dia, consultas):
+    """Reescribe la partición de un día a partir de sus consultas completas {fecha: {código: afectados}}."""
+    carpeta = _carpeta_dia(dia)
+    filas = []
+    anterior = {}
+    for fecha in sorted(consultas):
+        actual = consultas[fecha]
+        filas.extend((_epoch(fecha), c, v) for c, v in _deltas(anterior, actual))
+        anterior = actual
+    columnas = list(zip(*filas)) if filas else [(), (), ()]
+
+    with _lock:
+        os.makedirs(carpeta, exist_ok=True)
+        for (nombre, tipo), valores in zip(COLUMNAS, columnas):
+            temporal = os.path.join(carpeta, nombre + '.bin.tmp')
+            np.asarray(valores, dtype=tipo).tofile(temporal)
+            os.replace(temporal, os.path.join(carpeta, nombre + '.bin'))
+        temporal = os.path.join(carpeta, CONSULTAS[0] + '.bin.tmp')
+        np.asarray([_epoch(f) for f in sorted(consultas)], dtype=CONSULTAS[1]).tofile(temporal)
+        os.replace(temporal, os.path.join(carpeta, CONSULTAS[0] + '.bin'))
+    return len(filas)
+
+
+def agregar(fecha, registros):
+    """
+    Guarda la respuesta de la SEC de una hora. Si es posterior a la última hora guardada del día
+    solo se agregan los cambios; si no, se reescribe la partición del día.
+    Retorna la cantidad de cambios registrados.
+    """
+    fecha = _hora(fecha)
+    actual = codificar(registros)
+    carpeta = _carpeta_dia(fecha)
+    with _lock:
+        consultas = consultas_dia(carpeta)
+        if consultas and fecha <= max(consultas):
+            consultas[fecha] = actual
+            return escribir_dia(fecha, consultas)
+
+        anterior = consultas[max(consultas)] if consultas else {}
+        filas = _deltas(anterior, actual)
+        os.makedirs(carpeta, exist_ok=True)
+        epoch = _epoch(fecha)
+        for (nombre, tipo), valores in zip(COLUMNAS, ([epoch] * len(filas), [c for c, _ in filas], [v for _, v in filas])):
+            with open(os.path.join(carpeta, nombre + '.bin'), 'ab') as f:
+                f.write(np.asarray(valores, dtype=tipo).tobytes())
+        with open(os.path.join(carpeta, CONSULTAS[0] + '.bin'), 'ab') as f:
+            f.write(np.asarray([epoch], dtype=CONSULTAS[1]).tobytes())
+    return len(filas)
+
+
+def dias(desde, hasta):
+    """Retorna las carpetas de las particiones existentes entre dos fechas."""
+    carpetas = []
+    dia = desde.date()
+    while dia <= hasta.date():
+        carpeta = _carpeta_dia(dia)
+        if os.path.isdir(carpeta):
+            carpetas.append(carpeta)
+        dia += timedelta(days=1)
+    return carpetas
+
+
+def pico(desde, hasta):
+    """
+    Retorna el máximo de clientes afectados por comuna entre dos fechas
+    {comuna: (afectados, fecha del máximo)}, considerando solo las comunas con afectados.
+    """
+    inicio, fin = _epoch(desde), _epoch(hasta)
+    comunas, fechas, valores = [], [], []
+    for carpeta in dias(desde, hasta):
+        datos = leer_dia(carpeta)
+        if datos is None:
+            continue
+        columnas, consultas = datos
+        if not ((consultas >= inicio) & (consultas <= fin)).any():
+            continue
+        en_ventana = (columnas['fecha'] >= inicio) & (columnas['fecha'] <= fin)
+        comunas.append(columnas['comuna'][en_ventana])
+        fechas.append(columnas['fecha'][en_ventana])
+        valores.append(columnas['afectados'][en_ventana])
+
+        # Valor vigente al inicio de la ventana (último cambio anterior de cada comuna en el día)
+        previos = columnas['fecha'] < inicio
+        if previos.any():
+            c, v = columnas['comuna'][previos], columnas['afectados'][previos]
+            ultimo = len(c) - 1 - np.unique(c[::-1], return_index=True)[1]
+            comunas.append(c[ultimo])
+            fechas.append(np.full(len(ultimo), consultas[consultas >= inicio][0], dtype=CONSULTAS[1]))
+            valores.append(v[ultimo])
+
+    if not comunas:
+        return {}
+    comunas, fechas, valores = np.concatenate(comunas), np.concatenate(fechas), np.concatenate(valores)
+    # Para cada comuna, el mayor valor (y la primera hora en que se alcanzó)
+    orden = np.lexsort((fechas, -valores.astype(np.int64), comunas))
+    primeros = np.unique(comunas[orden], return_index=True)[1]
+    nombres = nombres_comunas()
+    return {nombres.get(int(comunas[orden][i]), int(comunas[orden][i])):
+            (int(valores[orden][i]), _fecha(fechas[orden][i]))
+            for i in primeros if valores[orden][i] > 0}
+
+
+def estado(fecha):
+    """Retorna los clientes afectados por comuna vigentes en una fecha {comuna: afectados}."""
+    carpeta = _carpeta_dia(fecha)
+    datos = leer_dia(carpeta)
+    if datos is None:
+        return {}
+    columnas, _ = datos
+    hasta = columnas['fecha'] <= _epoch(fecha)
+    valores = {}
+    for c, v in zip(columnas['comuna'][hasta].tolist(), columnas['afectados'][hasta].tolist()):
+        valores[c] = v
+    nombres = nombres_comunas()
+    return {nombres.get(c, c): v for c, v in valores.items() if v != 0}
+
+
+def backfill(desde, hasta, url=None, max_workers=None):
+    """
+    Recarga las horas entre dos fechas consultando GetPorFecha en paralelo.
+    Las horas ya guardadas se reemplazan. Retorna (horas guardadas, horas fallidas).
+    """
+    horas = []
+    hora = _hora(desde)
+    while hora <= hasta:
+        horas.append(hora)
+        hora += timedelta(hours=1)
+
+    def consultar(contexto, hora):
+        return contexto.run(sec.consultar_hora, hora, url)
+
+    contextos = [contextvars.copy_context() for _ in horas]
+    with ThreadPoolExecutor(max_workers=max_workers or const.SEC_BACKFILL_CONCURRENCIA) as executor:
+        respuestas = list(executor.map(consultar, contextos, horas))
+
+    por_dia = {}
+    fallidas = 0
+    for hora, registros in zip(horas, respuestas):
+        if registros is None or registros is False:
+            fallidas += 1
+            continue
+        por_dia.setdefault(hora.date(), {})[hora] = codificar(registros)
+
+    guardadas = 0
+    for dia, consultas_nuevas in sorted(por_dia.items()):
+        with _lock:
+            consultas = consultas_dia(_carpeta_dia(dia))
+            consultas.update(consultas_nuevas)
+            escribir_dia(dia, consultas)
+        guardadas += len(consultas_nuevas)
+
+    logs.obtener_logger().info("Backfill SEC", extra={'datos': {
+        'desde': desde.strftime('%Y-%m-%d %H:%M'), 'hasta': hasta.strftime('%Y-%m-%d %H:%M'),
+        'guardadas': guardadas, 'fallidas': fallidas}})
+    return guardadas, fallidas
+
+
+def tamano_en_disco():
+    """Retorna el tamaño total del historial en bytes."""
+    total = 0
+    for raiz, _, archivos in os.walk(const.SEC_HISTORIAL_DIR):
+        total += sum(os.path.getsize(os.path.join(raiz, a)) for a in archivos)
+    return total
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4 or sys.argv[1] != 'backfill':
+        print('Uso: python historial_sec.py backfill <desde YYYY-MM-DD> <hasta YYYY-MM-DD>')
+        sys.exit(1)
+    logs.iniciar_ejecucion('sec_backfill')
+    desde = datetime.strptime(sys.argv[2], FORMATO_DIA)
+    hasta = datetime.strptime(sys.argv[3], FORMATO_DIA) + timedelta(hours=23)
+    guardadas, fallidas = backfill(desde, hasta)
+    print('Horas guardadas: {0}, fallidas: {1}'.format(guardadas, fallidas))
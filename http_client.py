@@ -0,0 +1,164 @@
+#-------------------------------------------------------------------------------
+# Name:         http_client
+# Purpose:      Cliente http común para los servicios externos (sidco.conaf.cl,
+#               agromet.inia.cl, apps.sec.cl). Mantiene una sesión keep-alive con pool
+#               de conexiones por host, aplica timeout por defecto, reintentos con
+#               backoff exponencial y jitter, y un circuit breaker por host que falla
+#               de inmediato mientras el servicio está caído. Registra latencia,
+#               respuestas, reintentos y errores por host en metricas.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from urllib.parse import urlparse
+import traceback
+import threading
+import random
+import time
+import constants as const
+import logs
+import metricas
+import diferido
+
+# requests se importa en la primera petición
+requests = diferido.importar('requests')
+
+_sesiones = {}
+_circuitos = {}
+_lock = threading.Lock()
+
+
+class Circuito:
+    """
+    Circuit breaker de un host. Tras 'fallos' errores consecutivos se abre y rechaza las
+    peticiones durante 'espera' segundos; luego deja pasar una petición de prueba
+    (semiabierto) que lo cierra si tiene éxito o lo vuelve a abrir si falla.
+    """
+
+    def __init__(self, host, fallos=None, espera=None):
+        self.host = host
+        self.fallos = fallos or const.HTTP_CIRCUITO_FALLOS
+        self.espera = espera if espera is not None else const.HTTP_CIRCUITO_ESPERA
+        self.consecutivos = 0
+        self.abierto_desde = None
+        self.en_prueba = False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """Indica si se puede realizar una petición al host."""
+        with self._lock:
+            if self.abierto_desde is None:
+                return True
+            if time.monotonic() - self.abierto_desde >= self.espera and not self.en_prueba:
+                self.en_prueba = True
+                return True
+            return False
+
+    def exito(self):
+        with self._lock:
+            if self.abierto_desde is not None:
+                logs.obtener_logger().info("Circuito http cerrado: {0}".format(self.host))
+                metricas.fijar('http_circuito_abierto', 0, upstream=self.host)
+            self.consecutivos = 0
+            self.abierto_desde = None
+            self.en_prueba = False
+
+    def fallo(self):
+        with self._lock:
+            self.consecutivos += 1
+            if self.en_prueba or (self.abierto_desde is None and self.consecutivos >= self.fallos):
+                if self.abierto_desde is None:
+                    logs.obtener_logger().error("Circuito http abierto: {0} ({1} fallos consecutivos)".format(
+                        self.host, self.consecutivos))
+                self.abierto_desde = time.monotonic()
+                self.en_prueba = False
+                metricas.fijar('http_circuito_abierto', 1, upstream=self.host)
+
+
+def host(url):
+    """Retorna el host de una url."""
+    return urlparse(url).hostname or url
+
+
+def obtener_sesion(nombre_host):
+    """Retorna la sesión keep-alive del host, con un pool de conexiones de tamaño HTTP_POOL."""
+    with _lock:
+        sesion = _sesiones.get(nombre_host)
+        if sesion is None:
+            sesion = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=const.HTTP_POOL)
+            sesion.mount('http://', adapter)
+            sesion.mount('https://', adapter)
+            _sesiones[nombre_host] = sesion
+    return sesion
+
+
+def obtener_circuito(nombre_host):
+    """Retorna el circuit breaker del host."""
+    with _lock:
+        circuito = _circuitos.get(nombre_host)
+        if circuito is None:
+            circuito = _circuitos[nombre_host] = Circuito(nombre_host)
+    return circuito
+
+
+def solicitar(metodo, url, timeout=None, reintentos=None, **kwargs):
+    """
+    Realiza una petición http con timeout, reintentos (backoff exponencial con jitter)
+    y circuit breaker por host. Retorna la respuesta si es exitosa (2xx), None en otro caso.
+    Los errores 4xx no se reintentan. Una petición que agota sus reintentos suma un solo
+    fallo al circuito del host.
+    """
+    nombre_host = host(url)
+    sesion = obtener_sesion(nombre_host)
+    circuito = obtener_circuito(nombre_host)
+    timeout = timeout or const.HTTP_TIMEOUT
+    reintentos = const.HTTP_REINTENTOS if reintentos is None else reintentos
+
+    for intento in range(reintentos + 1):
+        if not circuito.permitir():
+            metricas.incrementar('http_rechazos_total', upstream=nombre_host)
+            if intento == 0:
+                logs.obtener_logger().info("Circuito http abierto, petición rechazada: {0}".format(nombre_host))
+                return None
+            # Los intentos anteriores fallaron: la petición cuenta como un fallo
+            break
+        if intento > 0:
+            metricas.incrementar('http_reintentos_total', upstream=nombre_host)
+            time.sleep(min(0.5 * 2 ** (intento - 1), 8) * random.uniform(0.5, 1.5))
+        try:
+            with metricas.tiempo_http(nombre_host):
+                response = sesion.request(metodo, url, timeout=timeout, **kwargs)
+        except requests.RequestException:
+            if intento == reintentos:
+                print("Failed http_client.solicitar (%s)" % traceback.format_exc())
+                logs.obtener_logger().error("Failed http_client.solicitar {0} {1} ({2})".format(
+                    metodo, url, traceback.format_exc()))
+            continue
+
+        metricas.incrementar('http_respuestas_total', upstream=nombre_host, codigo=response.status_code)
+        if response.status_code < 400:
+            circuito.exito()
+            return response
+        response.close()
+        if response.status_code < 500:
+            # El servicio responde: el error es de la petición
+            circuito.exito()
+            return None
+
+    # Un solo fallo por petición, una vez agotados los reintentos
+    circuito.fallo()
+    return None
+
+
+def get(url, params=None, **kwargs):
+    """GET con las políticas del cliente. Retorna la respuesta o None."""
+    return solicitar('GET', url, params=params, **kwargs)
+
+
+def post(url, **kwargs):
+    """POST con las políticas del cliente. Retorna la respuesta o None."""
+    return solicitar('POST', url, **kwargs)
@@ -0,0 +1,277 @@
+#-------------------------------------------------------------------------------
+# Name:         lease
+# Purpose:      Exclusión entre ejecuciones de un mismo pipeline mediante archivos de
+#               lease (uno por pipeline) con heartbeat. Si una ejecución supera su
+#               intervalo, la siguiente no la pisa: según la política del pipeline se
+#               omite ('omitir') o se agrupa en una sola re-ejecución al terminar la
+#               actual ('agrupar'). Un lease sin renovar por más de LEASE_TTL_SEGUNDOS
+#               (proceso caído) se toma y se limpia.
+#               Cada ejecución tiene además su propia FileGDB temporal (cruces, buffer),
+#               de modo que pipelines distintos corren en paralelo sin chocar.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import contextvars
+import traceback
+import threading
+import socket
+import shutil
+import uuid
+import time
+import json
+import os
+import constants as const
+import diferido
+import logs
+import metricas
+
+arcpy = diferido.importar('arcpy')
+
+_lease_actual = contextvars.ContextVar('lease', default=None)
+
+
+def _leer(ruta):
+    """Retorna el contenido del lease, o None si no existe. Un lease ilegible se trata como vacío."""
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        return {}
+
+
+def _escribir(ruta, datos):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(datos, archivo)
+    os.replace(temporal, ruta)
+
+
+def _proceso_vivo(datos):
+    """Indica si el proceso dueño del lease sigue vivo (solo verificable en el mismo host y fuera de Windows)."""
+    if os.name == 'nt' or datos.get('host') != socket.gethostname() or not datos.get('pid'):
+        return True
+    try:
+        os.kill(datos['pid'], 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def vencido(ruta, datos):
+    """Indica si el lease fue abandonado: sin renovar por más de LEASE_TTL_SEGUNDOS, o con su proceso terminado."""
+    renovado = datos.get('renovado')
+    if renovado is None:
+        # Lease a medio escribir: se usa la fecha del archivo
+        try:
+            renovado = os.path.getmtime(ruta)
+        except OSError:
+            return True
+    return time.time() - renovado > const.LEASE_TTL_SEGUNDOS or not _proceso_vivo(datos)
+
+
+class Lease:
+    """Lease de un pipeline: archivo <pipeline>.lease con el dueño y la fecha de la última renovación."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.token = uuid.uuid4().hex[:12]
+        self.ruta = os.path.join(const.LEASE_DIR, pipeline + '.lease')
+        self.ruta_pendiente = os.path.join(const.LEASE_DIR, pipeline + '.pendiente')
+        self.espacio = None
+        self.perdido = False
+        self._detener = threading.Event()
+        self._latido = None
+        self._lock = threading.Lock()
+
+    def _datos(self):
+        return {
+            'pipeline': self.pipeline,
+            'token': self.token,
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'espacio': self.espacio,
+            'renovado': time.time(),
+        }
+
+    def adquirir(self):
+        """Toma el lease. Retorna False si otra ejecución lo tiene vigente."""
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        for _ in range(3):
+            try:
+                descriptor = os.open(self.ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._tomar_vencido():
+                    return False
+                continue
+            with os.fdopen(descriptor, 'w', encoding='utf-8') as archivo:
+                json.dump(self._datos(), archivo)
+            self._latido = threading.Thread(target=self._renovar_periodicamente,
+                                            name='lease-' + self.pipeline, daemon=True)
+            self._latido.start()
+            return True
+        return False
+
+    def _tomar_vencido(self):
+        """
+        Elimina el lease si está vencido y retorna True para reintentar. La toma se hace
+        bajo un archivo .toma exclusivo, para que dos ejecuciones no tomen el mismo lease.
+        """
+        ruta_toma = self.ruta + '.toma'
+        try:
+            descriptor = os.open(ruta_toma, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # Toma abandonada por un proceso caído a mitad de camino
+            try:
+                if time.time() - os.path.getmtime(ruta_toma) > const.LEASE_TTL_SEGUNDOS:
+                    os.remove(ruta_toma)
+                    return True
+            except OSError:
+                return True
+            return False
+        os.close(descriptor)
+        try:
+            datos = _leer(self.ruta)
+            if datos is None:
+                return True
+            if not vencido(self.ruta, datos):
+                return False
+            os.remove(self.ruta)
+        finally:
+            os.remove(ruta_toma)
+
+        logs.obtener_logger().warning("Lease de {0} vencido tomado (dueño anterior: {1})".format(
+            self.pipeline, datos.get('token')), extra={'datos': datos})
+        metricas.incrementar('lease_tomados_total', pipeline=self.pipeline)
+        eliminar_espacio(datos.get('espacio'))
+        return True
+
+    def renovar(self):
+        """Renueva el lease. Retorna False si el lease ya no es de esta ejecución."""
+        with self._lock:
+            datos = _leer(self.ruta)
+            if not datos or datos.get('token') != self.token:
+                self.perdido = True
+                return False
+            _escribir(self.ruta, self._datos())
+            return True
+
+    def _renovar_periodicamente(self):
+        while not self._detener.wait(const.LEASE_TTL_SEGUNDOS / 3):
+            try:
+                if not self.renovar():
+                    logs.obtener_logger().error("Lease de {0} perdido: otra ejecución lo tomó".format(self.pipeline))
+                    return
+            except:
+                logs.obtener_logger().error("Failed renovar lease {0} ({1})".format(
+                    self.pipeline, traceback.format_exc()))
+
+    def solicitar_pendiente(self):
+        """Deja registrada una ejecución pendiente para el dueño del lease (política 'agrupar')."""
+        with open(self.ruta_pendiente, 'w', encoding='utf-8') as archivo:
+            archivo.write(self.token)
+
+    def tomar_pendiente(self):
+        """Retorna True (y la consume) si hay una ejecución pendiente."""
+        try:
+            os.remove(self.ruta_pendiente)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def liberar(self):
+        """Detiene el heartbeat, elimina la FileGDB temporal y libera el lease (si sigue siendo de esta ejecución)."""
+        self._detener.set()
+        if self._latido is not None:
+            self._latido.join()
+        eliminar_espacio(self.espacio)
+        self.espacio = None
+        datos = _leer(self.ruta)
+        if datos and datos.get('token') == self.token:
+            os.remove(self.ruta)
+
+    def obtener_espacio(self):
+        """Retorna la FileGDB temporal de la ejecución, creándola en el primer uso."""
+        if self.espacio is None:
+            carpeta = const.LEASE_CARPETA_TEMPORAL or os.path.dirname(const.WORKSPACE_LOCAL)
+            nombre = '{0}_{1}.gdb'.format(self.pipeline, self.token)
+            arcpy.CreateFileGDB_management(carpeta, nombre)
+            self.espacio = os.path.join(carpeta, nombre)
+            # El lease registra la FileGDB, para limpiarla si la ejecución queda abandonada
+            self.renovar()
+        return self.espacio
+
+
+def eliminar_espacio(espacio):
+    """Elimina una FileGDB temporal."""
+    if not espacio:
+        return
+    try:
+        if arcpy.Exists(espacio):
+            arcpy.Delete_management(espacio)
+    except:
+        # Sin arcpy (o con la FileGDB bloqueada) se borra la carpeta directamente
+        shutil.rmtree(espacio, ignore_errors=True)
+        logs.obtener_logger().warning("FileGDB temporal {0} eliminada sin arcpy ({1})".format(
+            espacio, traceback.format_exc()))
+
+
+def espacio_trabajo(crear=True):
+    """
+    Retorna el workspace temporal de la ejecución actual (cruces, buffer): la FileGDB
+    propia de la ejecución, o FOLDER_WORKSPACE_LOCAL si se ejecuta sin lease.
+    Con crear=False retorna None si la ejecución todavía no creó su FileGDB.
+    """
+    lease = _lease_actual.get()
+    if lease is None:
+        return const.WORKSPACE_LOCAL
+    if not crear and lease.espacio is None:
+        return None
+    return lease.obtener_espacio()
+
+
+def ejecutar(pipeline, funcion, politica=None):
+    """
+    Ejecuta la función del pipeline bajo su lease. Si otra ejecución lo tiene, según la
+    política se omite o se deja pendiente para que el dueño la repita al terminar.
+    Retorna la cantidad de ejecuciones realizadas (0 si no se tomó el lease).
+    """
+    politica = politica or const.LEASE_POLITICAS.get(pipeline, 'omitir')
+    lease = Lease(pipeline)
+    if not lease.adquirir():
+        if politica == 'agrupar':
+            lease.solicitar_pendiente()
+        logs.obtener_logger().info("Lease de {0} ocupado, ejecución {1}".format(
+            pipeline, 'agrupada' if politica == 'agrupar' else 'omitida'), extra={'datos': _leer(lease.ruta)})
+        metricas.incrementar('lease_ocupado_total', pipeline=pipeline, politica=politica)
+        # Sin ejecución: solo se exporta lease_ocupado_total al archivo del pipeline
+        metricas.exportar(pipeline, ejecucion=False)
+        return 0
+
+    token = _lease_actual.set(lease)
+    ejecuciones = 0
+    try:
+        # Lo pendiente antes de partir queda cubierto por esta ejecución
+        lease.tomar_pendiente()
+        while True:
+            ejecuciones += 1
+            try:
+                funcion()
+            finally:
+                # Cada ejecución parte con una FileGDB temporal nueva
+                eliminar_espacio(lease.espacio)
+                lease.espacio = None
+            if lease.perdido or politica != 'agrupar' or not lease.tomar_pendiente():
+                break
+            logs.obtener_logger().info("Ejecutando {0} nuevamente (solicitudes agrupadas)".format(pipeline))
+    finally:
+        _lease_actual.reset(token)
+        lease.liberar()
+    return ejecuciones
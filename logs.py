@@ -0,0 +1,195 @@
+#-------------------------------------------------------------------------------
+# Name:         logs
+# Purpose:      Registro de logs estructurado (JSON lines) con escritura en segundo plano.
+#               Los mensajes se encolan con un QueueHandler y un QueueListener los escribe
+#               en disco, de modo que los ciclos por incendio/estación/comuna no abren y
+#               cierran el archivo en cada línea.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from datetime import datetime
+import logging
+import logging.handlers
+import contextvars
+import threading
+import atexit
+import glob
+import queue
+import json
+import uuid
+import os
+import constants as const
+
+script_dir = os.path.dirname(__file__)
+
+NOMBRE_LOGGER = 'min_energia'
+
+# Pipeline e id de ejecución del hilo actual
+_pipeline = contextvars.ContextVar('pipeline', default=None)
+_run_id = contextvars.ContextVar('run_id', default=None)
+
+_lock = threading.Lock()
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formatea cada registro como un objeto JSON en una línea."""
+
+    def format(self, record):
+        entrada = {
+            'fecha': datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'nivel': record.levelname,
+            'pipeline': getattr(record, 'pipeline', None),
+            'run_id': getattr(record, 'run_id', None),
+            'mensaje': record.getMessage(),
+        }
+        datos = getattr(record, 'datos', None)
+        if datos is not None:
+            entrada['datos'] = datos
+        return json.dumps(entrada, ensure_ascii=False, default=str)
+
+
+class ContextoFilter(logging.Filter):
+    """Agrega el pipeline y el id de ejecución al registro, en el hilo que lo emite."""
+
+    def filter(self, record):
+        record.pipeline = _pipeline.get()
+        record.run_id = _run_id.get()
+        return True
+
+
+class NivelMaximoFilter(logging.Filter):
+    """Deja pasar solo los registros bajo un nivel (separa log-* de error-log-*)."""
+
+    def __init__(self, nivel):
+        super().__init__()
+        self.nivel = nivel
+
+    def filter(self, record):
+        return record.levelno < self.nivel
+
+
+class ArchivoDiarioHandler(logging.Handler):
+    """
+    Escribe cada registro en el archivo de su pipeline y de su día (<nombre>-<pipeline>-<fecha><ext>).
+    La rotación es por nombre, sin renombrar archivos: los procesos de cron de cada pipeline
+    (y el scheduler) pueden escribir a la vez, y en Windows no se puede renombrar un archivo
+    que otro proceso tiene abierto. Se conservan los últimos 'respaldos' días por pipeline.
+    """
+
+    def __init__(self, nombre_archivo, respaldos):
+        super().__init__()
+        self.base, self.extension = os.path.splitext(os.path.join(script_dir, nombre_archivo))
+        self.respaldos = respaldos
+        # pipeline -> (fecha, archivo abierto)
+        self.archivos = {}
+
+    def ruta(self, pipeline, fecha):
+        return '{0}-{1}-{2}{3}'.format(self.base, pipeline, fecha, self.extension)
+
+    def emit(self, record):
+        try:
+            pipeline = getattr(record, 'pipeline', None) or 'general'
+            fecha = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d')
+            actual = self.archivos.get(pipeline)
+            if actual is None or actual[0] != fecha:
+                if actual is not None:
+                    actual[1].close()
+                actual = self.archivos[pipeline] = (fecha, open(self.ruta(pipeline, fecha), 'a', encoding='utf-8'))
+                self.depurar(pipeline)
+            actual[1].write(self.format(record) + '\n')
+            actual[1].flush()
+        except Exception:
+            self.handleError(record)
+
+    def depurar(self, pipeline):
+        """Elimina los archivos del pipeline más antiguos que los últimos 'respaldos' días."""
+        patron = (glob.escape('{0}-{1}-'.format(self.base, pipeline)) +
+                  '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]' + glob.escape(self.extension))
+        for ruta in sorted(glob.glob(patron))[:-self.respaldos]:
+            try:
+                os.remove(ruta)
+            except OSError:
+                # Abierto por otro proceso (Windows): se elimina en una próxima depuración
+                pass
+
+    def close(self):
+        self.acquire()
+        try:
+            for _, archivo in self.archivos.values():
+                archivo.close()
+            self.archivos = {}
+        finally:
+            self.release()
+        super().close()
+
+
+def crear_handler_archivo(nombre_archivo):
+    """Crea el handler de archivo (un archivo por pipeline y día)."""
+    handler = ArchivoDiarioHandler(nombre_archivo, const.LOG_RESPALDOS)
+    handler.setFormatter(JsonLinesFormatter())
+    return handler
+
+
+def obtener_logger():
+    """Retorna el logger de la aplicación, iniciando el escritor en segundo plano la primera vez."""
+    global _listener
+    logger = logging.getLogger(NOMBRE_LOGGER)
+    if _listener is not None:
+        return logger
+
+    with _lock:
+        if _listener is None:
+            cola = queue.SimpleQueue()
+
+            handler_log = crear_handler_archivo(const.LOG_FILE)
+            handler_log.addFilter(NivelMaximoFilter(logging.ERROR))
+            handler_error = crear_handler_archivo(const.ERROR_LOG_FILE)
+            handler_error.setLevel(logging.ERROR)
+
+            handler_cola = logging.handlers.QueueHandler(cola)
+            handler_cola.addFilter(ContextoFilter())
+            logger.addHandler(handler_cola)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+            _listener = logging.handlers.QueueListener(
+                cola, handler_log, handler_error, respect_handler_level=True)
+            _listener.start()
+            atexit.register(detener)
+
+    return logger
+
+
+def iniciar_ejecucion(pipeline):
+    """Asigna un nuevo id de ejecución al pipeline en el hilo actual y lo retorna."""
+    run_id = uuid.uuid4().hex[:12]
+    _pipeline.set(pipeline)
+    _run_id.set(run_id)
+    return run_id
+
+
+def run_id_actual():
+    """Retorna el id de ejecución del hilo actual."""
+    return _run_id.get()
+
+
+def pipeline_actual():
+    """Retorna el pipeline en ejecución del hilo actual."""
+    return _pipeline.get()
+
+
+def detener():
+    """Vacía la cola y detiene el escritor en segundo plano."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            logging.getLogger(NOMBRE_LOGGER).handlers.clear()
+            _listener = None
@@ -14,8 +14,14 @@
 
 import arcpy
 import utils
+import logs
+import metricas
+import lease
+import spans
+import agromet
+import catalogo_agromet
+import historial_agromet
 import constants as const
-import requests
 import traceback
 import os
 import time
@@ -25,11 +31,17 @@ from datetime import datetime, timedelta
 #-------------------------------------------------------------------------------
 # Workspace
 #-------------------------------------------------------------------------------
-arcpy.env.workspace = const.WORKSPACE
-# Sobreescribo la misma capa de salida
-arcpy.env.overwriteOutput = True
-# Set the preserveGlobalIds environment to True
-arcpy.env.preserveGlobalIds = True
+def configurar_entorno():
+    """Configura el entorno de arcpy del pipeline (el proceso de mainScheduler lo comparte entre pipelines)."""
+    arcpy.env.workspace = const.WORKSPACE
+    # Sobreescribo la misma capa de salida
+    arcpy.env.overwriteOutput = True
+    # Set the preserveGlobalIds environment to True
+    arcpy.env.preserveGlobalIds = True
+
+
+configurar_entorno()
+
 # DATASET
 dataset = const.DATASET
 
@@ -48,6 +60,16 @@ userkey_agromet = const.USERKEY_AGROMET
 def main():
     """Main function Agromet."""
 
+    configurar_entorno()
+    # Una sola ejecución del pipeline a la vez (ver LEASE_POLITICA_AGROMET)
+    lease.ejecutar('agromet', procesar)
+
+
+def procesar():
+    """Proceso Agromet, ejecutado bajo el lease del pipeline."""
+
+    logs.iniciar_ejecucion('agromet')
+    spans.iniciar('agromet')
     timeStart = time.time()
     arcpy.AddMessage("Proceso Agromet iniciado... " + str(datetime.now()))
     utils.log("Proceso Agromet iniciado")
@@ -55,18 +77,27 @@ def main():
     #-------------------------------------------------------------------------------
     # Proceso AGROMET
     #-------------------------------------------------------------------------------
-    # Proceso que permite actualizar la direccion del viento de las estaciones meteorológicas
-    arcpy.AddMessage("Obteniendo direccion del viento... ")
-    utils.log("Obteniendo direccion del viento")
+    # Proceso que permite actualizar la direccion del viento, humedad, temperatura y velocidad del viento de las estaciones meteorológicas
+    arcpy.AddMessage("Obteniendo variables de las estaciones... ")
+    utils.log("Obteniendo variables de las estaciones")
     obtener_variables_agromet(url_agromet, userkey_agromet)
-    arcpy.AddMessage("Actualizando direccion del viento... ")
-    utils.log("Actualizando direccion del viento")
+    arcpy.AddMessage("Actualizando variables de las estaciones... ")
+    utils.log("Actualizando variables de las estaciones")
 
     timeEnd = time.time()
     timeElapsed = timeEnd - timeStart
     arcpy.AddMessage("Proceso Agromet finalizado... " + str(datetime.now()))
     arcpy.AddMessage("Tiempo de ejecución: " +str(utils.convert_seconds(timeElapsed)))
     utils.log("Tiempo de ejecución: " + str(utils.convert_seconds(timeElapsed)))
+    # Compacto y aplico la retención del historial de muestras
+    with spans.span('mantener_historial'):
+        historial_agromet.mantener()
+
+    # Espero la revalidacion del catalogo de variables, si se inició
+    catalogo_agromet.esperar_revalidacion()
+
+    spans.finalizar()
+    metricas.exportar()
     utils.log("Proceso Agromet finalizado \n")
 
 
@@ -78,47 +109,67 @@ def obtener_variables_agromet(url_agromet, userkey_agromet):
         estaciones = []
         muestras = []
         ahora = datetime.now()
-        fecha_hoy = str(ahora.strftime('%Y-%m-%d'))
         # A la hora actual, le resto 20 minutos ya que es el tiempo de actualizacion del servicio de agromet
+        # (fecha y hora juntas: entre las 00:00 y las 00:20 la referencia es del día anterior)
         hace_20_min = ahora - timedelta(minutes=20)
-        hhmm = hace_20_min.strftime('%H%M')
 
-        print('Fecha y hora consultada: {0} - {1} '.format(fecha_hoy, hhmm))
-        utils.log("Fecha y hora consultada: {0} - {1} ".format(fecha_hoy, hhmm))
+        print('Fecha y hora consultada: {0} '.format(hace_20_min.strftime('%Y-%m-%d %H:%M')))
+        utils.log("Fecha y hora consultada: {0} ".format(hace_20_min.strftime('%Y-%m-%d %H:%M')))
 
-        with arcpy.da.SearchCursor(fc, ['id', 'id_direccion_viento', 'id_humedad_media', 'id_temperatura_media', 'id_velocidad_viento_max', 'id_velocidad_viento_media', 'nombre', 'comuna']) as cursor:
+        coordenadas = []
+        with arcpy.da.SearchCursor(fc, ['id', 'nombre', 'comuna', 'SHAPE@XY'],
+                                   spatial_reference=arcpy.SpatialReference(4326)) as cursor:
             for row in cursor:
                 estaciones.append({
                     "id_estacion": row[0],
-                    "id_direccion_viento": row[1],
-                    "id_humedad_media": row[2],
-                    "id_temperatura_media": row[3],
-                    "id_velocidad_viento_max": row[4],
-                    "id_velocidad_viento_media": row[5],
-                    "nombre": row[6],
-                    "comuna": row[7],
+                    "nombre": row[1],
+                    "comuna": row[2],
                 })
+                if row[3] is not None:
+                    coordenadas.append((row[0], row[3][0], row[3][1]))
         del cursor
 
+        # Reconstruyo el índice espacial de las estaciones (estación más cercana a cada incendio)
+        with spans.span('indice_estaciones', filas=len(coordenadas)):
+            if coordenadas:
+                ids, lons, lats = zip(*coordenadas)
+                catalogo_agromet.guardar_indice(ids, lons, lats)
+
+        # Obtengo los ids de las variables de cada estacion desde el catalogo local
+        variables = catalogo_agromet.obtener_variables([e['id_estacion'] for e in estaciones])
+        for estacion in estaciones:
+            ids = variables.get(estacion['id_estacion'], {})
+            for variable in agromet.VARIABLES:
+                estacion['id_' + variable] = ids.get(variable)
+
         # Obtengo las muestras por cada variable
-        muestras = get_muestras(estaciones, fecha_hoy, hhmm)
+        with spans.span('muestreo'):
+            muestras = get_muestras(estaciones, hace_20_min)
+
+        # Guardo las muestras en el historial local
+        with spans.span('historial') as s:
+            s.anotar(filas=historial_agromet.agregar(muestras, ahora))
         
-        # Por cada estacion, actualizo el valor de la direccion del viento 'direccion_viento' y la fecha de actualizacion 'fecha_actualizacion'
-        with arcpy.da.UpdateCursor(fc, ['id', 'direccion_viento', 'fecha_actualizacion']) as cursor:
-        # with arcpy.da.UpdateCursor(fc, ['id', 'direccion_viento', 'humedad_media', 'temperatura_media', 'velocidad_viento_max', 'velocidad_viento_media', 'fecha_actualizacion']) as cursor:
-            for row in cursor:
-                for k in muestras:
-                    if row[0] == k['id_estacion']:
-                        row[1] = k['direccion_viento']
-                        # row[2] = k['humedad_media']
-                        # row[3] = k['temperatura_media']
-                        # row[4] = k['velocidad_viento_max']
-                        # row[5] = k['velocidad_viento_media']
-                        row[2] = ahora
+        # Indexo las muestras por estacion
+        muestras_por_estacion = {k['id_estacion']: k for k in muestras}
+
+        # Por cada estacion, actualizo las variables consultadas y la fecha de actualizacion 'fecha_actualizacion'
+        # Solo se escriben las estaciones cuyas variables cambiaron
+        actualizadas = 0
+        with spans.span('actualizar_estaciones'):
+            fields = ['id'] + list(agromet.VARIABLES) + ['fecha_actualizacion']
+            with arcpy.da.UpdateCursor(fc, fields) as cursor:
+                for row in cursor:
+                    k = muestras_por_estacion.get(row[0])
+                    if k is not None and agromet.aplicar_cambios(row, k, agromet.VARIABLES):
+                        row[-1] = ahora
                         print('Estacion: {0}, direccion viento: {1}'.format(
-                            k['id_estacion'], k['direccion_viento']))
+                            k['id_estacion'], k.get('direccion_viento')))
                         cursor.updateRow(row)
-        del cursor
+                        actualizadas += 1
+            del cursor
+            spans.anotar(filas=actualizadas)
+        metricas.incrementar('estaciones_actualizadas_total', actualizadas)
 
     except:
         print("Failed obtener_variables_agromet (%s)" %
@@ -127,28 +178,12 @@ def obtener_variables_agromet(url_agromet, userkey_agromet):
                         traceback.format_exc())
 
 
-def get_muestras(estaciones, fecha_hoy, hhmm):
-    """Retorna la muestra por cada una de las vaiables consultadas."""
+def get_muestras(estaciones, referencia):
+    """Retorna la muestra por cada una de las vaiables consultadas, a la fecha y hora de referencia."""
     try:
-        muestras = []
-
-        # Hago el llamado a la api por cada estacion para consultar la direccion del viento
-        for estacion in estaciones:
-            print('Consultando estacion: {0}, {1}'.format(estacion['nombre'], estacion['comuna']))
-            direccion_viento = get_data_variable(estacion['id_direccion_viento'], fecha_hoy, hhmm)
-            # humedad_media = get_data_variable(estacion['id_humedad_media'], fecha_hoy, hhmm)
-            # temperatura_media = get_data_variable(estacion['id_temperatura_media'], fecha_hoy, hhmm)
-            # velocidad_viento_max = get_data_variable(estacion['id_velocidad_viento_max'], fecha_hoy, hhmm)
-            # velocidad_viento_media = get_data_variable(estacion['id_velocidad_viento_media'], fecha_hoy, hhmm)
-
-            muestras.append({
-                "id_estacion": int(estacion['id_estacion']),
-                "direccion_viento": float(direccion_viento)
-                # "humedad_media": float(humedad_media),
-                # "temperatura_media": float(temperatura_media),
-                # "velocidad_viento_max": float(velocidad_viento_max),
-                # "velocidad_viento_media": float(velocidad_viento_media)
-            })
+        print('Consultando {0} estaciones'.format(len(estaciones)))
+        # Consulto las variables de todas las estaciones como un solo lote en paralelo
+        muestras = agromet.get_muestras(estaciones, referencia, agromet.VARIABLES)
 
         return muestras
 
@@ -159,31 +194,5 @@ def get_muestras(estaciones, fecha_hoy, hhmm):
                         traceback.format_exc())
 
 
-def get_data_variable(idEmaVariable, fecha_hoy, hhmm):
-    """Retorna el valor de una variable."""
-    try:
-        value = 0
-        url = url_agromet + 'muestras/?idEmaVariable=' + str(idEmaVariable) + '&desde=' + \
-            fecha_hoy + '&hasta=' + fecha_hoy + \
-            '&user=' + userkey_agromet
-        
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            if data['muestras'] != None:
-                largo = len(data['muestras'])
-                if largo > 0:
-                    last = largo - 1
-                    value = data['muestras'][last]['valor']
-            
-        return value
-
-    except:
-        print("Failed get_data_variable (%s)" %
-              traceback.format_exc())
-        utils.error_log("Failed get_data_variable (%s)" %
-                        traceback.format_exc())
-
-
 if __name__ == '__main__':
     main()
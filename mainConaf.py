@@ -18,10 +18,17 @@
 import arcinfo
 import arcpy
 import utils
+import conaf
+import logs
+import spans
+import metricas
+import lease
+import edicion
+import geometria
+import agromet
+import catalogo_agromet
 import constants as const
-import requests
 import xml.etree.ElementTree as et
-import urllib.request as ur
 import traceback
 import os
 import time
@@ -29,19 +36,23 @@ import json
 from datetime import datetime, timedelta
 
 # Workspace
-arcpy.env.workspace = const.WORKSPACE
-# Sobreescribo la misma capa de salida
-arcpy.env.overwriteOutput = True
-# Set the preserveGlobalIds environment to True
-arcpy.env.preserveGlobalIds = False
+def configurar_entorno():
+    """Configura el entorno de arcpy del pipeline (el proceso de mainScheduler lo comparte entre pipelines)."""
+    arcpy.env.workspace = const.WORKSPACE
+    # Sobreescribo la misma capa de salida
+    arcpy.env.overwriteOutput = True
+    # Set the preserveGlobalIds environment to True
+    arcpy.env.preserveGlobalIds = False
+
+
+configurar_entorno()
+
 # Ruta absoluta del script
 script_dir = os.path.dirname(__file__)
 # DATASET
 dataset = const.DATASET
 # DATASET Ministerio
 dataset_ministerio = const.DATASET_MINISTERIO
-# Folder local
-folder_local = const.WORKSPACE_LOCAL
 #-------------------------------------------------------------------------------
 # Configuracion CONAF
 #-------------------------------------------------------------------------------
@@ -53,8 +64,6 @@ usar_kml_local = const.USE_FILE_KML
 url_conaf_file = os.path.join(script_dir, const.URL_FILE_CONAF)
 # URL API
 url_conaf_api = const.URL_API_CONAF
-# Namespace
-nmsp_conaf = '{http://www.opengis.net/kml/2.2}'
 # Capa de conaf en donde se guardan los incendios
 capa_incendios = const.INCENDIOS
 # Capa con puntos afectados
@@ -65,12 +74,55 @@ capa_lineas_afectadas = const.LINEAS_AFECTADAS
 capa_buffer_incendios = const.BUFFER_INCENDIOS
 # Capa de lectura de incendios de AGOL
 capa_buffer_incendios_visor = const.BUFFER_VISOR
+# Estaciones meteorológicas (viento para los buffers)
+capa_estaciones_meteorologicas = const.ESTACIONES_METEOROLOGICAS
+# Modo y distancia del buffer
+buffer_modo = const.BUFFER_MODO
+buffer_distancia_km = const.BUFFER_DISTANCIA_KM
+# Densificación y niveles de detalle (tolerancia en metros, escala mínima) de los buffers publicados en el visor
+buffer_visor_densificar = const.BUFFER_VISOR_DENSIFICAR_GRADOS
+BUFFER_VISOR_LODS = const.BUFFER_VISOR_LODS
+# Campos del buffer visor con el nivel de detalle de cada polígono
+CAMPOS_LOD = [
+    ('lod', 'SHORT'),
+    ('escala_min', 'LONG'),
+]
+# Campos de las capas de resultados con la distancia (m) de cada instalación a su incendio
+CAMPOS_CERCANIA = [
+    ('near_dist', 'DOUBLE'),
+]
+# Campos de la capa de incendios con la estación meteorológica más cercana y sus lecturas
+CAMPOS_METEO = [
+    ('id_estacion_meteo', 'LONG'),
+    ('estacion_meteo', 'TEXT'),
+    ('distancia_estacion_km', 'DOUBLE'),
+    ('direccion_viento', 'DOUBLE'),
+    ('velocidad_viento_media', 'DOUBLE'),
+    ('temperatura_media', 'DOUBLE'),
+    ('humedad_media', 'DOUBLE'),
+    ('fecha_meteo', 'DATE'),
+]
 
 user_datos = const.USER_DATOS
 
 def main():
     """Main function Conaf."""
 
+    configurar_entorno()
+    # Una sola ejecución del pipeline a la vez (ver LEASE_POLITICA_CONAF)
+    lease.ejecutar('conaf', procesar)
+
+
+def procesar():
+    """Proceso Conaf, ejecutado bajo el lease del pipeline."""
+
+    logs.iniciar_ejecucion('conaf')
+    spans.iniciar('conaf')
+    # Las capas del visor se editan en una sola sesión de edición por ciclo
+    unidad = edicion.iniciar(arcpy.env.workspace)
+    # Las bajas de incendios (extinguidos o borrados del servicio) se confirman aparte, antes del
+    # resto del ciclo: el incendio y su buffer, puntos y lineas se eliminan juntos o no se eliminan
+    bajas = edicion.UnidadDeTrabajo(arcpy.env.workspace)
     timeStart = time.time()
     arcpy.AddMessage("Proceso Conaf iniciado... " + str(datetime.now()))
     utils.log("Proceso Conaf iniciado")
@@ -81,71 +133,103 @@ def main():
     # Obtengo la data de Conaf
     incendios = []
     if usar_kml_local == 'true':
-        # Elimino los incendios anteriores 
-        utils.truncar_data_dataset(capa_incendios)
-        # Elimino los buffers anteriores del visor
-        utils.truncar_data_dataset(capa_buffer_incendios_visor)
+        with spans.span('truncar_capas'):
+            # Elimino los incendios anteriores. La capa de incendios no pasa por la unidad de trabajo:
+            # es la entrada del ciclo (el buffer, las estaciones y los cruces la leen antes de confirmar),
+            # por lo que se edita directamente. Con el kml local se recarga completa en cada ciclo
+            utils.truncar_data_dataset(capa_incendios)
+            # Elimino los buffers anteriores del visor
+            unidad.truncar(capa_buffer_incendios_visor)
         # Obtengo los indendios desde archivo local
-        data_conaf = et.parse(url_conaf_file)
+        with spans.span('descarga_kml', bytes=os.path.getsize(url_conaf_file)):
+            data_conaf = et.parse(url_conaf_file)
         # Proceso la data de Conaf y la almaceno en la GDB 'capa_incendios' y en el servicio REST de conaf
-        incendios = procesar_data_conaf_local(data_conaf)
+        with spans.span('procesar_incendios'):
+            incendios = procesar_data_conaf_local(data_conaf, bajas)
     else:
         # Obtengo los indendios desde servicio web
         data_conaf = utils.get_data_kml(url_conaf_api)
         # Proceso la data de Conaf y la almaceno en la GDB 'capa_incendios' y en el servicio REST de conaf
-        incendios = procesar_data_conaf_rest(data_conaf)
-    
+        with spans.span('procesar_incendios'):
+            incendios = procesar_data_conaf_rest(data_conaf, bajas)
+
+    # Elimino los incendios extinguidos o borrados con sus buffers y resultados. Si la edición
+    # falla, los incendios siguen en la capa y el próximo ciclo los vuelve a dar de baja
+    bajas.confirmar()
+
+    # Registro las métricas de incendios procesados
+    for tipo in ('nuevos', 'actualizados', 'extinguidos'):
+        metricas.incrementar('incendios_total', incendios[tipo], tipo=tipo)
+    metricas.fijar('incendios_activos', incendios['incendios_activos'])
 
     # Si no existen incendios activos en el servicio de conaf, limpio todas las capas
     if (incendios['incendios_activos'] == 0):
     # if (incendios['actualizados'] == 0 and incendios['nuevos'] == 0 and incendios['extinguidos'] == 0):
         informar_incendios_extinguidos()
-        utils.truncar_data_dataset(capa_incendios)
-        utils.truncar_data_dataset(capa_puntos_afectados)
-        utils.truncar_data_dataset(capa_lineas_afectadas)
-        utils.truncar_data_dataset(capa_buffer_incendios_visor)
+        unidad.truncar(capa_incendios)
+        unidad.truncar(capa_puntos_afectados)
+        unidad.truncar(capa_lineas_afectadas)
+        unidad.truncar(capa_buffer_incendios_visor)
 
 
     # Si existen incendios nuevos, creo los buffer a cada uno de ellos, ejecuto el análisis y actualizo las capas
     # Si hay actualizacion de algun incendio, actualizo el estado del servicio de incendios, buffer y capas de resultados
     if (incendios['actualizados'] > 0 or incendios['nuevos'] > 0):
 
+        # Asocio a cada incendio la estación meteorológica más cercana y sus últimas lecturas
+        meteo = enriquecer_incendios_meteo()
+
        # Creo el buffer a los incendios (sobreescribe el existente)
         crear_buffer(capa_incendios)
 
         # Borro los buffers creados con anterioridad
-        utils.truncar_data_dataset(capa_buffer_incendios_visor)
+        unidad.truncar(capa_buffer_incendios_visor)
         # Una vez creado el buffer, copio los datos en capa_buffer_incendios_visor
         copiar_datos_buffer(capa_buffer_incendios, capa_buffer_incendios_visor)
 
-        # Ejecuto el cruce espacial del buffer creado versus las capas del min. energía (crea y sobreescribe las capas de cruces)
-        ejecutar_analisis(capa_buffer_incendios_visor)
+        # Ejecuto el cruce espacial del buffer creado versus las capas del min. energía (crea y sobreescribe las capas de cruces).
+        # Se usa el buffer temporal: el buffer visor recién se actualiza al confirmar la edición
+        ejecutar_analisis(capa_buffer_incendios)
         
         # Limpio las capas de resultados local
-        utils.truncar_data_dataset(capa_puntos_afectados)
-        utils.truncar_data_dataset(capa_lineas_afectadas)
+        unidad.truncar(capa_puntos_afectados)
+        unidad.truncar(capa_lineas_afectadas)
 
         # Actualizo las capas locales con los resultados (puntos y lineas afectadas)
-        actualizar_resultados_local_lineas()
-        actualizar_resultados_local_puntos()
-
-        # Ejecuto funcion de cercania para obtener la distancia entre los resultados y los incendios.
-        # Se quita funcionalidad de cercanía debido a que ocupa licencia advanced
-        # ejecutar_cercania(capa_puntos_afectados)
-        # ejecutar_cercania(capa_lineas_afectadas)
-
-        # Obtengo las entidades afectadas por el incendio, 
-        # si hay incendios nuevos, envio la alerta
-        entidades = obtener_resultados()
-        
-        # Cuando existen incendios nuevos se informa
-        if incendios['nuevos'] > 0:
-            # Envío las alertas a las entidades afectadas
-            generar_alertas(entidades)
+        with spans.span('insertar_resultados'):
+            lineas = actualizar_resultados_local_lineas()
+            puntos = actualizar_resultados_local_puntos()
+            # Distancia de los resultados a su incendio (near_dist), en un solo cálculo para puntos y lineas
+            ejecutar_cercania(puntos, lineas)
+            insert_data_local(capa_lineas_afectadas, lineas)
+            insert_data_local(capa_puntos_afectados, puntos, True)
+
+        # Publico buffers y resultados juntos (si falló una etapa, el visor queda como en el ciclo anterior)
+        if unidad.confirmar():
+            # Obtengo las entidades afectadas por el incendio, 
+            # si hay incendios nuevos, envio la alerta
+            entidades = obtener_resultados()
+            
+            # Cuando existen incendios nuevos se informa
+            if incendios['nuevos'] > 0:
+                # Envío las alertas a las entidades afectadas
+                generar_alertas(entidades, meteo)
+        elif usar_kml_local != 'true':
+            # Sin publicar, las capas de resultados son las del ciclo anterior: no se alerta sobre ellas.
+            # Los incendios nuevos se quitan de la capa para que el próximo ciclo los procese y alerte
+            descartar_incendios_nuevos(incendios['ids_nuevos'])
+        else:
+            # Con el kml local la capa se recarga completa en el próximo ciclo (todos los incendios
+            # vuelven a ser nuevos): se mantienen los del archivo en vez de dejarla vacía
+            utils.log("Edición sin publicar: los incendios del kml local se procesan en el próximo ciclo")
     
     
+    # Confirmo las ediciones restantes (capas sin incendios activos)
+    unidad.confirmar()
+
     # Elimino las tablas auxiliares
-    utils.delete_temp_tables()
+    with spans.span('eliminar_temporales'):
+        utils.delete_temp_tables()
 
     timeEnd = time.time()
     timeElapsed = timeEnd - timeStart
@@ -155,9 +239,30 @@ def main():
     utils.log("Se procesaron " + str(incendios) + ' incendios')
     utils.log("Tiempo de ejecución: " +
               str(utils.convert_seconds(timeElapsed)))
+    spans.finalizar()
+    metricas.exportar()
     utils.log("Proceso Conaf finalizado \n")
 
 
+def descartar_incendios_nuevos(ids_nuevos):
+    """Elimina de la capa de incendios los incendios registrados en este ciclo (no publicados ni alertados)."""
+    try:
+        if not ids_nuevos:
+            return
+        fc = os.path.join(arcpy.env.workspace, dataset, capa_incendios)
+        with arcpy.da.UpdateCursor(fc, ['id_incendio'], where_clause=edicion.clausula_in(fc, 'id_incendio', ids_nuevos)) as cursor:
+            for _ in cursor:
+                cursor.deleteRow()
+        del cursor
+        utils.log("Incendios nuevos descartados hasta el próximo ciclo: " + ', '.join(ids_nuevos))
+
+    except:
+        print("Failed descartar_incendios_nuevos (%s)" % traceback.format_exc())
+        utils.error_log("Failed descartar_incendios_nuevos (%s)" %
+                        traceback.format_exc())
+
+
+@spans.medido('informar_extinguidos')
 def informar_incendios_extinguidos():
     """Informa al admin que el incendio se ha extinguido, cuando no existe ningún incendio registrado por conaf."""
     try:
@@ -176,12 +281,13 @@ def informar_incendios_extinguidos():
                         traceback.format_exc())
 
 
-def procesar_data_conaf_rest(data):
+def procesar_data_conaf_rest(data, bajas):
     """
     Procesa la data obtenida desde el servicio de conaf y actualiza la capa de incendios de conaf
     1.- Se leen los icendios desde el servicio de conaf
     2.- Se registran los nuevos incendios
     3.- Se actualiza el estado de los incendios registrados
+    Los incendios extinguidos o borrados se eliminan en la unidad de trabajo 'bajas'.
     """
     try:
         arcpy.AddMessage("Procesando data de conaf...")
@@ -191,6 +297,7 @@ def procesar_data_conaf_rest(data):
         incendios_extinguidos = 0
         incendios_activos = 0
         indendios_servicio = []
+        ids_nuevos = []
 
         fields = [
             'id_incendio', 
@@ -205,23 +312,16 @@ def procesar_data_conaf_rest(data):
 
         fc = os.path.join(arcpy.env.workspace, dataset, capa_incendios)
 
-        for pm in data.iterfind('.//{0}Placemark'.format(nmsp_conaf)):
+        for placemark in conaf.leer_kml(data):
 
-            incendio = pm.find('{0}name'.format(nmsp_conaf)).text  # Nombre del incendio
-            
-            id_incendio = pm.find('{0}ExtendedData/{0}SchemaData/{0}SimpleData'.format(nmsp_conaf)).text  # Id del incendio
+            incendio = placemark['nombre_incendio']  # Nombre del incendio
+            id_incendio = placemark['id_incendio']  # Id del incendio
             indendios_servicio.append(id_incendio)
 
-            for ls in pm.iterfind('{0}Point/{0}coordinates'.format(nmsp_conaf)):
-
-                # print('hay incendios activos en el servicio de conaf -------------------------------------')
+            for longitud, latitud in placemark['coordenadas']:
 
                 incendios_activos += 1
 
-                coordinates = ls.text.strip().replace(',0', '')
-                res = coordinates.split(',')
-                longitud, latitud = res
-
                 # Obtengo la informacion adicional del incendio, que no viene dentro de los atributos del Placemark, esta informacion está contenida dentro de un iframe
                 fecha_inicio_incendio, comuna, superficie, estado_incendio_servicio = utils.get_data_iframe(id_incendio)
                 utils.log("Incendio: {0}, comuna: {1}, superficie: {2}, estado: {3}".format(id_incendio, comuna, superficie, estado_incendio_servicio))
@@ -243,36 +343,9 @@ def procesar_data_conaf_rest(data):
                                 incendios_extinguidos += 1
                                 utils.enviar_correo_admin_extinguido(id_incendio, fecha_inicio_incendio, comuna, nombre_incendio)
 
-                                # Elimino el registro del incendio en la base de datos
-                                with arcpy.da.UpdateCursor(fc, ['id_incendio']) as cursor_update:
-                                    for row_u in cursor_update:
-                                        if row_u[0] == id_incendio:
-                                            cursor_update.deleteRow()
-                                del cursor_update
-
-                                # Elimino el buffer del incendio
-                                fcb = os.path.join(arcpy.env.workspace, dataset, capa_buffer_incendios_visor)
-                                with arcpy.da.UpdateCursor(fcb, ['id_incendio']) as cursor_update:
-                                    for row_u in cursor_update:
-                                        if row_u[0] == id_incendio:
-                                            cursor_update.deleteRow()    
-                                del cursor_update
-
-                                # Elimino las lineas afectadas el incendio
-                                fcl = os.path.join(arcpy.env.workspace, dataset, capa_lineas_afectadas)
-                                with arcpy.da.UpdateCursor(fcl, ['id_incendio']) as cursor_update:
-                                    for row_u in cursor_update:
-                                        if row_u[0] == id_incendio:
-                                            cursor_update.deleteRow()
-                                del cursor_update
-
-                                # Elimino los puntos afectadas el incendio
-                                fcp = os.path.join(arcpy.env.workspace, dataset, capa_puntos_afectados)
-                                with arcpy.da.UpdateCursor(fcp, ['id_incendio']) as cursor_update:
-                                    for row_u in cursor_update:
-                                        if row_u[0] == id_incendio:
-                                            cursor_update.deleteRow()
-                                del cursor_update
+                                # Elimino el incendio, su buffer y las lineas y puntos afectados (al confirmar las bajas)
+                                for capa in (capa_incendios, capa_buffer_incendios_visor, capa_lineas_afectadas, capa_puntos_afectados):
+                                    bajas.eliminar(capa, 'id_incendio', [id_incendio])
                             # with arcpy.da.UpdateCursor(fc, ['id_incendio', 'estado_incendio', 'informado']) as cursor_update:
                             #     for row_u in cursor_update:
                             #         if row_u[0] == id_incendio:
@@ -284,6 +357,7 @@ def procesar_data_conaf_rest(data):
                     # Si no existe, lo guardo
                     if existe == False:
                         incendios_nuevos += 1
+                        ids_nuevos.append(id_incendio)
                         # Creo la geometría de punto
                         point = arcpy.Point(float(longitud), float(latitud))
                         out_sr = arcpy.SpatialReference("WGS 1984")
@@ -307,10 +381,12 @@ def procesar_data_conaf_rest(data):
             'actualizados': incendios_actualizados,
             'nuevos': incendios_nuevos,
             'extinguidos': incendios_extinguidos,
-            'incendios_activos': incendios_activos
+            'incendios_activos': incendios_activos,
+            'ids_nuevos': ids_nuevos
         }
 
-        notifica_incencios_borrados(indendios_servicio)
+        notifica_incencios_borrados(indendios_servicio, bajas)
+        spans.anotar(filas=incendios_activos)
 
         print('Incendios: ', total)
 
@@ -321,9 +397,11 @@ def procesar_data_conaf_rest(data):
         utils.error_log("Failed procesar_data_conaf_rest (%s)" %
                         traceback.format_exc())
 
-def notifica_incencios_borrados(incendios):
+@spans.medido('notificar_borrados')
+def notifica_incencios_borrados(incendios, bajas):
     """Permite notificar un incendio como extinguido 
-    cuando conaf lo borra del servicio sin cambiar el estado a extinguido"""
+    cuando conaf lo borra del servicio sin cambiar el estado a extinguido.
+    Los incendios notificados se eliminan en la unidad de trabajo 'bajas'"""
     try:
         str_incendios = '\'' + '\', \''.join(incendios) + '\''
         fc = os.path.join(arcpy.env.workspace, dataset, capa_incendios)
@@ -338,50 +416,22 @@ def notifica_incencios_borrados(incendios):
                 utils.enviar_correo_admin_extinguido(row[0], row[1], row[2], row[3])
         del cursor
 
-        # Elimino el registro del incendio en la base de datos
-        with arcpy.da.UpdateCursor(fc, ['id_incendio']) as cursor_update:
-            for row_u in cursor_update:
-                if row_u[0] in incendios_notificados:
-                    cursor_update.deleteRow()    
-        del cursor_update
-
-
-        # Elimino el buffer del incendio
-        fc = os.path.join(arcpy.env.workspace, dataset, capa_buffer_incendios_visor)
-        with arcpy.da.UpdateCursor(fc, ['id_incendio']) as cursor_update:
-            for row_u in cursor_update:
-                if row_u[0] in incendios_notificados:
-                    cursor_update.deleteRow()    
-        del cursor_update
-
-        # Elimino las lineas afectadas el incendio
-        fc = os.path.join(arcpy.env.workspace, dataset, capa_lineas_afectadas)
-        with arcpy.da.UpdateCursor(fc, ['id_incendio']) as cursor_update:
-            for row_u in cursor_update:
-                if row_u[0] in incendios_notificados:
-                    cursor_update.deleteRow()    
-        del cursor_update
-
-        # Elimino los puntos afectadas el incendio
-        fc = os.path.join(arcpy.env.workspace, dataset, capa_puntos_afectados)
-        with arcpy.da.UpdateCursor(fc, ['id_incendio']) as cursor_update:
-            for row_u in cursor_update:
-                if row_u[0] in incendios_notificados:
-                    cursor_update.deleteRow()    
-        del cursor_update
-        
+        # Elimino los incendios, sus buffers y las lineas y puntos afectados (al confirmar las bajas)
+        for capa in (capa_incendios, capa_buffer_incendios_visor, capa_lineas_afectadas, capa_puntos_afectados):
+            bajas.eliminar(capa, 'id_incendio', incendios_notificados)
 
     except:
         print("Failed notifica_incencios_borrados (%s)" % traceback.format_exc())
         utils.error_log("Failed notifica_incencios_borrados (%s)" %
                         traceback.format_exc())
 
-def procesar_data_conaf_local(data):
+def procesar_data_conaf_local(data, bajas):
     """
     Procesa la data obtenida desde un kml local y actualiza la capa de incendios de conaf
     1.- Se leen los icendios desde el servicio de conaf
     2.- Se registran los nuevos incendios
     3.- Se actualiza el estado de los incendios registrados
+    Los incendios extinguidos o borrados se eliminan en la unidad de trabajo 'bajas'.
     """
     try:
         arcpy.AddMessage("Procesando data de conaf...")
@@ -391,6 +441,7 @@ def procesar_data_conaf_local(data):
         incendios_extinguidos = 0
         incendios_activos = 0
         indendios_servicio = []
+        ids_nuevos = []
 
         fields = [
             'id_incendio',
@@ -405,23 +456,16 @@ def procesar_data_conaf_local(data):
 
         fc = os.path.join(arcpy.env.workspace, dataset, capa_incendios)
 
-        for pm in data.iterfind('.//{0}Placemark'.format(nmsp_conaf)):
-
-            incendio = pm.find('{0}name'.format(nmsp_conaf)).text  # Nombre del incendio
+        for placemark in conaf.leer_kml(data):
 
-            id_incendio = pm.find('{0}ExtendedData/{0}SchemaData/{0}SimpleData'.format(nmsp_conaf)).text  # Id del incendio
+            incendio = placemark['nombre_incendio']  # Nombre del incendio
+            id_incendio = placemark['id_incendio']  # Id del incendio
             indendios_servicio.append(id_incendio)
 
-            for ls in pm.iterfind('{0}Point/{0}coordinates'.format(nmsp_conaf)):
-
-                # print('hay incendios activos en el kml de prueba -------------------------------------')
+            for longitud, latitud in placemark['coordenadas']:
 
                 incendios_activos += 1
 
-                coordinates = ls.text.strip().replace(',0', '')
-                res = coordinates.split(',')
-                longitud, latitud = res
-
                 # Obtengo la informacion adicional del incendio, que no viene dentro de los atributos del Placemark, esta informacion está contenida dentro de un iframe
                 fecha_inicio_incendio, comuna, superficie, estado_incendio_servicio = utils.get_data_iframe_aux(id_incendio)
 
@@ -441,36 +485,10 @@ def procesar_data_conaf_local(data):
                             if estado_incendio_servicio == 'Extinguido':
                                 incendios_extinguidos += 1
                                 utils.enviar_correo_admin_extinguido(id_incendio, fecha_inicio_incendio, comuna, nombre_incendio)
-                                # Elimino el registro del incendio en la base de datos
-                                with arcpy.da.UpdateCursor(fc, ['id_incendio']) as cursor_update:
-                                    for row_u in cursor_update:
-                                        if row_u[0] == id_incendio:
-                                            cursor_update.deleteRow()
-                                del cursor_update
-
-                                # Elimino el buffer del incendio
-                                fcb = os.path.join(arcpy.env.workspace, dataset, capa_buffer_incendios_visor)
-                                with arcpy.da.UpdateCursor(fcb, ['id_incendio']) as cursor_update:
-                                    for row_u in cursor_update:
-                                        if row_u[0] == id_incendio:
-                                            cursor_update.deleteRow()    
-                                del cursor_update
-
-                                # Elimino las lineas afectadas el incendio
-                                fcl = os.path.join(arcpy.env.workspace, dataset, capa_lineas_afectadas)
-                                with arcpy.da.UpdateCursor(fcl, ['id_incendio']) as cursor_update:
-                                    for row_u in cursor_update:
-                                        if row_u[0] == id_incendio:
-                                            cursor_update.deleteRow()
-                                del cursor_update
-
-                                # Elimino los puntos afectadas el incendio
-                                fcp = os.path.join(arcpy.env.workspace, dataset, capa_puntos_afectados)
-                                with arcpy.da.UpdateCursor(fcp, ['id_incendio']) as cursor_update:
-                                    for row_u in cursor_update:
-                                        if row_u[0] == id_incendio:
-                                            cursor_update.deleteRow()
-                                del cursor_update
+
+                                # Elimino el incendio, su buffer y las lineas y puntos afectados (al confirmar las bajas)
+                                for capa in (capa_incendios, capa_buffer_incendios_visor, capa_lineas_afectadas, capa_puntos_afectados):
+                                    bajas.eliminar(capa, 'id_incendio', [id_incendio])
                             # with arcpy.da.UpdateCursor(fc, ['id_incendio', 'estado_incendio', 'informado']) as cursor_update:
                             #     for row_u in cursor_update:
                             #         if row_u[0] == id_incendio:
@@ -484,6 +502,7 @@ def procesar_data_conaf_local(data):
                     # Si no existe, lo guardo
                     if existe == False:
                         incendios_nuevos += 1
+                        ids_nuevos.append(id_incendio)
                         # Creo la geometría de punto
                         point = arcpy.Point(float(longitud), float(latitud))
                         out_sr = arcpy.SpatialReference("WGS 1984")
@@ -507,10 +526,12 @@ def procesar_data_conaf_local(data):
             'actualizados': incendios_actualizados,
             'nuevos': incendios_nuevos,
             'extinguidos': incendios_extinguidos,
-            'incendios_activos': incendios_activos
+            'incendios_activos': incendios_activos,
+            'ids_nuevos': ids_nuevos
         }
 
-        notifica_incencios_borrados(indendios_servicio)
+        notifica_incencios_borrados(indendios_servicio, bajas)
+        spans.anotar(filas=incendios_activos)
 
         print('Incendios: ', total)
 
@@ -522,6 +543,7 @@ def procesar_data_conaf_local(data):
                         traceback.format_exc())
 
 
+@spans.medido('crear_buffer')
 def crear_buffer(capa_incendios):
     """Crea un buffer por cada uno de los incendios."""
     try:
@@ -530,27 +552,226 @@ def crear_buffer(capa_incendios):
         # roads = capa_incendios
         buffer_output = capa_buffer_incendios
         # roadsBuffer = os.path.join(arcpy.env.workspace, buffer_output)
-        roadsBuffer = os.path.join(folder_local, buffer_output)
+        roadsBuffer = os.path.join(lease.espacio_trabajo(), buffer_output)
         roads = os.path.join(arcpy.env.workspace, dataset, capa_incendios)
         # print('roadsBuffer: ', roadsBuffer)
         # print('roads: ', roads)
-        distanceField = "2 Kilometers"
+        distanceField = "{0:g} Kilometers".format(buffer_distancia_km)
         arcpy.Buffer_analysis(roads, roadsBuffer, distanceField)
+        spans.anotar(filas=int(arcpy.GetCount_management(roadsBuffer)[0]))
+
+        # El buffer circular entrega el esquema; en modo viento se reemplaza la geometría
+        if buffer_modo == 'viento':
+            aplicar_buffer_viento(roads, roadsBuffer)
     
     except:
         print("Failed crear_buffer (%s)" %
             traceback.format_exc())
         utils.error_log("Failed crear_buffer (%s)" %
                         traceback.format_exc())
+        edicion.fallo('crear_buffer')
+
+
+def indice_estaciones():
+    """
+    Retorna el KD-tree de las estaciones meteorológicas: el guardado en la última
+    ejecución de Agromet o, si no existe, uno construido desde la capa de estaciones.
+    """
+    arbol = catalogo_agromet.cargar_indice()
+    if arbol is not None:
+        return arbol
+    fc = os.path.join(arcpy.env.workspace, dataset, capa_estaciones_meteorologicas)
+    ids, lons, lats = [], [], []
+    with arcpy.da.SearchCursor(fc, ['id', 'SHAPE@XY'], spatial_reference=arcpy.SpatialReference(4326)) as cursor:
+        for row in cursor:
+            if row[1] is not None:
+                ids.append(row[0])
+                lons.append(row[1][0])
+                lats.append(row[1][1])
+    del cursor
+    return geometria.ArbolKD(lons, lats, ids)
+
+
+def lecturas_estaciones():
+    """Retorna las últimas lecturas de cada estación meteorológica {id: {campo: valor}}."""
+    fc = os.path.join(arcpy.env.workspace, dataset, capa_estaciones_meteorologicas)
+    campos = ['id', 'nombre'] + list(agromet.VARIABLES) + ['fecha_actualizacion']
+    lecturas = {}
+    with arcpy.da.SearchCursor(fc, campos) as cursor:
+        for row in cursor:
+            lecturas[row[0]] = dict(zip(campos[1:], row[1:]))
+    del cursor
+    return lecturas
+
+
+def estaciones_cercanas(arbol, incendios, lecturas, campo=None):
+    """
+    Retorna {clave: (id_estacion, distancia_km)} con la estación más cercana a cada incendio
+    ({clave: (lon, lat)}), consultando todos los incendios en un solo lote.
+    Si se indica 'campo', se usa la más cercana (de las 3 primeras) con ese dato.
+    """
+    if len(incendios) == 0 or len(arbol) == 0:
+        return {}
+    claves = list(incendios)
+    lons, lats = zip(*(incendios[c] for c in claves))
+    ids, distancias = arbol.consultar(lons, lats, k=3 if campo else 1)
+    cercanas = {}
+    for clave, fila_ids, fila_km in zip(claves, ids, distancias):
+        for id_estacion, km in zip(fila_ids.tolist(), fila_km.tolist()):
+            lectura = lecturas.get(id_estacion)
+            if km > const.BUFFER_VIENTO_MAX_KM or lectura is None:
+                break
+            if campo is None or lectura.get(campo) is not None:
+                cercanas[clave] = (id_estacion, km)
+                break
+    return cercanas
+
+
+@spans.medido('buffer_viento')
+def aplicar_buffer_viento(incendios_fc, buffer_fc):
+    """
+    Reemplaza el buffer circular de cada incendio por una elipse elongada en el sentido
+    del viento, según la dirección y velocidad de la estación meteorológica más cercana.
+    Los incendios sin estación cercana o sin dirección de viento conservan el círculo.
+    """
+    try:
+        utils.log("Ajustando buffers según el viento")
+        sr = arcpy.SpatialReference(4326)
+
+        incendios = {}
+        with arcpy.da.SearchCursor(incendios_fc, ['OID@', 'SHAPE@XY'], spatial_reference=sr) as cursor:
+            for row in cursor:
+                if row[1] is not None:
+                    incendios[row[0]] = row[1]
+        del cursor
+
+        lecturas = lecturas_estaciones()
+        cercanas = estaciones_cercanas(indice_estaciones(), incendios, lecturas, 'direccion_viento')
+
+        ajustados = 0
+        with arcpy.da.UpdateCursor(buffer_fc, ['ORIG_FID', 'SHAPE@'], spatial_reference=sr) as cursor:
+            for row in cursor:
+                if row[0] not in cercanas:
+                    continue
+                lon, lat = incendios[row[0]]
+                lectura = lecturas[cercanas[row[0]][0]]
+                vertices = geometria.poligono_viento(
+                    lon, lat, buffer_distancia_km, lectura['direccion_viento'],
+                    lectura.get('velocidad_viento_media'),
+                    velocidad_referencia=const.BUFFER_VIENTO_REFERENCIA,
+                    elongacion_max=const.BUFFER_VIENTO_ELONGACION_MAX)
+                row[1] = arcpy.Polygon(arcpy.Array([arcpy.Point(x, y) for x, y in vertices]), sr)
+                cursor.updateRow(row)
+                ajustados += 1
+        del cursor
+
+        spans.anotar(filas=ajustados)
+        utils.log("Buffers ajustados según el viento: {0} de {1} incendios".format(ajustados, len(incendios)))
+
+    except:
+        print("Failed aplicar_buffer_viento (%s)" %
+            traceback.format_exc())
+        utils.error_log("Failed aplicar_buffer_viento (%s)" %
+                        traceback.format_exc())
+
+
+@spans.medido('meteo_incendios')
+def enriquecer_incendios_meteo():
+    """
+    Registra en cada incendio la estación meteorológica más cercana y sus últimas lecturas.
+    Retorna {id_incendio: datos meteorológicos} para incluirlos en las alertas.
+    """
+    try:
+        arcpy.AddMessage("Asociando estaciones meteorológicas a los incendios...")
+        utils.log("Asociando estaciones meteorológicas a los incendios")
+        fc = os.path.join(arcpy.env.workspace, dataset, capa_incendios)
 
+        # Los campos meteorológicos se agregan una sola vez con migracion.py (sin bloqueo de esquema en cada ciclo)
+        faltantes = utils.campos_faltantes(fc, CAMPOS_METEO)
+        if faltantes:
+            utils.error_log("Faltan campos en {0}: {1}, ejecute migracion.py".format(
+                capa_incendios, [campo for campo, _ in faltantes]))
+
+        incendios = {}
+        with arcpy.da.SearchCursor(fc, ['id_incendio', 'SHAPE@XY'], spatial_reference=arcpy.SpatialReference(4326)) as cursor:
+            for row in cursor:
+                if row[1] is not None:
+                    incendios[row[0]] = row[1]
+        del cursor
 
+        lecturas = lecturas_estaciones()
+        cercanas = estaciones_cercanas(indice_estaciones(), incendios, lecturas)
+
+        meteo = {}
+        for id_incendio, (id_estacion, km) in cercanas.items():
+            lectura = lecturas[id_estacion]
+            meteo[id_incendio] = {
+                'id_estacion_meteo': id_estacion,
+                'estacion_meteo': lectura['nombre'],
+                'distancia_estacion_km': round(km, 2),
+                'direccion_viento': lectura['direccion_viento'],
+                'velocidad_viento_media': lectura['velocidad_viento_media'],
+                'temperatura_media': lectura['temperatura_media'],
+                'humedad_media': lectura['humedad_media'],
+                'fecha_meteo': lectura['fecha_actualizacion'],
+            }
+
+        # Solo se escriben los incendios cuyos datos cambiaron (sin los campos, los datos solo van a las alertas)
+        campos = [campo for campo, _ in CAMPOS_METEO]
+        actualizados = 0
+        if not faltantes:
+            with arcpy.da.UpdateCursor(fc, ['id_incendio'] + campos) as cursor:
+                for row in cursor:
+                    datos = meteo.get(row[0])
+                    if datos is not None and agromet.aplicar_cambios(row, datos, campos):
+                        cursor.updateRow(row)
+                        actualizados += 1
+            del cursor
+
+        spans.anotar(filas=actualizados)
+        utils.log("Incendios con estación meteorológica: {0} de {1}".format(len(meteo), len(incendios)))
+        return meteo
+
+    except:
+        print("Failed enriquecer_incendios_meteo (%s)" %
+            traceback.format_exc())
+        utils.error_log("Failed enriquecer_incendios_meteo (%s)" %
+                        traceback.format_exc())
+        return {}
+
+
+@spans.medido('copiar_buffer')
 def copiar_datos_buffer(buffer_incendios, buffer_visor):
-    """Copia los resultados del buffer temporal al buffer visor."""
+    """
+    Copia los resultados del buffer temporal al buffer visor, un polígono por incendio y
+    nivel de detalle (BUFFER_VISOR_LODS) con los campos lod y escala_min. La geometría pasa
+    como WKB (sin crear objetos de geometría en Python) y se simplifica con NumPy; el
+    análisis sigue usando el buffer temporal con la geometría completa.
+    """
     try:
         arcpy.AddMessage("Actualizando capa de buffers...")
         utils.log("Actualizando capa de buffers")
-        fc_origen = os.path.join(folder_local, buffer_incendios)
+        inicio = time.time()
+        fc_origen = os.path.join(lease.espacio_trabajo(), buffer_incendios)
+        if buffer_visor_densificar > 0:
+            fc_visor = os.path.join(lease.espacio_trabajo(), buffer_incendios + '_visor')
+            arcpy.CopyFeatures_management(fc_origen, fc_visor)
+            arcpy.Densify_edit(fc_visor, 'ANGLE', max_angle=buffer_visor_densificar)
+            fc_origen = fc_visor
+
+        # Los campos de nivel de detalle se agregan una sola vez con migracion.py; sin ellos
+        # se publica solo el primer nivel, sin lod ni escala_min
         fc_destino = os.path.join(arcpy.env.workspace, dataset, buffer_visor)
+        lods = BUFFER_VISOR_LODS
+        faltantes = utils.campos_faltantes(fc_destino, CAMPOS_LOD)
+        if faltantes:
+            utils.error_log("Faltan campos en {0}: {1}, ejecute migracion.py".format(
+                buffer_visor, [campo for campo, _ in faltantes]))
+            lods = BUFFER_VISOR_LODS[:1]
+
+        # Tolerancias en metros: en un sistema geográfico se convierten según la latitud
+        sr = arcpy.Describe(fc_origen).spatialReference
+        metros_por_unidad = None if sr.type == 'Geographic' else sr.metersPerUnit
         fields = [
             'id_incendio',
             'nombre_incendio',
@@ -562,36 +783,41 @@ def copiar_datos_buffer(buffer_incendios, buffer_visor):
             'informado',
             'BUFF_DIST',
             'ORIG_FID',
-            'SHAPE@'
+            # Mismo sistema de coordenadas que el buffer visor (ambos derivan de la capa de incendios)
+            'SHAPE@WKB'
         ]
-        insert_cursor = arcpy.da.InsertCursor(fc_destino, fields)
+        filas = []
+        bytes_lod = {}
         with arcpy.da.SearchCursor(fc_origen, fields) as cursor:
             for row in cursor:
-                insert_cursor.insertRow((
-                    row[0],
-                    row[1],
-                    row[2],
-                    row[3],
-                    row[4],
-                    row[5],
-                    row[6],
-                    row[7],
-                    row[8],
-                    row[9],
-                    row[10]
-                   ))
+                for lod, (tolerancia, escala) in enumerate(lods):
+                    wkb = row[-1]
+                    if wkb is not None:
+                        wkb = geometria.simplificar_wkb(wkb, tolerancia, metros_por_unidad)
+                        bytes_lod[lod] = bytes_lod.get(lod, 0) + len(wkb)
+                    filas.append(row[:-1] + ((wkb,) if faltantes else (lod, escala, wkb)))
+        # Las filas se insertan al confirmar la edición del ciclo
+        campos_lod = [] if faltantes else [campo for campo, _ in CAMPOS_LOD]
+        edicion.actual().insertar(buffer_visor, fields[:-1] + campos_lod + fields[-1:], filas)
+
+        bytes_geometria = sum(bytes_lod.values())
+        segundos = max(time.time() - inicio, 1e-6)
+        spans.anotar(filas=len(filas), bytes=bytes_geometria)
+        utils.log("Buffers copiados: {0} filas ({1:.0f} filas/s), {2} bytes de geometría".format(
+            len(filas), len(filas) / segundos, bytes_geometria), {'bytes_por_lod': bytes_lod})
 
         # Delete cursor object
         del cursor
-        del insert_cursor
 
     except:
         print("Failed copiar_datos_buffer (%s)" %
             traceback.format_exc())
         utils.error_log("Failed copiar_datos_buffer (%s)" %
                         traceback.format_exc())
+        edicion.fallo('copiar_datos_buffer')
 
 
+@spans.medido('ejecutar_analisis')
 def ejecutar_analisis(buffer):
     """Ejecuta el análisis de intersección entre los buffers de los incendios 
     versus las capas de infraestructuras definidas por el cliente."""
@@ -601,12 +827,14 @@ def ejecutar_analisis(buffer):
         
         incluir = const.TABLES_SIGGRE
         features = arcpy.ListFeatureClasses(feature_dataset=dataset_ministerio)
+        # Workspace temporal de la ejecución
+        folder_local = lease.espacio_trabajo()
 
         for feature in incluir:
             f = feature
             if f in features:
                 #Ejecuto el cruce espacial por cada capa
-                in_buffer = os.path.join(arcpy.env.workspace, dataset, buffer)
+                in_buffer = os.path.join(folder_local, buffer)
                 in_feature = os.path.join(arcpy.env.workspace, dataset_ministerio, f)
                 inFeatures = [in_buffer, in_feature]
                 name = f.split(user_datos)
@@ -615,18 +843,20 @@ def ejecutar_analisis(buffer):
                 arcpy.AddMessage("nombre capa_cruce: " + capa_cruce + " ...")
                 intersectOutput = os.path.join(folder_local, capa_cruce)
                 arcpy.Intersect_analysis(inFeatures, intersectOutput, "", "" , 'input')
+                spans.anotar(filas=int(arcpy.GetCount_management(intersectOutput)[0]), capas=1)
     
     except:
         print("Failed ejecutar_analisis (%s)" %
               traceback.format_exc())
         utils.error_log("Failed ejecutar_analisis (%s)" %
                         traceback.format_exc())
+        edicion.fallo('ejecutar_analisis')
 
 
 def actualizar_resultados_local_lineas():
     """
-    Obtiene las lineas afectadas por el incendio.
-    Guarda las lineas en la capa "LINEAS_AFECTADAS"
+    Obtiene las lineas afectadas por el incendio (cruces de la ejecución).
+    Retorna los datos a guardar en la capa "LINEAS_AFECTADAS"
     """
     try: 
 
@@ -654,6 +884,7 @@ def actualizar_resultados_local_lineas():
         
         incluir = const.LINE_TABLES
         features = const.TABLES_SIGGRE
+        folder_local = lease.espacio_trabajo()
 
         # print('incluir: ', incluir)
         # print('features: ', features)
@@ -693,19 +924,21 @@ def actualizar_resultados_local_lineas():
                     # Delete cursor object
                     del cursor
 
-        insert_data_local(capa_lineas_afectadas, data)
+        return data
 
     except:
         print("Failed actualizar_resultados_local_lineas (%s)" %
             traceback.format_exc())
         utils.error_log("Failed actualizar_resultados_local_lineas (%s)" %
                         traceback.format_exc())
+        edicion.fallo('actualizar_resultados_local_lineas')
+        return []
 
 
 def actualizar_resultados_local_puntos():
     """
-    Obtiene los puntos afectados por el incendio.
-    Guarda los puntos en la capa "PUNTOS_AFECTADOS"
+    Obtiene los puntos afectados por el incendio (cruces de la ejecución).
+    Retorna los datos a guardar en la capa "PUNTOS_AFECTADOS"
     """
     try:
 
@@ -732,6 +965,7 @@ def actualizar_resultados_local_puntos():
         # features = arcpy.ListFeatureClasses()
         features = const.TABLES_SIGGRE
         incluir = const.POINT_TABLES
+        folder_local = lease.espacio_trabajo()
 
         data = []
         for f in features:
@@ -766,15 +1000,18 @@ def actualizar_resultados_local_puntos():
                     # Delete cursor object
                     del cursor
         
-        insert_data_local(capa_puntos_afectados, data, True)
+        return data
 
     except:
         print("Failed actualizar_resultados_local_puntos (%s)" %
               traceback.format_exc())
         utils.error_log("Failed actualizar_resultados_local_puntos (%s)" %
                         traceback.format_exc())
+        edicion.fallo('actualizar_resultados_local_puntos')
+        return []
 
 
+@spans.medido('insertar_capa')
 def insert_data_local(capa_local, datos, es_punto=None):
     """Guarda en las capas de resultados las entidades afectadas."""
     try:
@@ -793,11 +1030,12 @@ def insert_data_local(capa_local, datos, es_punto=None):
             'comuna_incendio',
             'superficie_incendio',
             'estado_incendio',
-            'fecha_inicio_incendio',
-            'SHAPE@'
+            'fecha_inicio_incendio'
         ]
-        fc = os.path.join(arcpy.env.workspace, dataset, capa_local)
-        cursor = arcpy.da.InsertCursor(fc, fields)
+        # near_dist solo si la capa tiene el campo
+        cercania = campos_cercania(capa_local)
+        fields += cercania + ['SHAPE@']
+        filas = []
         out_sr = arcpy.SpatialReference("WGS 1984")
         for dato in datos:
             if es_punto != None:
@@ -814,7 +1052,7 @@ def insert_data_local(capa_local, datos, es_punto=None):
                 
                 geometry = dato['shape']
 
-            cursor.insertRow((
+            filas.append((
                 dato['leyenda'],
                 dato['nombre'],
                 dato['propietario'],
@@ -829,18 +1067,23 @@ def insert_data_local(capa_local, datos, es_punto=None):
                 dato['comuna_incendio'],
                 dato['superficie_incendio'],
                 dato['estado_incendio'],
-                dato['fecha_inicio_incendio'],
-                geometry))
+                dato['fecha_inicio_incendio']) +
+                tuple(dato.get(campo) for campo in cercania) +
+                (geometry,))
 
-        del cursor
+        # Las filas se insertan al confirmar la edición del ciclo
+        edicion.actual().insertar(capa_local, fields, filas)
+        spans.anotar(filas=len(datos))
 
     except:
         print("Failed insert_data_local (%s)" %
               traceback.format_exc())
         utils.error_log("Failed insert_data_local (%s)" %
                         traceback.format_exc())
+        edicion.fallo('insert_data_local')
 
 
+@spans.medido('obtener_resultados')
 def obtener_resultados():
     """Obtiene los resultados de los puntos y lineas afectadas"""
     try:
@@ -852,6 +1095,7 @@ def obtener_resultados():
         lineasAfectadas = obtener_lineas_afectadas()
         # Correos de alertas a enviar
         entidades = puntosAfectados + lineasAfectadas
+        spans.anotar(filas=len(entidades))
 
         return entidades
 
@@ -880,12 +1124,11 @@ def obtener_puntos_afectados():
             'comuna_incendio',
             'superficie_incendio',
             'estado_incendio',
-            'fecha_inicio_incendio',
-            # 'near_fid',
-            # 'near_dist',
-            'SHAPE@X', 
-            'SHAPE@Y'
+            'fecha_inicio_incendio'
         ]
+        # near_dist solo si la capa tiene el campo
+        cercania = campos_cercania(capa_puntos_afectados)
+        fields += cercania + ['SHAPE@X', 'SHAPE@Y']
         fc = os.path.join(arcpy.env.workspace, dataset, capa_puntos_afectados)
         features = []
         datos = []
@@ -907,11 +1150,10 @@ def obtener_puntos_afectados():
                 attributes['superficie_incendio'] = row[12]
                 attributes['estado_incendio'] = row[13]
                 attributes['fecha_inicio_incendio'] = str(row[14])
-                # attributes['near_fid'] = row[15]
-                # attributes['near_dist'] = row[16]
+                attributes['near_dist'] = row[15] if cercania else None
                 features.append({
                     "geometry": {
-                        "x": row[15], "y": row[16]
+                        "x": row[-2], "y": row[-1]
                     },
                     "attributes": attributes
                 })
@@ -947,11 +1189,11 @@ def obtener_lineas_afectadas():
             'comuna_incendio',
             'superficie_incendio',
             'estado_incendio',
-            'fecha_inicio_incendio',
-            # 'near_fid',
-            # 'near_dist',
-            'SHAPE@JSON'
+            'fecha_inicio_incendio'
         ]
+        # near_dist solo si la capa tiene el campo
+        cercania = campos_cercania(capa_lineas_afectadas)
+        fields += cercania + ['SHAPE@JSON']
         fc = os.path.join(arcpy.env.workspace, dataset, capa_lineas_afectadas)
         features = []
         datos = []
@@ -973,10 +1215,9 @@ def obtener_lineas_afectadas():
                 attributes['superficie_incendio'] = row[12]
                 attributes['estado_incendio'] = row[13]
                 attributes['fecha_inicio_incendio'] = str(row[14])
-                # attributes['near_fid'] = row[15]
-                # attributes['near_dist'] = row[16]
+                attributes['near_dist'] = row[15] if cercania else None
                 features.append({
-                    "geometry": json.loads(row[15]),
+                    "geometry": json.loads(row[-1]),
                     "attributes": attributes
                 })
                 datos.append(attributes)
@@ -993,23 +1234,26 @@ def obtener_lineas_afectadas():
                         traceback.format_exc())
 
 
-def generar_alertas(entidades):
+@spans.medido('enviar_alertas')
+def generar_alertas(entidades, meteo=None):
     """
     Se envia solo un correo por incendio.
     Envío una alerta a cada correo afectada por un incendio.
     Se envia el listado completo de las infraestructuras afectadas de la empresa.
     Se utiliza el correo electrónico registrado por cada infraestructura para agrupar.
     Se envia un resumen de los incendios e infraestructuras afectadas al ministerio de energia.
+    Si se indica 'meteo' ({id_incendio: lecturas}), se incluye la estación meteorológica más cercana.
     """
     try:
         arcpy.AddMessage("Generando alertas...")
         utils.log("Generando alertas")
         
         print('cantidad entidades: ', len(entidades))
+        correos_enviados = 0
 
         if len(entidades) > 0:
             # Agrupo la data por id_incendio
-            data_por_incendio = agrupar_data_por_incendio(entidades)
+            data_por_incendio = conaf.agrupar_por_incendio(entidades)
 
             # Recorro la data agrupada por incendio y la vuelvo a agrupar por correo
             for incendio in data_por_incendio:
@@ -1026,27 +1270,31 @@ def generar_alertas(entidades):
                             nombre_incendio = row[2]
                             # Envío por cada incendio, una alerta al ministerio de energía con el resumen de todas las instalaciones afectadas.
                             # aca no debo considerar los incendios ya informados.
+                            correos_enviados += 1
                             utils.enviar_correo_admin(
                                     id_incendio,
                                     comuna_incendio,
                                     superficie,
                                     data_por_incendio[incendio]['instalaciones'],
-                                    nombre_incendio
+                                    nombre_incendio,
+                                    (meteo or {}).get(id_incendio)
                                 )
 
                             # Para el caso de las empresas, agrupo la data por email
-                            data_por_correo = agrupar_por_correo(data_por_incendio[incendio]['instalaciones'])
+                            data_por_correo = conaf.agrupar_por_correo(data_por_incendio[incendio]['instalaciones'])
                             if bool(data_por_correo):
                                 for correo in data_por_correo:
 
                                     # Por cada correo registrado, envío una alerta con todas las instalaciones afectadas.
+                                    correos_enviados += 1
                                     utils.enviar_correo_empresa(
                                         correo,
                                         id_incendio,
                                         comuna_incendio,
                                         superficie,
                                         data_por_correo[correo]['instalaciones'],
-                                        nombre_incendio
+                                        nombre_incendio,
+                                        (meteo or {}).get(id_incendio)
                                     )
                             
                             # Actualizo el incendio a informado.
@@ -1058,6 +1306,7 @@ def generar_alertas(entidades):
                             del cursor_update
                 del cursor
 
+        spans.anotar(filas=len(entidades), correos=correos_enviados)
 
     except:
         print("Failed generar_alertas (%s)" %
@@ -1066,85 +1315,70 @@ def generar_alertas(entidades):
                         traceback.format_exc())
 
 
-def agrupar_data_por_incendio(instalaciones):
-    """Agrupo por incendio (id_incendio) la data de las instalaciones afectadas."""
-    try:
-        data = {}
-        incendios = []
-        
-        # Obtengo un listado único de incendios
-        for instalacion in instalaciones:
-            if ((instalacion['id_incendio'] not in incendios) and (instalacion['id_incendio'] != '')):
-                incendios.append(instalacion['id_incendio'])
-                data[instalacion['id_incendio']] = {
-                    'comuna': instalacion['comuna_incendio'],
-                    'superficie': instalacion['superficie_incendio'],
-                    # 'near_dist': instalacion['near_dist'],
-                    'instalaciones': [],
-                }
-
-        print('incendios unicos: ', incendios)
-
-        # Recorro las instalaciones afectadas y las agrupo por correo
-        for instalacion in instalaciones:
-            if instalacion['id_incendio'] in incendios:
-                data[instalacion['id_incendio']]['instalaciones'].append(instalacion)
+def partes_wgs84(shape, sr):
+    """Retorna las partes de una geometría de arcpy como listas de vértices (lon, lat) en WGS 84."""
+    if shape is None:
+        return []
+    if shape.spatialReference is not None and shape.spatialReference.factoryCode != sr.factoryCode:
+        shape = shape.projectAs(sr)
+    partes = []
+    for parte in shape:
+        vertices = [(p.X, p.Y) for p in parte if p is not None]
+        if vertices:
+            partes.append(vertices)
+    return partes
 
-        return data
 
-    except:
-        print("Failed agrupar_data_por_incendio (%s)" %
-            traceback.format_exc())
-        utils.error_log("Failed agrupar_data_por_incendio (%s)" %
-                        traceback.format_exc())
+def campos_cercania(capa):
+    """Retorna los campos de cercanía presentes en la capa de resultados (se agregan con migracion.py)."""
+    faltantes = utils.campos_faltantes(os.path.join(arcpy.env.workspace, dataset, capa), CAMPOS_CERCANIA)
+    if faltantes:
+        utils.error_log("Faltan campos en {0}: {1}, ejecute migracion.py".format(
+            capa, [campo for campo, _ in faltantes]))
+    return [campo for campo, tipo in CAMPOS_CERCANIA if (campo, tipo) not in faltantes]
 
 
-def agrupar_por_correo(instalaciones):
-    """Agrupo por mail (E_MAIL) la data de las instalaciones afectadas."""
+@spans.medido('cercania')
+def ejecutar_cercania(puntos, lineas):
+    """
+    Calcula la distancia geodésica (m) de cada instalación afectada (puntos y lineas) a su
+    incendio y la deja en 'near_dist'. Reemplaza a Near_analysis, que ocupa licencia advanced:
+    todas las instalaciones se resuelven en un solo cálculo vectorizado (haversine).
+    """
     try:
-        data = {}
-        correos = []
-
-        # Obtengo un listado único de correos
-        for instalacion in instalaciones:
-            if ((instalacion['e_mail'] not in correos) and (instalacion['e_mail'] != '')):
-                correos.append(instalacion['e_mail'])
-                data[instalacion['e_mail']] = {
-                    'instalaciones': [],
-                }
-
-        print('correos unicos: ', correos)
-
-        # Recorro las instalaciones afectadas y las agrupo por correo
-        for instalacion in instalaciones:
-            if instalacion['e_mail'] in correos:
-                data[instalacion['e_mail']]['instalaciones'].append(instalacion)
-
-        return data
-
-    except:
-        print("Failed agrupar_por_correo (%s)" %
-            traceback.format_exc())
-        utils.error_log("Failed agrupar_por_correo (%s)" %
-                        traceback.format_exc())
+        arcpy.AddMessage("Ejecutando cercanía...")
+        utils.log("Ejecutando cercanía")
 
+        sr = arcpy.SpatialReference(4326)
+        fc = os.path.join(arcpy.env.workspace, dataset, capa_incendios)
+        incendios = {}
+        with arcpy.da.SearchCursor(fc, ['id_incendio', 'SHAPE@XY'], spatial_reference=sr) as cursor:
+            for row in cursor:
+                if row[1] is not None:
+                    incendios[row[0]] = row[1]
+        del cursor
 
-def ejecutar_cercania(in_features):
-    """Ejecuta la cercania de las instalaciones afectadas (puntos y lineas) respecto del incendio."""
-    try:
-        arcpy.AddMessage("Ejecutando cercanía..." + in_features)
-        utils.log("Ejecutando cercanía " + in_features)
-        # set local variables
-        near_features = [capa_incendios]
-        # find features only within search radius
-        search_radius = "5,5 Kilometers"
-        # find location nearest features
-        location = "NO_LOCATION"
-        # avoid getting angle of neares features
-        angle = "NO_ANGLE"
-        method = "GEODESIC"
-        # execute the function
-        arcpy.Near_analysis(in_features, near_features, search_radius, location, angle, method)
+        # Un trazo por punto y por parte de cada linea, con la ubicación de su incendio
+        instalaciones, trazos, duenos, lons, lats = [], [], [], [], []
+        entradas = [(d, [[(float(d['longitud']), float(d['latitud']))]]) for d in puntos]
+        entradas += [(d, partes_wgs84(d.get('shape'), sr)) for d in lineas]
+        for dato, partes in entradas:
+            ubicacion = incendios.get(dato.get('id_incendio'))
+            if ubicacion is None or not partes:
+                continue
+            for parte in partes:
+                trazos.append(parte)
+                duenos.append(len(instalaciones))
+                lons.append(ubicacion[0])
+                lats.append(ubicacion[1])
+            instalaciones.append(dato)
+
+        distancias = {}
+        for dueno, km in zip(duenos, geometria.distancia_trazos_km(trazos, lons, lats)):
+            distancias[dueno] = min(distancias.get(dueno, km), km)
+        for dueno, km in distancias.items():
+            instalaciones[dueno]['near_dist'] = round(float(km) * 1000, 1)
+        spans.anotar(filas=len(instalaciones), trazos=len(trazos))
 
     except:
         print("Failed ejecutar_cercania (%s)" %
@@ -0,0 +1,156 @@
+#-------------------------------------------------------------------------------
+# Name:         mainScheduler
+# Purpose:      Proceso residente que ejecuta los pipelines Conaf, SEC y Agromet en
+#               intervalos independientes. Importa arcpy (y toma la licencia), lee el
+#               .env y abre las conexiones una sola vez, en lugar de partir en frío en
+#               cada ejecución programada por el sistema operativo.
+#               Cada pipeline corre en su propio hilo y nunca se solapa consigo mismo;
+#               si una ejecución supera su intervalo, los turnos perdidos se omiten.
+#               SIGINT/SIGTERM (o SIGBREAK en Windows) detienen el proceso después de
+#               terminar las ejecuciones en curso.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from datetime import datetime
+from contextlib import nullcontext
+import contextvars
+import importlib
+import traceback
+import threading
+import signal
+import time
+import constants as const
+import logs
+import metricas
+
+#-------------------------------------------------------------------------------
+# Configuracion scheduler
+#-------------------------------------------------------------------------------
+# Módulo de cada pipeline (se importa una sola vez al iniciar)
+MODULOS = {
+    'conaf': 'mainConaf',
+    'sec': 'mainSec',
+    'agromet': 'mainAgromet',
+}
+
+detener = threading.Event()
+_lock_exclusivo = threading.Lock()
+
+
+class Tarea:
+    """Ejecución periódica de un pipeline en su propio hilo, sin solaparse consigo misma."""
+
+    def __init__(self, nombre, funcion, intervalo):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.intervalo = float(intervalo)
+        self.ejecuciones = 0
+        self.omitidas = 0
+        self.hilo = threading.Thread(target=self.bucle, name='scheduler-' + nombre, daemon=True)
+
+    def ejecutar(self):
+        """Ejecuta el pipeline una vez, en un contexto nuevo (pipeline y run id propios)."""
+        bloqueo = _lock_exclusivo if const.SCHEDULER_EXCLUSIVO else nullcontext()
+        with bloqueo:
+            # Pudo esperar el turno de otro pipeline mientras se solicitaba detener el proceso
+            if detener.is_set():
+                return
+            metricas.fijar('scheduler_en_ejecucion', 1, pipeline=self.nombre)
+            try:
+                contextvars.Context().run(self.funcion)
+            except:
+                print("Failed scheduler {0} (%s)".format(self.nombre) % traceback.format_exc())
+                logs.obtener_logger().error("Failed scheduler {0} ({1})".format(
+                    self.nombre, traceback.format_exc()))
+                metricas.incrementar('scheduler_fallos_total', pipeline=self.nombre)
+            finally:
+                metricas.fijar('scheduler_en_ejecucion', 0, pipeline=self.nombre)
+                self.ejecuciones += 1
+
+    def bucle(self):
+        """Ejecuta el pipeline a intervalos fijos hasta que se solicite detener el proceso."""
+        proxima = time.monotonic()
+        while not detener.is_set():
+            if detener.wait(max(proxima - time.monotonic(), 0)):
+                break
+            self.ejecutar()
+
+            # Siguiente turno a intervalo fijo; los turnos que pasaron durante la ejecución se omiten
+            proxima += self.intervalo
+            atraso = time.monotonic() - proxima
+            if atraso >= 0:
+                omitidos = int(atraso // self.intervalo) + 1
+                proxima += omitidos * self.intervalo
+                self.omitidas += omitidos
+                metricas.incrementar('scheduler_omitidas_total', omitidos, pipeline=self.nombre)
+                logs.obtener_logger().info("Pipeline {0} superó su intervalo, {1} turnos omitidos".format(
+                    self.nombre, omitidos))
+            metricas.fijar('scheduler_proxima_ejecucion_timestamp',
+                           int(time.time() + proxima - time.monotonic()), pipeline=self.nombre)
+
+
+def solicitar_detencion(signum=None, frame=None):
+    """Handler de señales: termina las ejecuciones en curso y no inicia nuevas."""
+    if not detener.is_set():
+        print("Deteniendo scheduler... " + str(datetime.now()))
+        logs.obtener_logger().info("Scheduler: detención solicitada (señal {0})".format(signum))
+    detener.set()
+
+
+def registrar_senales():
+    """Registra SIGINT, SIGTERM y SIGBREAK (Windows) para una detención ordenada."""
+    for nombre in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+        if hasattr(signal, nombre):
+            signal.signal(getattr(signal, nombre), solicitar_detencion)
+
+
+def crear_tareas(pipelines=None):
+    """Importa los pipelines activos y retorna sus tareas."""
+    tareas = []
+    for nombre in pipelines or const.SCHEDULER_PIPELINES:
+        modulo = importlib.import_module(MODULOS[nombre])
+        tareas.append(Tarea(nombre, modulo.main, const.SCHEDULER_INTERVALOS[nombre] * 60))
+    return tareas
+
+
+def ejecutar(tareas):
+    """Inicia los hilos de las tareas y espera a que terminen (tras solicitar_detencion)."""
+    detener.clear()
+    for tarea in tareas:
+        tarea.hilo.start()
+    # El hilo principal espera con timeout para seguir atendiendo las señales
+    while any(tarea.hilo.is_alive() for tarea in tareas):
+        for tarea in tareas:
+            tarea.hilo.join(0.5)
+
+
+def main():
+    """Main function Scheduler."""
+
+    inicio = time.time()
+    registrar_senales()
+    if const.METRICAS_MODO == 'puerto':
+        metricas.iniciar_servidor()
+
+    tareas = crear_tareas()
+    print("Scheduler iniciado en {0:.1f} s: {1}".format(time.time() - inicio, ', '.join(
+        '{0} cada {1:g} min'.format(t.nombre, t.intervalo / 60) for t in tareas)))
+    logs.obtener_logger().info("Scheduler iniciado", extra={'datos': {
+        'pipelines': {t.nombre: t.intervalo for t in tareas},
+        'exclusivo': const.SCHEDULER_EXCLUSIVO,
+        'inicio_s': round(time.time() - inicio, 2),
+    }})
+
+    ejecutar(tareas)
+
+    logs.obtener_logger().info("Scheduler detenido", extra={'datos': {
+        t.nombre: {'ejecuciones': t.ejecuciones, 'omitidas': t.omitidas} for t in tareas}})
+    print("Scheduler detenido " + str(datetime.now()))
+
+
+if __name__ == '__main__':
+    main()
@@ -14,10 +14,13 @@
 import arcinfo
 import arcpy
 import utils
+import logs
+import metricas
+import lease
+import sec
+import historial_sec
 import constants as const
-import requests
 import xml.etree.ElementTree as et
-import urllib.request as ur
 import traceback
 import os
 import time
@@ -26,18 +29,24 @@ from datetime import datetime, timedelta
 
 
 # CLI_SAIDI -> numero de clientes
-# NOM_SEC -> nombre comuna servicio
+# NOM_SEC -> nombre comuna servicio (se sobrescribe con el nombre que entrega la SEC, resuelto con el índice de nombres)
 # Nuevos
 # CLI_AFECTADOS -> clientes afectados
 # PORC_AFECTADOS  -> porcentaje de clientes afectados respecto al total comunal
 # FECHA_ACTUALIZACION -> fecha de actualizacion de los datos
 
 # Workspace
-arcpy.env.workspace = const.WORKSPACE
-# Sobreescribo la misma capa de salida
-arcpy.env.overwriteOutput = True
-# Set the preserveGlobalIds environment to True
-arcpy.env.preserveGlobalIds = True
+def configurar_entorno():
+    """Configura el entorno de arcpy del pipeline (el proceso de mainScheduler lo comparte entre pipelines)."""
+    arcpy.env.workspace = const.WORKSPACE
+    # Sobreescribo la misma capa de salida
+    arcpy.env.overwriteOutput = True
+    # Set the preserveGlobalIds environment to True
+    arcpy.env.preserveGlobalIds = True
+
+
+configurar_entorno()
+
 # DATASET
 dataset = const.DATASET
 
@@ -53,6 +62,15 @@ capa_comunas = const.COMUNAS_SEC
 def main():
     """Main function Sec."""
 
+    configurar_entorno()
+    # Una sola ejecución del pipeline a la vez (ver LEASE_POLITICA_SEC)
+    lease.ejecutar('sec', procesar)
+
+
+def procesar():
+    """Proceso SEC, ejecutado bajo el lease del pipeline."""
+
+    logs.iniciar_ejecucion('sec')
     timeStart = time.time()
     arcpy.AddMessage("Proceso SEC iniciado... " + str(datetime.now()))
     utils.log("Proceso SEC iniciado")
@@ -64,18 +82,17 @@ def main():
     # suministro eléctrico a nivel nacional
     clientes_afectados = 0
 
-    # Obtengo los clientes afectados desde el servicio de la SEC
+    # Obtengo los clientes afectados desde el servicio de la SEC (hora de hace 20 minutos)
     arcpy.AddMessage("Obteniendo clientes afectados... ")
-    data = obtener_clientes_afectados(url_api_sec)
+    hora_consulta = datetime.now() - timedelta(minutes=20)
+    data = obtener_clientes_afectados(url_api_sec, hora_consulta)
     utils.log("Obteniendo clientes afectados")
 
     if len(data) > 0:
-        # Limpio la data de la tabla local y del servicio
-        arcpy.AddMessage("Limpiando resultados anteriores... ")
-        limpiar_data_local()
-        utils.log("Limpiando resultados anteriores")
+        # Guardo los cambios respecto de la consulta anterior en el historial local
+        guardar_historial(hora_consulta, data)
 
-        # Actualizo los clientes afectados
+        # Actualizo los clientes afectados (las comunas sin cortes quedan en cero)
         arcpy.AddMessage("Actualizando clientes afectados... ")
         clientes_afectados = actualizar_clientes_afectados_local(data)
         arcpy.AddMessage("clientes_afectados " + str(clientes_afectados))
@@ -95,16 +112,15 @@ def main():
     utils.log("Se registraron " + str(clientes_afectados) + " afectados")
     utils.log("Tiempo de ejecución: " +
             str(utils.convert_seconds(timeElapsed)))
+    metricas.fijar('clientes_afectados', clientes_afectados or 0)
+    metricas.exportar()
     utils.log("Proceso SEC finalizado \n")
 
 
 
-def obtener_clientes_afectados(url):
+def obtener_clientes_afectados(url, hace_20_min):
     """Retorna los clientes afectados por cortes electricos por comunas."""
     try:
-        ahora = datetime.now()
-        hace_20_min = ahora - timedelta(minutes=20)
-        
         anio = hace_20_min.strftime('%Y')
         mes = hace_20_min.strftime('%m')
         dia = hace_20_min.strftime('%d')
@@ -127,95 +143,124 @@ def obtener_clientes_afectados(url):
         utils.log("No se pudo obtener el listado de clientes afectados, respuesta del servicio: " + str(response))
 
 
-def actualizar_clientes_afectados_local(clientes_afectados):
-    """Actualiza los clientes afectados por comuna en la capa local, además calcula el porcentaje."""
+def guardar_historial(hora_consulta, data):
+    """Guarda la respuesta de la SEC en el historial local de clientes afectados."""
     try:
-        fc = os.path.join(arcpy.env.workspace, dataset, capa_comunas)
-        ahora = datetime.now()
-        total_clientes = 0
-        comunas = []
-        comunas_encontradas = []
-        with arcpy.da.UpdateCursor(fc, ['NOM_SEC', 'CLI_SAIDI', 'CLI_AFECTADOS', 'PORC_AFECTADOS', 'FECHA_ACTUALIZACION']) as cursor:
-            for row in cursor:
-                for k in clientes_afectados:
-                    comunas.append(k['NOMBRE_COMUNA'])
-                    if row[0] == k['NOMBRE_COMUNA']:
-                        comunas_encontradas.append(k['NOMBRE_COMUNA'])
-                        # Actualizo los clientes afectados
-                        row[2] = row[2] + k['CLIENTES_AFECTADOS']
-                        total_clientes += row[2]
-                        # Calculo el porcentaje que representa los afectados versus el total de clientes
-                        porcentaje = row[2] / row[1] * 100
-                        row[3] = porcentaje
-                        row[4] = ahora
-
-                        cursor.updateRow(row)
-
-                        print('Comuna: {0}, clientes afectados: {1} ({2}%)'.format(
-                            k['NOMBRE_COMUNA'], row[2], porcentaje))
-        del cursor
-
-        # Nombres de comunas que entrega la sec que no están registradas en la capa de comunas
-        comunas_nuevas = list(set(comunas)-set(comunas_encontradas))
-        print('comunas nuevas: ', comunas_nuevas)
-
-        # Actualizo el nombre de la comuna en la tabla
-        if(len(comunas_nuevas) > 0):
-            actualizar_comunas(comunas_nuevas)
-
-        return total_clientes
+        cambios = historial_sec.agregar(hora_consulta, data)
+        utils.log("Historial SEC: {0} comunas con cambios".format(cambios))
     except:
-        print("Failed actualizar_clientes_afectados_local (%s)" %
+        print("Failed guardar_historial (%s)" %
               traceback.format_exc())
-        utils.error_log("Failed actualizar_clientes_afectados_local (%s)" %
+        utils.error_log("Failed guardar_historial (%s)" %
                         traceback.format_exc())
 
 
-def limpiar_data_local():
-    """Limpia los regultados anteriores, deja en cero la cantidad de afectados, porcentaje y fecha de actualización."""
-    try:
-        fc = os.path.join(arcpy.env.workspace, dataset, capa_comunas)
-        with arcpy.da.UpdateCursor(fc, ['CLI_AFECTADOS', 'PORC_AFECTADOS', 'FECHA_ACTUALIZACION']) as cursor:
-            for row in cursor:
-                row[0] = 0
-                row[1] = 0
-                row[2] = None
-                cursor.updateRow(row)
+def obtener_indice_comunas(fc):
+    """Retorna el índice de nombres de comunas guardado o, si no existe, lo construye desde la capa."""
+    indice = sec.IndiceComunas.cargar()
+    if indice is None:
+        indice = construir_indice_comunas(fc)
+    return indice
+
+
+def construir_indice_comunas(fc, comunas=None):
+    """Construye y guarda el índice de nombres de comunas a partir de las filas (OID, NOM_SAIDI, NOM_SEC)."""
+    if comunas is None:
+        with arcpy.da.SearchCursor(fc, ['OID@', 'NOM_SAIDI', 'NOM_SEC']) as cursor:
+            comunas = [tuple(row) for row in cursor]
         del cursor
-    except:
-        print("Failed limpiar_data_local (%s)" %
-              traceback.format_exc())
-        utils.error_log("Failed limpiar_data_local (%s)" %
-                        traceback.format_exc())
+    indice = sec.IndiceComunas(comunas, sec.cargar_alias())
+    indice.guardar()
+    utils.log("Índice de comunas SEC construido: {0} nombres".format(len(indice.nombres)))
+    return indice
 
 
-def actualizar_comunas(comunas):
-    """Actualiza el nombre de la comuna en la capa."""
+def actualizar_clientes_afectados_local(clientes_afectados):
+    """
+    Actualiza los clientes afectados por comuna en la capa local, además calcula el porcentaje.
+    En una sola pasada, las comunas sin cortes quedan en cero y se escriben las comunas con clientes
+    afectados (FECHA_ACTUALIZACION se renueva en cada ejecución mientras dure el corte) y las que
+    cambiaron. Los nombres de la SEC se resuelven al OID de la comuna con el índice de nombres, y el
+    nombre entregado por la SEC sobrescribe NOM_SEC en la misma pasada cuando coincide exactamente
+    o por alias (las asociaciones por similitud solo quedan en el índice).
+    """
     try:
         fc = os.path.join(arcpy.env.workspace, dataset, capa_comunas)
-        features = []
-        with arcpy.da.UpdateCursor(fc, ['OID@', 'NOM_SAIDI', 'NOM_SEC']) as cursor:
-            for row in cursor:
-                for comuna in comunas:
-                    if comuna == row[1]:
-                        row[2] = comuna
-                        features.append({
-                            "attributes": {
-                                "objectId": row[0],
-                                "NOM_SEC": comuna,
-                            }
-                        })
-                        print('Comuna de {0} actualizada'.format(comuna))
-                        cursor.updateRow(row)
-        del cursor
-        print('features: ', features)
+        indice = obtener_indice_comunas(fc)
+        resultado = reconciliar_comunas(fc, indice, clientes_afectados)
+
+        # Si la capa cambió desde que se construyó el índice, lo reconstruyo y repito la pasada
+        if sec.firma_comunas(resultado['comunas']) != indice.firma:
+            utils.log("La capa de comunas cambió, se reconstruye el índice de nombres")
+            indice = construir_indice_comunas(fc, resultado['comunas'])
+            resultado = reconciliar_comunas(fc, indice, clientes_afectados)
+        elif indice.modificado:
+            indice.guardar()
+
+        utils.log("Comunas escritas: {0}, con clientes afectados: {1}".format(
+            resultado['escritas'], resultado['encontradas']))
 
+        # Nombres de comunas que entrega la sec que no están registradas en la capa de comunas
+        comunas_nuevas = resultado['no_resueltas']
+        print('comunas nuevas: ', comunas_nuevas)
+        if len(comunas_nuevas) > 0:
+            utils.log("Comunas SEC sin coincidencia en la capa: {0}".format(', '.join(comunas_nuevas)))
+        metricas.incrementar('comunas_actualizadas_total', resultado['encontradas'])
+        metricas.incrementar('comunas_no_encontradas_total', len(comunas_nuevas))
+
+        return resultado['total_clientes']
     except:
-        print("Failed actualizar_comunas (%s)" %
+        print("Failed actualizar_clientes_afectados_local (%s)" %
               traceback.format_exc())
-        utils.error_log("Failed actualizar_comunas (%s)" %
+        utils.error_log("Failed actualizar_clientes_afectados_local (%s)" %
                         traceback.format_exc())
-        
+
+
+def reconciliar_comunas(fc, indice, clientes_afectados):
+    """Pasada única sobre la capa de comunas. Retorna los contadores y las filas leídas (OID, NOM_SAIDI, NOM_SEC)."""
+    ahora = datetime.now()
+    total_clientes = 0
+    escritas = 0
+    encontradas = 0
+    comunas = []
+    # Sumo los clientes afectados por comuna (OID) antes de recorrer la capa
+    afectados_por_oid, nombres_sec, no_resueltas = indice.agrupar(clientes_afectados)
+    campos = ['OID@', 'NOM_SAIDI', 'NOM_SEC', 'CLI_SAIDI', 'CLI_AFECTADOS', 'PORC_AFECTADOS', 'FECHA_ACTUALIZACION']
+    with arcpy.da.UpdateCursor(fc, campos) as cursor:
+        for row in cursor:
+            comunas.append((row[0], row[1], row[2]))
+            afectados = afectados_por_oid.get(row[0], 0)
+            if row[0] in afectados_por_oid:
+                encontradas += 1
+                total_clientes += afectados
+            # Calculo el porcentaje que representa los afectados versus el total de clientes
+            porcentaje = afectados / row[3] * 100 if row[3] else 0
+            nombre_sec = nombres_sec.get(row[0], row[2])
+            # Las comunas sin cortes se escriben solo si cambiaron; las afectadas, siempre (fecha de actualización)
+            if afectados == 0 and nombre_sec == row[2] and not sec.cambio_afectados(row[4], row[5], row[6], afectados, porcentaje):
+                continue
+
+            if nombre_sec != row[2]:
+                print('Comuna de {0} actualizada'.format(nombre_sec))
+            row[2] = nombre_sec
+            row[4] = afectados
+            row[5] = porcentaje
+            row[6] = ahora if afectados > 0 else None
+            cursor.updateRow(row)
+            escritas += 1
+
+            print('Comuna: {0}, clientes afectados: {1} ({2}%)'.format(
+                row[1], row[4], porcentaje))
+    del cursor
+
+    return {
+        'total_clientes': total_clientes,
+        'escritas': escritas,
+        'encontradas': encontradas,
+        'no_resueltas': no_resueltas,
+        'comunas': comunas,
+    }
+
 
 if __name__ == '__main__':
     main()
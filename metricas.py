@@ -0,0 +1,256 @@
+#-------------------------------------------------------------------------------
+# Name:         metricas
+# Purpose:      Métricas de los pipelines en formato de exposición Prometheus.
+#               Contadores, gauges e histogramas etiquetados por pipeline, que se
+#               escriben en un archivo para el textfile collector de node_exporter o
+#               se sirven en un puerto local (/metrics).
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from contextlib import contextmanager
+import threading
+import bisect
+import time
+import os
+import re
+import constants as const
+import logs
+
+#-------------------------------------------------------------------------------
+# Configuracion metricas
+#-------------------------------------------------------------------------------
+PREFIJO = 'min_energia_'
+
+# Buckets de los histogramas (segundos)
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Definición de las métricas: nombre -> (tipo, descripción)
+DEFINICIONES = {
+    'incendios_total': ('counter', 'Incendios procesados por tipo (nuevos, actualizados, extinguidos).'),
+    'incendios_activos': ('gauge', 'Incendios activos en el servicio de Conaf en la última ejecución.'),
+    'estaciones_actualizadas_total': ('counter', 'Estaciones meteorológicas actualizadas.'),
+    'comunas_actualizadas_total': ('counter', 'Comunas con clientes afectados encontradas en la capa.'),
+    'comunas_no_encontradas_total': ('counter', 'Comunas de la SEC que no se encontraron en la capa.'),
+    'clientes_afectados': ('gauge', 'Clientes afectados registrados en la última ejecución.'),
+    'correos_total': ('counter', 'Correos de alerta por resultado (enviado, fallido).'),
+    'http_reintentos_total': ('counter', 'Reintentos de peticiones http por upstream.'),
+    'http_respuestas_total': ('counter', 'Respuestas http por upstream y código de estado.'),
+    'http_rechazos_total': ('counter', 'Peticiones http rechazadas por el circuit breaker por upstream.'),
+    'http_circuito_abierto': ('gauge', 'Circuit breaker abierto (1) o cerrado (0) por upstream.'),
+    'http_errores_total': ('counter', 'Peticiones http fallidas por upstream.'),
+    'http_duracion_segundos': ('histogram', 'Latencia de las peticiones http por upstream.'),
+    'etapa_duracion_segundos': ('histogram', 'Duración de cada etapa del pipeline.'),
+    'scheduler_en_ejecucion': ('gauge', 'Pipeline en ejecución (1) o en espera (0) en el scheduler.'),
+    'scheduler_fallos_total': ('counter', 'Ejecuciones del scheduler terminadas con una excepción.'),
+    'scheduler_omitidas_total': ('counter', 'Turnos omitidos porque la ejecución anterior superó el intervalo.'),
+    'scheduler_proxima_ejecucion_timestamp': ('gauge', 'Fecha (epoch) de la próxima ejecución programada.'),
+    'lease_ocupado_total': ('counter', 'Ejecuciones omitidas o agrupadas porque el pipeline ya estaba en ejecución.'),
+    'lease_tomados_total': ('counter', 'Leases vencidos (ejecución abandonada) tomados por una nueva ejecución.'),
+    'ediciones_total': ('counter', 'Unidades de trabajo por resultado (confirmada, revertida, descartada).'),
+    'edicion_confirmacion_segundos': ('histogram', 'Latencia de confirmación de la sesión de edición del ciclo.'),
+    'publicacion_segundos': ('histogram', 'Duración de la publicación por versión por fase (construir, publicar).'),
+    'ejecuciones_total': ('counter', 'Ejecuciones finalizadas por pipeline.'),
+    'ultima_ejecucion_timestamp': ('gauge', 'Fecha (epoch) de la última ejecución finalizada.'),
+}
+
+# Series: (nombre_serie, labels ordenados) -> valor
+_series = {}
+_lock = threading.Lock()
+_servidor = None
+_cargados = set()
+
+_patron_linea = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_patron_label = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+_patron_escape = re.compile(r'\\(.)')
+
+
+def _labels(labels):
+    """Agrega el pipeline actual a las etiquetas y las ordena."""
+    if 'pipeline' not in labels:
+        labels['pipeline'] = logs.pipeline_actual() or 'ninguno'
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def incrementar(nombre, valor=1, **labels):
+    """Incrementa un contador."""
+    clave = (PREFIJO + nombre, _labels(labels))
+    with _lock:
+        _series[clave] = _series.get(clave, 0) + valor
+
+
+def fijar(nombre, valor, **labels):
+    """Fija el valor de un gauge."""
+    clave = (PREFIJO + nombre, _labels(labels))
+    with _lock:
+        _series[clave] = valor
+
+
+def observar(nombre, valor, **labels):
+    """Registra una observación en un histograma."""
+    base = PREFIJO + nombre
+    etiquetas = _labels(labels)
+    indice = bisect.bisect_left(BUCKETS, valor)
+    with _lock:
+        for i, limite in enumerate(BUCKETS):
+            if i >= indice:
+                clave = (base + '_bucket', tuple(sorted(etiquetas + (('le', str(limite)),))))
+                _series[clave] = _series.get(clave, 0) + 1
+        clave = (base + '_bucket', tuple(sorted(etiquetas + (('le', '+Inf'),))))
+        _series[clave] = _series.get(clave, 0) + 1
+        _series[(base + '_sum', etiquetas)] = _series.get((base + '_sum', etiquetas), 0) + valor
+        _series[(base + '_count', etiquetas)] = _series.get((base + '_count', etiquetas), 0) + 1
+
+
+@contextmanager
+def tiempo_http(upstream):
+    """Mide la latencia de una petición http y cuenta los errores por upstream."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except:
+        incrementar('http_errores_total', upstream=upstream)
+        raise
+    finally:
+        observar('http_duracion_segundos', time.perf_counter() - inicio, upstream=upstream)
+
+
+def _familia(nombre_serie):
+    """Retorna el nombre de la métrica (sin sufijos de histograma) y su definición."""
+    nombre = nombre_serie[len(PREFIJO):]
+    for sufijo in ('_bucket', '_sum', '_count'):
+        if nombre.endswith(sufijo) and nombre[:-len(sufijo)] in DEFINICIONES:
+            nombre = nombre[:-len(sufijo)]
+            break
+    return PREFIJO + nombre, DEFINICIONES.get(nombre, ('untyped', ''))
+
+
+def _valor(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+def _escapar(valor):
+    """Escapa el valor de una etiqueta (\\, " y salto de línea) según el formato de exposición."""
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _desescapar(valor):
+    """Inverso de _escapar, para los valores leídos desde el textfile."""
+    return _patron_escape.sub(lambda m: '\n' if m.group(1) == 'n' else m.group(1), valor)
+
+
+def renderizar(pipeline=None):
+    """Retorna las series en formato de exposición de Prometheus (opcionalmente de un pipeline)."""
+    with _lock:
+        series = sorted(_series.items())
+
+    lineas = []
+    familias = set()
+    for (nombre_serie, etiquetas), valor in series:
+        if pipeline is not None and dict(etiquetas).get('pipeline') != pipeline:
+            continue
+        familia, (tipo, descripcion) = _familia(nombre_serie)
+        if familia not in familias:
+            familias.add(familia)
+            lineas.append('# HELP {0} {1}'.format(familia, descripcion))
+            lineas.append('# TYPE {0} {1}'.format(familia, tipo))
+        texto_labels = ','.join('{0}="{1}"'.format(k, _escapar(v)) for k, v in etiquetas)
+        lineas.append('{0}{{{1}}} {2}'.format(nombre_serie, texto_labels, _valor(valor)))
+
+    return '\n'.join(lineas) + '\n'
+
+
+def _cargar_textfile(pipeline, archivo):
+    """Carga los contadores e histogramas de la ejecución anterior para mantenerlos monótonos."""
+    if pipeline in _cargados:
+        return
+    _cargados.add(pipeline)
+    if not os.path.exists(archivo):
+        return
+
+    with open(archivo, encoding='utf-8') as f:
+        for linea in f:
+            m = _patron_linea.match(linea.strip())
+            if m is None:
+                continue
+            nombre_serie, texto_labels, valor = m.groups()
+            familia, (tipo, _) = _familia(nombre_serie)
+            if tipo not in ('counter', 'histogram'):
+                continue
+            etiquetas = tuple(sorted((k, _desescapar(v)) for k, v in _patron_label.findall(texto_labels or '')))
+            clave = (nombre_serie, etiquetas)
+            with _lock:
+                _series[clave] = _series.get(clave, 0) + float(valor)
+
+
+def escribir_textfile(pipeline):
+    """Escribe las métricas del pipeline en el archivo del textfile collector (escritura atómica)."""
+    carpeta = const.METRICAS_TEXTFILE_DIR
+    os.makedirs(carpeta, exist_ok=True)
+    archivo = os.path.join(carpeta, 'min_energia_{0}.prom'.format(pipeline))
+    _cargar_textfile(pipeline, archivo)
+    temporal = archivo + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(renderizar(pipeline))
+    os.replace(temporal, archivo)
+
+
+def _crear_handler():
+    """Crea el handler de /metrics (http.server se importa solo en el modo 'puerto')."""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricasHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            cuerpo = renderizar().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricasHandler
+
+
+def iniciar_servidor(puerto_http=None):
+    """Sirve /metrics en un puerto local desde un hilo en segundo plano (solo procesos residentes: mainScheduler)."""
+    from http.server import ThreadingHTTPServer
+
+    global _servidor
+    with _lock:
+        if _servidor is None:
+            _servidor = ThreadingHTTPServer(('127.0.0.1', puerto_http or const.METRICAS_PUERTO), _crear_handler())
+            threading.Thread(target=_servidor.serve_forever, name='metricas-http', daemon=True).start()
+    return _servidor
+
+
+def exportar(pipeline=None, ejecucion=True):
+    """
+    Exporta las métricas del pipeline (por defecto, el actual) según el modo configurado.
+    Con ejecucion=False (ejecución omitida o agrupada) no se registra como ejecución finalizada.
+    """
+    try:
+        pipeline = pipeline or logs.pipeline_actual() or 'ninguno'
+        if ejecucion:
+            incrementar('ejecuciones_total', pipeline=pipeline)
+            fijar('ultima_ejecucion_timestamp', int(time.time()), pipeline=pipeline)
+        modo = const.METRICAS_MODO
+        if modo == 'archivo':
+            escribir_textfile(pipeline)
+        elif modo == 'puerto' and _servidor is None:
+            # El puerto solo lo sirve un proceso residente (mainScheduler): en un script
+            # ejecutado por cron el hilo terminaría con el proceso sin que nadie lo consulte
+            logs.obtener_logger().warning("METRICAS_MODO 'puerto' requiere mainScheduler; se escribe el textfile")
+            escribir_textfile(pipeline)
+    except:
+        logs.obtener_logger().exception('Failed metricas.exportar')
@@ -0,0 +1,50 @@
+#-------------------------------------------------------------------------------
+# Name:         migracion
+# Purpose:      Cambios de esquema (campos nuevos) de las capas publicadas en el visor.
+#               Se ejecuta una sola vez, con los servicios del visor detenidos, antes de
+#               desplegar la versión de los pipelines que usa los campos: los pipelines
+#               solo validan que existan, para no tomar un bloqueo de esquema en cada ciclo.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import arcpy
+import utils
+import constants as const
+import traceback
+import os
+
+
+def esquema():
+    """Retorna los campos que requieren los pipelines por capa del dataset: [(capa, [(campo, tipo)])]."""
+    import mainConaf
+
+    return [
+        (const.INCENDIOS, mainConaf.CAMPOS_METEO),
+        (const.BUFFER_VISOR, mainConaf.CAMPOS_LOD),
+        (const.PUNTOS_AFECTADOS, mainConaf.CAMPOS_CERCANIA),
+        (const.LINEAS_AFECTADAS, mainConaf.CAMPOS_CERCANIA),
+    ]
+
+
+def main():
+    """Agrega a cada capa los campos que le falten."""
+    arcpy.env.workspace = const.WORKSPACE
+    for capa, campos in esquema():
+        try:
+            fc = os.path.join(arcpy.env.workspace, const.DATASET, capa)
+            faltantes = utils.campos_faltantes(fc, campos)
+            for campo, tipo in faltantes:
+                arcpy.AddField_management(fc, campo, tipo)
+            print("{0}: {1} campos agregados {2}".format(capa, len(faltantes), [campo for campo, _ in faltantes]))
+            utils.log("Migración {0}: campos agregados {1}".format(capa, [campo for campo, _ in faltantes]))
+        except:
+            print("Failed migracion %s (%s)" % (capa, traceback.format_exc()))
+            utils.error_log("Failed migracion %s (%s)" % (capa, traceback.format_exc()))
+
+
+if __name__ == '__main__':
+    main()
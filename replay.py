@@ -0,0 +1,500 @@
+#-------------------------------------------------------------------------------
+# Name:         replay
+# Purpose:      Arnés de replay de una temporada de incendios. Genera (o carga desde
+#               archivos KML) una secuencia ordenada de snapshots del servicio de Conaf
+#               con sus fichas (popup.php), los sirve desde un servidor http local que
+#               reemplaza a sidco.conaf.cl y ejecuta ciclos completos del pipeline de
+#               Conaf sobre un backend en memoria con capas SIGGRE sintéticas.
+#               Reporta ciclos/s, latencia por etapa y memoria máxima según la cantidad
+#               de incendios.
+#
+#               python replay.py medir [incendios ...] [--ciclos N]
+#               python replay.py kml archivo1.kml [archivo2.kml ...]
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+from datetime import datetime, timedelta
+import xml.etree.ElementTree as et
+import numpy as np
+import tracemalloc
+import threading
+import time
+import sys
+import os
+
+# El replay no escribe métricas; los correos se arman pero no se envían (ver preparar_correo)
+os.environ.setdefault('METRICAS_MODO', 'ninguno')
+
+import constants as const
+import geometria
+import conaf
+import spans
+import utils
+
+#-------------------------------------------------------------------------------
+# Configuracion replay
+#-------------------------------------------------------------------------------
+# Estados de un incendio en la ficha de Conaf, en orden
+ESTADOS = ('En combate', 'Controlado', 'Extinguido')
+COMUNAS = ('Valparaíso', 'Quilpué', 'Casablanca', 'Melipilla', 'Rancagua', 'Pichilemu', 'Talca',
+           'Cauquenes', 'Chillán', 'Quillón', 'Concepción', 'Florida', 'Los Ángeles', 'Angol',
+           'Collipulli', 'Temuco', 'Lautaro', 'Valdivia', 'Osorno', 'Puerto Montt')
+# Capas SIGGRE sintéticas (sin el prefijo USER_DATOS) y su tipo de geometría
+CAPAS_SIGGRE = {nombre: ('linea' if 'cruce_' + nombre in const.LINE_TABLES else 'punto')
+                for nombre in const.TABLAS_SIGGRE
+                if 'cruce_' + nombre in const.LINE_TABLES + const.POINT_TABLES}
+# Probabilidades por snapshot: avance de estado y crecimiento de la superficie
+PROBABILIDAD_ESTADO = 0.15
+PROBABILIDAD_SUPERFICIE = 0.3
+
+KML_ENCABEZADO = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  '<kml xmlns="http://www.opengis.net/kml/2.2">\n<Document>\n<name>SIDCO</name>\n'
+                  '<description>Actualizado al {0}</description>\n<Folder>\n')
+KML_PLACEMARK = ('<Placemark><name>{nombre}</name><ExtendedData><SchemaData schemaUrl="#sidco_schema">'
+                 '<SimpleData name="ID">{id}</SimpleData></SchemaData></ExtendedData>'
+                 '<Point><coordinates>{lon:.7f},{lat:.7f},0</coordinates></Point></Placemark>\n')
+KML_PIE = '</Folder>\n</Document>\n</kml>\n'
+POPUP = ('<html><body><div id="tabla-ficha-{id}_div">'
+         '<span class="incendio-fecha">{fecha}</span><span class="incendio-comuna">{comuna}</span>'
+         '<span class="incendio-superficie">{superficie}</span><strong>{estado}</strong>'
+         '</div></body></html>')
+
+
+class Temporada:
+    """
+    Secuencia ordenada de snapshots del servicio de Conaf. Cada snapshot es la lista de
+    incendios publicados ({'id_incendio', 'nombre_incendio', 'lon', 'lat',
+    'fecha_inicio_incendio', 'comuna_incendio', 'superficie_incendio', 'estado_incendio'}).
+    """
+
+    def __init__(self, snapshots, inicio=None):
+        self.snapshots = snapshots
+        self.inicio = inicio or datetime(2026, 1, 15, 12, 0)
+        self._kml = {}
+        self._fichas = [{i['id_incendio']: i for i in incendios} for incendios in snapshots]
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    @classmethod
+    def generar(cls, incendios, snapshots, semilla=0):
+        """
+        Genera una temporada con 'incendios' publicados por snapshot. Cada snapshot los
+        incendios avanzan de estado o crecen al azar; los extinguidos se publican una vez
+        más y luego se reemplazan por incendios nuevos.
+        """
+        rng = np.random.default_rng(semilla)
+        inicio = datetime(2026, 1, 15, 12, 0)
+        siguiente = [0]
+
+        def nuevo(fecha):
+            siguiente[0] += 1
+            lon, lat = rng.uniform(-73.0, -70.5), rng.uniform(-41.0, -32.0)
+            return {
+                'id_incendio': 'incendio-{0}'.format(300000000 + siguiente[0]),
+                'nombre_incendio': '{0} - INCENDIO {0}'.format(siguiente[0]),
+                'lon': float(lon),
+                'lat': float(lat),
+                'fecha_inicio_incendio': fecha.strftime('%d-%m-%Y %H:%M'),
+                'comuna_incendio': COMUNAS[int(rng.integers(len(COMUNAS)))],
+                'superficie_incendio': '{0} ha'.format(int(rng.integers(1, 50))),
+                'estado_incendio': ESTADOS[0],
+            }
+
+        actuales = [nuevo(inicio) for _ in range(incendios)]
+        resultado = [actuales]
+        for n in range(1, snapshots):
+            fecha = inicio + timedelta(minutes=10 * n)
+            siguientes = []
+            for incendio in actuales:
+                if incendio['estado_incendio'] == ESTADOS[-1]:
+                    continue
+                incendio = dict(incendio)
+                if rng.random() < PROBABILIDAD_ESTADO:
+                    incendio['estado_incendio'] = ESTADOS[ESTADOS.index(incendio['estado_incendio']) + 1]
+                elif rng.random() < PROBABILIDAD_SUPERFICIE:
+                    hectareas = int(incendio['superficie_incendio'].split()[0])
+                    incendio['superficie_incendio'] = '{0} ha'.format(hectareas + int(rng.integers(1, 20)))
+                siguientes.append(incendio)
+            siguientes += [nuevo(fecha) for _ in range(incendios - len(siguientes))]
+            actuales = siguientes
+            resultado.append(actuales)
+        return cls(resultado, inicio)
+
+    @classmethod
+    def cargar(cls, archivos):
+        """
+        Carga una temporada desde archivos KML de Conaf (en orden). Como el KML no incluye
+        la ficha del incendio, se completa con datos fijos ('En combate').
+        """
+        snapshots = []
+        for archivo in archivos:
+            incendios = []
+            for placemark in conaf.leer_kml(et.parse(archivo)):
+                for lon, lat in placemark['coordenadas']:
+                    incendios.append({
+                        'id_incendio': placemark['id_incendio'],
+                        'nombre_incendio': placemark['nombre_incendio'],
+                        'lon': lon,
+                        'lat': lat,
+                        'fecha_inicio_incendio': '15-01-2026 12:00',
+                        'comuna_incendio': COMUNAS[0],
+                        'superficie_incendio': '10 ha',
+                        'estado_incendio': ESTADOS[0],
+                    })
+            snapshots.append(incendios)
+        return cls(snapshots)
+
+    def kml(self, indice):
+        """Retorna el KML (bytes) del snapshot."""
+        if indice not in self._kml:
+            fecha = self.inicio + timedelta(minutes=10 * indice)
+            partes = [KML_ENCABEZADO.format(fecha.strftime('%d-%m-%Y %H:%M'))]
+            partes += [KML_PLACEMARK.format(nombre=escape(i['nombre_incendio']), id=i['id_incendio'],
+                                            lon=i['lon'], lat=i['lat'])
+                       for i in self.snapshots[indice]]
+            partes.append(KML_PIE)
+            self._kml[indice] = ''.join(partes).encode('utf-8')
+        return self._kml[indice]
+
+    def popup(self, indice, id_incendio):
+        """Retorna la ficha (html, bytes) de un incendio en el snapshot, o None si no está publicado."""
+        incendio = self._fichas[indice].get(id_incendio)
+        if incendio is None:
+            return None
+        return POPUP.format(id=id_incendio, fecha=incendio['fecha_inicio_incendio'],
+                            comuna=escape(incendio['comuna_incendio']),
+                            superficie=incendio['superficie_incendio'],
+                            estado=incendio['estado_incendio']).encode('utf-8')
+
+
+class _ConafHandler(BaseHTTPRequestHandler):
+    # Cabeceras y cuerpo van en escrituras separadas: sin esto cada ficha espera el ACK retardado
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        temporada, indice = self.server.temporada, self.server.indice
+        if url.path == '/mapa/data-minagri.php':
+            cuerpo = temporada.kml(indice)
+        elif url.path == '/mapa/popup.php':
+            cuerpo = temporada.popup(indice, parse_qs(url.query).get('id', [''])[0])
+        else:
+            cuerpo = None
+        if cuerpo is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ServidorConaf:
+    """Servidor http local que reemplaza a sidco.conaf.cl, publicando un snapshot a la vez."""
+
+    def __init__(self, temporada):
+        _ConafHandler.protocol_version = 'HTTP/1.1'
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ConafHandler)
+        self.servidor.daemon_threads = True
+        self.servidor.temporada = temporada
+        self.servidor.indice = 0
+        base = 'http://127.0.0.1:{0}/mapa/'.format(self.servidor.server_address[1])
+        self.url_kml = base + 'data-minagri.php?key=' + const.KEY_CONAF
+        self.url_popup = base + 'popup.php'
+
+    def publicar(self, indice):
+        """Publica el snapshot 'indice' de la temporada."""
+        self.servidor.indice = indice
+
+    def __enter__(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class CapaSintetica:
+    """Capa SIGGRE sintética: puntos, o líneas como polilíneas de varios vértices."""
+
+    def __init__(self, nombre, tipo, cantidad, rng, empresas=50, vertices=8):
+        self.nombre = nombre
+        self.tipo = tipo
+        lons, lats = rng.uniform(-73.0, -70.5, cantidad), rng.uniform(-41.0, -32.0, cantidad)
+        if tipo == 'linea':
+            # Cada línea avanza ~1 km por vértice en una dirección al azar
+            rumbo = rng.uniform(0, 2 * np.pi, cantidad)
+            pasos = np.arange(vertices) / geometria.KM_POR_GRADO
+            lons = lons[:, None] + np.cos(rumbo)[:, None] * pasos
+            lats = lats[:, None] + np.sin(rumbo)[:, None] * pasos
+        self.lons, self.lats = lons, lats
+        self.atributos = [{
+            'leyenda': nombre,
+            'nombre': '{0} {1}'.format(nombre, i),
+            'propietario': 'Empresa {0}'.format(i % empresas),
+            'e_mail': 'empresa{0}@example.com'.format(i % empresas),
+            'capa': nombre,
+        } for i in range(cantidad)]
+
+    def afectadas(self, anillo):
+        """Retorna los índices de las entidades con al menos un vértice dentro del anillo."""
+        minimo, maximo = anillo.min(axis=0), anillo.max(axis=0)
+        lons, lats = self.lons.reshape(len(self.atributos), -1), self.lats.reshape(len(self.atributos), -1)
+        caja = ((lons >= minimo[0]) & (lons <= maximo[0]) & (lats >= minimo[1]) & (lats <= maximo[1])).any(axis=1)
+        candidatas = np.flatnonzero(caja)
+        if len(candidatas) == 0:
+            return candidatas
+        dentro = geometria.dentro_de_poligono(lons[candidatas].ravel(), lats[candidatas].ravel(), anillo)
+        return candidatas[dentro.reshape(len(candidatas), -1).any(axis=1)]
+
+
+def capas_siggre(entidades_por_capa=2000, semilla=0):
+    """Retorna las capas SIGGRE sintéticas {nombre: CapaSintetica}."""
+    rng = np.random.default_rng(semilla)
+    return {nombre: CapaSintetica(nombre, tipo, entidades_por_capa, rng) for nombre, tipo in CAPAS_SIGGRE.items()}
+
+
+class BackendMemoria:
+    """
+    Almacenamiento en memoria equivalente a las capas que usa mainConaf (incendios, buffers,
+    puntos y líneas afectadas), para ejecutar el pipeline sin arcpy.
+    """
+
+    def __init__(self, capas, distancia_km=None):
+        self.capas = capas
+        self.distancia_km = distancia_km or const.BUFFER_DISTANCIA_KM
+        self.incendios = {}
+        self.buffers = {}
+        self.puntos_afectados = []
+        self.lineas_afectadas = []
+
+    def eliminar_incendios(self, ids):
+        """Elimina los incendios, sus buffers y sus instalaciones afectadas."""
+        ids = set(ids)
+        for id_incendio in ids:
+            self.incendios.pop(id_incendio, None)
+            self.buffers.pop(id_incendio, None)
+        self.puntos_afectados = [p for p in self.puntos_afectados if p['id_incendio'] not in ids]
+        self.lineas_afectadas = [l for l in self.lineas_afectadas if l['id_incendio'] not in ids]
+
+
+@spans.medido('procesar_incendios')
+def procesar_incendios(backend, data, url_popup):
+    """Registra los incendios nuevos y actualiza o elimina los existentes (como procesar_data_conaf_rest)."""
+    total = {'actualizados': 0, 'nuevos': 0, 'extinguidos': 0, 'incendios_activos': 0}
+    servicio = set()
+    for placemark in conaf.leer_kml(data):
+        id_incendio = placemark['id_incendio']
+        servicio.add(id_incendio)
+        for lon, lat in placemark['coordenadas']:
+            total['incendios_activos'] += 1
+            with spans.span('scraping_iframe'):
+                html = conaf.descargar_popup(id_incendio, url_popup)
+                spans.anotar(bytes=len(html or b''))
+                fecha_inicio, comuna, superficie, estado = conaf.leer_popup(html, id_incendio)
+
+            registrado = backend.incendios.get(id_incendio)
+            if registrado is None:
+                total['nuevos'] += 1
+                backend.incendios[id_incendio] = {
+                    'id_incendio': id_incendio,
+                    'nombre_incendio': placemark['nombre_incendio'],
+                    'fecha_inicio_incendio': fecha_inicio,
+                    'comuna_incendio': comuna,
+                    'superficie_incendio': superficie,
+                    'estado_incendio': estado,
+                    'lon': lon,
+                    'lat': lat,
+                    'informado': False,
+                }
+            elif registrado['estado_incendio'] != estado:
+                total['actualizados'] += 1
+                if estado == 'Extinguido':
+                    total['extinguidos'] += 1
+                    utils.enviar_correo_admin_extinguido(id_incendio, fecha_inicio, comuna,
+                                                         registrado['nombre_incendio'])
+                    backend.eliminar_incendios([id_incendio])
+
+    # Incendios que Conaf borró del servicio sin informarlos como extinguidos
+    with spans.span('notificar_borrados'):
+        borrados = [i for i in backend.incendios.values() if i['id_incendio'] not in servicio]
+        for incendio in borrados:
+            utils.enviar_correo_admin_extinguido(incendio['id_incendio'], incendio['fecha_inicio_incendio'],
+                                                 incendio['comuna_incendio'], incendio['nombre_incendio'])
+        backend.eliminar_incendios([i['id_incendio'] for i in borrados])
+
+    spans.anotar(filas=total['incendios_activos'])
+    return total
+
+
+@spans.medido('crear_buffer')
+def crear_buffer(backend):
+    """Crea el buffer de cada incendio registrado."""
+    backend.buffers = {id_incendio: geometria.poligono_viento(i['lon'], i['lat'], backend.distancia_km, None)
+                       for id_incendio, i in backend.incendios.items()}
+    spans.anotar(filas=len(backend.buffers))
+
+
+@spans.medido('ejecutar_analisis')
+def ejecutar_analisis(backend):
+    """Cruza los buffers con las capas SIGGRE y guarda las instalaciones afectadas (puntos y líneas)."""
+    campos_incendio = ('id_incendio', 'nombre_incendio', 'comuna_incendio', 'superficie_incendio',
+                       'estado_incendio', 'fecha_inicio_incendio')
+    puntos, lineas, trazos = [], [], []
+    for capa in backend.capas.values():
+        destino = lineas if capa.tipo == 'linea' else puntos
+        for id_incendio, anillo in backend.buffers.items():
+            incendio = backend.incendios[id_incendio]
+            for indice in capa.afectadas(anillo):
+                instalacion = dict(capa.atributos[indice])
+                instalacion.update((campo, incendio[campo]) for campo in campos_incendio)
+                destino.append(instalacion)
+                trazos.append((instalacion, np.column_stack((np.atleast_1d(capa.lons[indice]),
+                                                             np.atleast_1d(capa.lats[indice])))))
+    backend.puntos_afectados, backend.lineas_afectadas = puntos, lineas
+    spans.anotar(filas=len(puntos) + len(lineas), capas=len(backend.capas))
+    ejecutar_cercania(backend, trazos)
+
+
+@spans.medido('cercania')
+def ejecutar_cercania(backend, trazos):
+    """Calcula near_dist (m) de las instalaciones afectadas [(instalacion, vértices)] (como mainConaf.ejecutar_cercania)."""
+    if trazos:
+        incendios = [backend.incendios[instalacion['id_incendio']] for instalacion, _ in trazos]
+        km = geometria.distancia_trazos_km([vertices for _, vertices in trazos],
+                                           [i['lon'] for i in incendios], [i['lat'] for i in incendios])
+        for (instalacion, _), distancia in zip(trazos, km):
+            instalacion['near_dist'] = round(float(distancia) * 1000, 1)
+    spans.anotar(filas=len(trazos))
+
+
+@spans.medido('enviar_alertas')
+def generar_alertas(backend, entidades):
+    """Arma las alertas por incendio y por correo (como mainConaf.generar_alertas), sin enviarlas."""
+    correos = 0
+    for id_incendio, grupo in conaf.agrupar_por_incendio(entidades).items():
+        incendio = backend.incendios[id_incendio]
+        if incendio['informado']:
+            continue
+        correos += 1
+        utils.enviar_correo_admin(id_incendio, grupo['comuna'], grupo['superficie'], grupo['instalaciones'],
+                                  incendio['nombre_incendio'])
+        for correo, datos in conaf.agrupar_por_correo(grupo['instalaciones']).items():
+            correos += 1
+            utils.enviar_correo_empresa(correo, id_incendio, grupo['comuna'], grupo['superficie'],
+                                        datos['instalaciones'], incendio['nombre_incendio'])
+        incendio['informado'] = True
+    spans.anotar(filas=len(entidades), correos=correos)
+
+
+def ciclo(backend, servidor):
+    """Ejecuta un ciclo del pipeline de Conaf (como mainConaf.main) contra el servidor local."""
+    data = utils.get_data_kml(servidor.url_kml)
+    incendios = procesar_incendios(backend, data, servidor.url_popup)
+    if incendios['actualizados'] > 0 or incendios['nuevos'] > 0:
+        crear_buffer(backend)
+        ejecutar_analisis(backend)
+        with spans.span('obtener_resultados'):
+            entidades = backend.puntos_afectados + backend.lineas_afectadas
+        if incendios['nuevos'] > 0:
+            generar_alertas(backend, entidades)
+    return incendios
+
+
+def preparar_correo():
+    """El replay nunca envía correos: fuerza EMAIL_SEND=false (los templates sí se arman)."""
+    os.environ['EMAIL_SEND'] = 'false'
+    os.environ.setdefault('EMAIL_FROM', 'replay@example.com')
+    os.environ.setdefault('EMAIL_TO_ADMIN', 'admin@example.com')
+    const.ajustes.recargar()
+
+
+def reproducir(temporada, capas, memoria=False):
+    """
+    Reproduce la temporada completa. Retorna (segundos, resumen de etapas de spans,
+    memoria máxima en bytes o None, incendios por ciclo).
+    """
+    preparar_correo()
+    backend = BackendMemoria(capas)
+    ejecucion = spans.iniciar('replay')
+    resultados = []
+    with ServidorConaf(temporada) as servidor:
+        if memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        for indice in range(len(temporada)):
+            servidor.publicar(indice)
+            resultados.append(ciclo(backend, servidor))
+        segundos = time.perf_counter() - inicio
+        pico = None
+        if memoria:
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return segundos, ejecucion.resumen(), pico, resultados
+
+
+def medir(tamanos=(10, 100, 300, 1000, 5000), ciclos=4, entidades_por_capa=2000):
+    """Imprime ciclos/s, latencia por etapa y memoria máxima para cada cantidad de incendios."""
+    capas = capas_siggre(entidades_por_capa)
+    filas, etapas_por_tamano = [], {}
+    for incendios in tamanos:
+        temporada = Temporada.generar(incendios, ciclos)
+        segundos, resumen, _, resultados = reproducir(temporada, capas)
+        # La memoria se mide en una segunda pasada (tracemalloc altera los tiempos)
+        _, _, pico, _ = reproducir(temporada, capas, memoria=True)
+        etapas_por_tamano[incendios] = {e['etapa']: e for e in resumen['etapas']}
+        filas.append((incendios, ciclos / segundos, segundos / ciclos * 1000, pico / 1024 / 1024,
+                      sum(r['nuevos'] for r in resultados), sum(r['extinguidos'] for r in resultados)))
+
+    imprimir('Replay Conaf ({0} ciclos, {1} entidades por capa SIGGRE)'.format(ciclos, entidades_por_capa),
+             ('incendios', 'ciclos/s', 'ms/ciclo', 'memoria máx. (MB)', 'nuevos', 'extinguidos'), filas)
+
+    etapas = []
+    for resumen in etapas_por_tamano.values():
+        etapas += [e for e in resumen if e not in etapas]
+    imprimir('Latencia por etapa (ms por ciclo)', ('etapa',) + tuple(str(t) for t in tamanos),
+             [(etapa,) + tuple(etapas_por_tamano[t][etapa]['total_s'] * 1000 / ciclos
+                               if etapa in etapas_por_tamano[t] else '-' for t in tamanos)
+              for etapa in etapas])
+
+
+def imprimir(titulo, columnas, filas):
+    textos = [[v if not isinstance(v, float) else '%.2f' % v for v in fila] for fila in filas]
+    anchos = [max([10, len(str(c))] + [len(str(f[i])) for f in textos]) for i, c in enumerate(columnas)]
+    print('\n' + titulo)
+    print(' | '.join('{0:>{1}}'.format(c, a) for c, a in zip(columnas, anchos)))
+    for fila in textos:
+        print(' | '.join('{0:>{1}}'.format(v, a) for v, a in zip(fila, anchos)))
+
+
+if __name__ == '__main__':
+    argumentos = sys.argv[1:]
+    if argumentos[:1] == ['kml'] and len(argumentos) > 1:
+        temporada = Temporada.cargar(argumentos[1:])
+        segundos, resumen, pico, resultados = reproducir(temporada, capas_siggre(), memoria=True)
+        imprimir('Replay de {0} snapshots KML ({1:.2f} s, memoria máx. {2:.1f} MB)'.format(
+            len(temporada), segundos, pico / 1024 / 1024),
+            ('etapa', 'llamadas', 'total (ms)', 'máx. (ms)'),
+            [(e['etapa'], e['llamadas'], e['total_s'] * 1000, e['max_s'] * 1000) for e in resumen['etapas']])
+        print(resultados)
+    elif argumentos[:1] == ['medir']:
+        ciclos = 4
+        if '--ciclos' in argumentos:
+            posicion = argumentos.index('--ciclos')
+            ciclos = int(argumentos[posicion + 1])
+            del argumentos[posicion:posicion + 2]
+        medir(tuple(int(a) for a in argumentos[1:]) or (10, 100, 300, 1000, 5000), ciclos)
+    else:
+        print('Uso: python replay.py medir [incendios ...] [--ciclos N] | python replay.py kml archivo.kml ...')
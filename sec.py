@@ -0,0 +1,213 @@
+#-------------------------------------------------------------------------------
+# Name:         sec
+# Purpose:      Utilidades sin arcpy para los datos de clientes afectados de la SEC.
+#               Incluye el índice persistente que resuelve el nombre de comuna entregado
+#               por la SEC al OID de la capa de comunas (nombres normalizados, alias y
+#               coincidencia aproximada opcional).
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import constants as const
+import unicodedata
+import hashlib
+import difflib
+import json
+import re
+import os
+import logs
+import http_client
+
+script_dir = os.path.dirname(__file__)
+
+#-------------------------------------------------------------------------------
+# Configuracion SEC
+#-------------------------------------------------------------------------------
+url_api_sec = const.URL_API_SEC
+
+#-------------------------------------------------------------------------------
+# Configuracion indice de comunas
+#-------------------------------------------------------------------------------
+# Variantes conocidas de nombres de comunas (normalizados)
+ALIAS_COMUNAS = {
+    'AISEN': 'AYSEN',
+    'COIHAIQUE': 'COYHAIQUE',
+    'LLAY LLAY': 'LLAILLAY',
+    'LLAYLLAY': 'LLAILLAY',
+    'PAIGUANO': 'PAIHUANO',
+    'TREGUACO': 'TREHUACO',
+    'MARCHIGUE': 'MARCHIHUE',
+    'CALERA': 'LA CALERA',
+    'ALTO BIO BIO': 'ALTO BIOBIO',
+    'CABO DE HORNOS (EX NAVARINO)': 'CABO DE HORNOS',
+    'NAVARINO': 'CABO DE HORNOS',
+    'OHIGGINS': 'O HIGGINS',
+}
+
+
+def consultar_hora(fecha, url=None):
+    """Retorna los registros de clientes afectados de una hora (GetPorFecha), o None si falla."""
+    raw_data = {"anho": fecha.strftime('%Y'), "mes": fecha.strftime('%m'),
+                "dia": fecha.strftime('%d'), "hora": fecha.strftime('%H')}
+    response = http_client.post(url or url_api_sec, json=raw_data, timeout=const.SEC_TIMEOUT)
+    if response is None:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        logs.obtener_logger().error("Respuesta inválida de GetPorFecha ({0})".format(fecha.strftime('%Y-%m-%d %H')))
+        return None
+
+
+def normalizar_comuna(nombre):
+    """Normaliza el nombre de una comuna: sin tildes, mayúsculas, sin puntuación ni espacios repetidos."""
+    if nombre is None:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(nombre))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).upper()
+    texto = re.sub(r"[^A-Z0-9()]+", ' ', texto)
+    texto = re.sub(r'\(\s*', '(', re.sub(r'\s*\)', ')', texto))
+    return ' '.join(texto.split())
+
+
+def firma_comunas(comunas):
+    """
+    Firma de las filas de la capa (oid, NOM_SAIDI, NOM_SEC) para detectar cambios.
+    NOM_SEC no se considera, ya que se actualiza con los nombres resueltos por el índice.
+    """
+    texto = json.dumps(sorted([[str(c[0]), str(c[1])] for c in comunas]))
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+class IndiceComunas:
+    """
+    Resuelve nombres de comunas de la SEC al OID de la capa de comunas en O(1).
+    Se indexan NOM_SAIDI y NOM_SEC normalizados; los nombres que no coinciden se buscan
+    en la tabla de alias y luego por similitud (difflib). Las resoluciones aproximadas
+    se guardan en el índice (no en la capa) para no repetir la búsqueda.
+    """
+
+    def __init__(self, comunas, alias=None):
+        self.firma = firma_comunas(comunas)
+        self.nombres = {}
+        for oid, nom_saidi, nom_sec in comunas:
+            for nombre in (nom_saidi, nom_sec):
+                clave = normalizar_comuna(nombre)
+                if clave:
+                    self.nombres.setdefault(clave, oid)
+        self.alias = dict(ALIAS_COMUNAS)
+        self.alias.update({normalizar_comuna(k): normalizar_comuna(v) for k, v in (alias or {}).items()})
+        self.resueltos = {}
+        self.modificado = True
+
+    def resolver(self, nombre):
+        """Retorna el OID de la comuna, o None si no se pudo resolver."""
+        clave = normalizar_comuna(nombre)
+        oid = self.nombres.get(clave)
+        if oid is not None:
+            return oid
+        oid = self.nombres.get(self.alias.get(clave, ''))
+        if oid is not None:
+            return oid
+        if clave in self.resueltos:
+            return self.resueltos[clave]
+
+        # Coincidencia aproximada (solo una vez por nombre)
+        oid = None
+        corte = const.SEC_FUZZY_CORTE
+        if corte > 0 and clave:
+            candidatos = difflib.get_close_matches(clave, list(self.nombres), n=1, cutoff=corte)
+            if candidatos:
+                oid = self.nombres[candidatos[0]]
+                logs.obtener_logger().info("Comuna SEC '{0}' asociada a '{1}' por similitud".format(nombre, candidatos[0]))
+        self.resueltos[clave] = oid
+        self.modificado = True
+        return oid
+
+    def aproximado(self, nombre):
+        """Indica si el nombre se resolvió por similitud (no coincide con un nombre de la capa ni un alias)."""
+        return normalizar_comuna(nombre) in self.resueltos
+
+    def agrupar(self, registros):
+        """
+        Suma los clientes afectados por OID. Retorna ({oid: afectados}, {oid: nombre SEC},
+        [nombres no resueltos]). El nombre SEC solo se entrega para coincidencias exactas o por
+        alias: una asociación por similitud podría ser errónea y no debe quedar en NOM_SEC,
+        donde se indexaría como nombre válido de la comuna.
+        """
+        afectados, nombres, no_resueltos = {}, {}, []
+        for comuna, clientes in agrupar_por_comuna(registros).items():
+            oid = self.resolver(comuna)
+            if oid is None:
+                no_resueltos.append(comuna)
+                continue
+            afectados[oid] = afectados.get(oid, 0) + clientes
+            if not self.aproximado(comuna):
+                nombres.setdefault(oid, comuna)
+        return afectados, nombres, no_resueltos
+
+    def guardar(self, archivo=None):
+        """Guarda el índice en disco (escritura atómica)."""
+        archivo = archivo or const.SEC_INDICE_COMUNAS
+        temporal = archivo + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'firma': self.firma, 'nombres': self.nombres, 'resueltos': self.resueltos},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(temporal, archivo)
+        self.modificado = False
+
+    @classmethod
+    def cargar(cls, archivo=None):
+        """Carga el índice guardado, o None si no existe o es inválido."""
+        archivo = archivo or const.SEC_INDICE_COMUNAS
+        if not os.path.exists(archivo):
+            return None
+        try:
+            with open(archivo, encoding='utf-8') as f:
+                datos = json.load(f)
+            indice = cls([], cargar_alias())
+            indice.firma = datos['firma']
+            indice.nombres = datos['nombres']
+            indice.resueltos = datos.get('resueltos', {})
+            indice.modificado = False
+            return indice
+        except (ValueError, KeyError):
+            logs.obtener_logger().error("Índice de comunas SEC inválido, se reconstruye")
+            return None
+
+
+def cargar_alias():
+    """Carga los alias adicionales de comunas desde SEC_ALIAS_COMUNAS, si está configurado."""
+    if not const.SEC_ALIAS_COMUNAS:
+        return {}
+    ruta = os.path.join(script_dir, const.SEC_ALIAS_COMUNAS)
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logs.obtener_logger().error("No se pudo leer el archivo de alias de comunas {0}".format(ruta))
+        return {}
+
+
+def agrupar_por_comuna(registros):
+    """Suma los clientes afectados de los registros de la SEC por nombre de comuna."""
+    afectados = {}
+    for k in registros:
+        comuna = k['NOMBRE_COMUNA']
+        afectados[comuna] = afectados.get(comuna, 0) + k['CLIENTES_AFECTADOS']
+    return afectados
+
+
+def cambio_afectados(afectados_actual, porcentaje_actual, fecha_actual, afectados, porcentaje):
+    """
+    Indica si la fila de una comuna debe escribirse: cambió la cantidad de afectados o el
+    porcentaje, o la fecha no corresponde (las comunas sin afectados no llevan fecha).
+    """
+    if afectados_actual != afectados:
+        return True
+    if porcentaje_actual is None or abs(porcentaje_actual - porcentaje) > 1e-6:
+        return True
+    return (fecha_actual is None) != (afectados == 0)
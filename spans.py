@@ -0,0 +1,172 @@
+#-------------------------------------------------------------------------------
+# Name:         spans
+# Purpose:      Medición de tiempos por etapa (spans) de cada ejecución de un pipeline.
+#               Cada etapa se mide con el context manager "span" o el decorador "medido",
+#               acumulando filas/bytes procesados. Al finalizar la ejecución se emite un
+#               resumen en el log y en un archivo local de métricas (JSON lines).
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from contextlib import contextmanager
+from datetime import datetime
+import contextvars
+import functools
+import threading
+import time
+import json
+import os
+import constants as const
+import logs
+import metricas
+
+# Ejecución y span activos del hilo actual
+_ejecucion = contextvars.ContextVar('ejecucion', default=None)
+_span_activo = contextvars.ContextVar('span_activo', default=None)
+
+_lock_archivo = threading.Lock()
+
+
+class Span:
+    """Etapa medida de una ejecución."""
+
+    def __init__(self, nombre, padre=None, **datos):
+        self.nombre = nombre
+        self.padre = padre
+        self.datos = dict(datos)
+        self.inicio = time.perf_counter()
+        self.duracion = None
+        self.error = False
+
+    def anotar(self, **datos):
+        """Acumula contadores en el span (las cantidades numéricas se suman)."""
+        for k, v in datos.items():
+            if isinstance(v, (int, float)) and isinstance(self.datos.get(k), (int, float)):
+                self.datos[k] += v
+            else:
+                self.datos[k] = v
+
+    def cerrar(self):
+        self.duracion = time.perf_counter() - self.inicio
+
+
+class Ejecucion:
+    """Agrupa los spans de una ejecución de un pipeline."""
+
+    def __init__(self, pipeline, run_id=None):
+        self.pipeline = pipeline
+        self.run_id = run_id
+        self.fecha = datetime.now()
+        self.inicio = time.perf_counter()
+        self.spans = []
+
+    def resumen(self):
+        """Retorna el resumen de la ejecución, agregando los spans por nombre de etapa."""
+        etapas = {}
+        for s in self.spans:
+            etapa = etapas.get(s.nombre)
+            if etapa is None:
+                etapa = etapas[s.nombre] = {
+                    'etapa': s.nombre,
+                    'padre': s.padre,
+                    'llamadas': 0,
+                    'total_s': 0.0,
+                    'max_s': 0.0,
+                    'errores': 0,
+                }
+            etapa['llamadas'] += 1
+            etapa['total_s'] += s.duracion
+            etapa['max_s'] = max(etapa['max_s'], s.duracion)
+            etapa['errores'] += int(s.error)
+            for k, v in s.datos.items():
+                if isinstance(v, (int, float)):
+                    etapa[k] = etapa.get(k, 0) + v
+                else:
+                    etapa[k] = v
+
+        for etapa in etapas.values():
+            etapa['total_s'] = round(etapa['total_s'], 4)
+            etapa['max_s'] = round(etapa['max_s'], 4)
+
+        return {
+            'pipeline': self.pipeline,
+            'run_id': self.run_id,
+            'fecha': self.fecha.strftime('%Y-%m-%d %H:%M:%S'),
+            'total_s': round(time.perf_counter() - self.inicio, 4),
+            'etapas': list(etapas.values()),
+        }
+
+
+def iniciar(pipeline):
+    """Inicia la medición de una ejecución del pipeline en el hilo actual."""
+    ejecucion = Ejecucion(pipeline, logs.run_id_actual())
+    _ejecucion.set(ejecucion)
+    _span_activo.set(None)
+    return ejecucion
+
+
+@contextmanager
+def span(nombre, **datos):
+    """Mide una etapa. Permite anotar filas/bytes mediante el span retornado."""
+    padre = _span_activo.get()
+    s = Span(nombre, padre.nombre if padre is not None else None, **datos)
+    token = _span_activo.set(s)
+    try:
+        yield s
+    except:
+        s.error = True
+        raise
+    finally:
+        s.cerrar()
+        _span_activo.reset(token)
+        metricas.observar('etapa_duracion_segundos', s.duracion, etapa=s.nombre)
+        ejecucion = _ejecucion.get()
+        if ejecucion is not None:
+            ejecucion.spans.append(s)
+
+
+def medido(nombre=None):
+    """Decorador que mide la función como una etapa."""
+    def decorador(funcion):
+        etapa = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with span(etapa):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def anotar(**datos):
+    """Acumula contadores (filas, bytes, ...) en el span activo, si existe."""
+    s = _span_activo.get()
+    if s is not None:
+        s.anotar(**datos)
+
+
+def finalizar():
+    """Emite el resumen de la ejecución en el log y en el archivo de métricas."""
+    ejecucion = _ejecucion.get()
+    if ejecucion is None:
+        return None
+
+    resumen = ejecucion.resumen()
+    _ejecucion.set(None)
+
+    logs.obtener_logger().info('Resumen de etapas', extra={'datos': resumen})
+
+    try:
+        carpeta = const.METRICAS_DIR
+        os.makedirs(carpeta, exist_ok=True)
+        archivo = os.path.join(carpeta, '{0}-etapas.jsonl'.format(ejecucion.pipeline))
+        with _lock_archivo:
+            with open(archivo, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(resumen, ensure_ascii=False) + '\n')
+    except:
+        logs.obtener_logger().exception('Failed spans.finalizar')
+
+    return resumen
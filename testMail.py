@@ -11,22 +11,21 @@
 
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from decouple import config
 import template_html as template
+import constants as const
 import traceback
 import utils
+import logs
 import envia_email as email
 
-#-------------------------------------------------------------------------------
-# Configuracion correo
-#-------------------------------------------------------------------------------
-destinatario_admin = config('EMAIL_TO_ADMIN')
-email_from = config('EMAIL_FROM')
-
 
 def test_mail():
     """Permite probar envío de email."""
     try:
+        # Configuracion correo
+        destinatario_admin = const.EMAIL_TO_ADMIN
+        email_from = const.EMAIL_FROM
+        logs.iniciar_ejecucion('test_mail')
         utils.log("Inicio test mail")
         print("Inicio test mail")
         utils.log("Enviando mail desde {} a {}".format(email_from, destinatario_admin))
@@ -0,0 +1,42 @@
+#-------------------------------------------------------------------------------
+# Name:         conftest
+# Purpose:      Configuración común de las pruebas: la raíz del repositorio en el
+#               path y las variables de entorno que exige constants (las pruebas
+#               no usan la geodatabase ni arcpy).
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import tempfile
+import pytest
+import shutil
+import atexit
+import sys
+import os
+
+raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if raiz not in sys.path:
+    sys.path.insert(0, raiz)
+
+for variable in ('FOLDER_WORKSPACE', 'FOLDER_WORKSPACE_LOCAL', 'WORKSPACE_DATASET',
+                 'WORKSPACE_DATASET_CAPAS_MINISTERIO', 'USER_GEODATOS', 'USER_GEODATOS_SCRIPT',
+                 'FILE_CONAF_KML', 'USE_FILE_KML'):
+    os.environ.setdefault(variable, '')
+os.environ.setdefault('METRICAS_MODO', 'ninguno')
+# Los logs de las pruebas no quedan en el repositorio
+carpeta_logs = tempfile.mkdtemp(prefix='min_energia_logs_')
+atexit.register(shutil.rmtree, carpeta_logs, True)
+os.environ.setdefault('LOG_FILE', os.path.join(carpeta_logs, 'log.txt'))
+os.environ.setdefault('ERROR_LOG_FILE', os.path.join(carpeta_logs, 'error-log.txt'))
+
+
+@pytest.fixture
+def ajustes():
+    """Ajustes del proyecto leídos de nuevo al iniciar y al terminar la prueba (tras monkeypatch.setenv)."""
+    import constants as const
+    const.ajustes.recargar()
+    yield const.ajustes
+    const.ajustes.recargar()
@@ -0,0 +1,65 @@
+#-------------------------------------------------------------------------------
+# Name:         test_agromet
+# Purpose:      Pruebas de la lectura de muestras de Agromet, la ventana de consulta
+#               y la copia de valores a las filas de estaciones.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from datetime import datetime
+import json
+import pytest
+import agromet
+
+REFERENCIA = datetime(2026, 1, 15, 12, 0)
+
+
+def respuesta(muestras):
+    return json.dumps({'muestras': muestras}).encode('utf-8')
+
+
+def partes(data, tamano):
+    return [data[i:i + tamano] for i in range(0, len(data), tamano)]
+
+
+@pytest.mark.parametrize('tamano', [1, 7, 64, 100000])
+def test_leer_ultima_muestra_por_partes(tamano):
+    muestras = [{'fecha': '2026-01-15 11:{0:02d}:00'.format(m), 'valor': float(m)} for m in range(0, 60, 10)]
+    data = respuesta(muestras)
+    muestra, leidos, duracion = agromet.leer_ultima_muestra(partes(data, tamano))
+    assert muestra == muestras[-1]
+    assert leidos == len(data)
+    assert duracion >= 0
+
+
+def test_leer_ultima_muestra_sin_muestras():
+    assert agromet.leer_ultima_muestra([respuesta([])])[0] is None
+    assert agromet.leer_ultima_muestra([])[0] is None
+    # Un objeto sin 'valor' no es una muestra
+    assert agromet.leer_ultima_muestra([b'{"error": "sin datos"}'])[0] is None
+
+
+def test_calcular_ventana_modo_dia(ajustes, monkeypatch):
+    monkeypatch.setenv('AGROMET_MODO_CONSULTA', 'dia')
+    assert agromet.calcular_ventana(1, REFERENCIA) == ('2026-01-15', '2026-01-15')
+
+
+def test_calcular_ventana_modo_ultima(ajustes, monkeypatch):
+    monkeypatch.setenv('AGROMET_MODO_CONSULTA', 'ultima')
+    monkeypatch.setenv('AGROMET_VENTANA_MINUTOS', '30')
+    monkeypatch.setattr(agromet, '_estado', {'2': '2026-01-15 11:50:00', '3': '2026-01-14 11:50:00'})
+    assert agromet.calcular_ventana(1, REFERENCIA) == ('2026-01-15 11:30', '2026-01-15 12:30')
+    # Parte desde la última muestra ya leída si está dentro de la ventana
+    assert agromet.calcular_ventana(2, REFERENCIA) == ('2026-01-15 11:51', '2026-01-15 12:30')
+    assert agromet.calcular_ventana(3, REFERENCIA) == ('2026-01-15 11:30', '2026-01-15 12:30')
+
+
+def test_aplicar_cambios():
+    campos = ('humedad_media', 'temperatura_media', 'direccion_viento')
+    row = ['oid', 50.0, 20.0, 180.0]
+    assert not agromet.aplicar_cambios(row, {'humedad_media': 50.0}, campos)
+    assert agromet.aplicar_cambios(row, {'temperatura_media': 21.5, 'otro': 1}, campos)
+    assert row == ['oid', 50.0, 21.5, 180.0]
@@ -0,0 +1,25 @@
+#-------------------------------------------------------------------------------
+# Name:         test_constants
+# Purpose:      Pruebas de la lectura de los ajustes del proyecto.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import pytest
+
+
+def test_niveles_de_detalle(ajustes, monkeypatch):
+    monkeypatch.setenv('BUFFER_VISOR_LOD_TOLERANCIAS_M', '0,25,100')
+    monkeypatch.setenv('BUFFER_VISOR_LOD_ESCALAS', '0,150000,600000')
+    assert ajustes.BUFFER_VISOR_LODS == [(0.0, 0), (25.0, 150000), (100.0, 600000)]
+
+
+@pytest.mark.parametrize('tolerancias, escalas', [('0,25,100', '0,150000'), ('0', '0,150000'), ('', '')])
+def test_niveles_de_detalle_invalidos(ajustes, monkeypatch, tolerancias, escalas):
+    monkeypatch.setenv('BUFFER_VISOR_LOD_TOLERANCIAS_M', tolerancias)
+    monkeypatch.setenv('BUFFER_VISOR_LOD_ESCALAS', escalas)
+    with pytest.raises(ValueError, match='misma cantidad'):
+        ajustes.BUFFER_VISOR_LODS
@@ -0,0 +1,34 @@
+#-------------------------------------------------------------------------------
+# Name:         test_edicion
+# Purpose:      Pruebas de la construcción de cláusulas SQL de edición.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import types
+import edicion
+
+
+def test_texto_sql():
+    assert edicion.texto_sql('ABC-12') == "'ABC-12'"
+    assert edicion.texto_sql("O'Higgins") == "'O''Higgins'"
+    assert edicion.texto_sql(15) == "'15'"
+
+
+def test_clausula_in(monkeypatch):
+    # Sin arcpy: los delimitadores de campo de una FileGDB son comillas dobles
+    monkeypatch.setattr(edicion, 'arcpy', types.SimpleNamespace(
+        AddFieldDelimiters=lambda fc, campo: '"{0}"'.format(campo)))
+    assert edicion.clausula_in('INCENDIOS', 'ID_INCENDIO', ['1', "O'Higgins 2"]) == \
+        "\"ID_INCENDIO\" IN ('1', 'O''Higgins 2')"
+
+
+def test_eliminar_sin_valores_no_deja_pendientes():
+    unidad = edicion.UnidadDeTrabajo('workspace', 'dataset')
+    unidad.eliminar('INCENDIOS', 'id_incendio', [])
+    assert not unidad.pendientes()
+    unidad.eliminar('INCENDIOS', 'id_incendio', ['1'])
+    assert unidad.pendientes()
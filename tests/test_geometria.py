@@ -0,0 +1,114 @@
+#-------------------------------------------------------------------------------
+# Name:         test_geometria
+# Purpose:      Pruebas de las utilidades geométricas (distancias, KD-tree, polígonos
+#               y simplificación de WKB).
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import numpy as np
+import pytest
+import geometria
+
+
+def puntos(cantidad, semilla):
+    rng = np.random.RandomState(semilla)
+    return rng.uniform(-76.0, -67.0, cantidad), rng.uniform(-56.0, -17.0, cantidad)
+
+
+def test_distancia_km_conocida():
+    # Un grado de latitud
+    assert geometria.distancia_km(-70.0, -33.0, -70.0, -34.0) == pytest.approx(geometria.KM_POR_GRADO)
+    assert geometria.distancia_km(-70.0, -33.0, -70.0, -33.0) == 0.0
+
+
+def test_distancia_segmento_extremos_y_proyeccion():
+    # Más allá del extremo: distancia al extremo
+    km = geometria.distancia_segmento_km(-70.0, -33.0, -70.0, -33.1, -70.0, -33.2)
+    assert km == pytest.approx(geometria.distancia_km(-70.0, -33.0, -70.0, -33.1))
+    # Frente al segmento: distancia perpendicular
+    km = geometria.distancia_segmento_km(-70.01, -33.05, -70.0, -33.0, -70.0, -33.1)
+    assert km == pytest.approx(geometria.distancia_km(-70.01, -33.05, -70.0, -33.05), rel=1e-4)
+    # Segmento de largo 0
+    km = geometria.distancia_segmento_km(-70.0, -33.0, -70.1, -33.0, -70.1, -33.0)
+    assert km == pytest.approx(geometria.distancia_km(-70.0, -33.0, -70.1, -33.0))
+
+
+def test_distancia_trazos_igual_a_por_segmento():
+    rng = np.random.RandomState(3)
+    lons, lats = puntos(200, 1)
+    trazos = [np.column_stack((x + rng.uniform(-0.05, 0.05, n), y + rng.uniform(-0.05, 0.05, n)))
+              for x, y, n in zip(lons, lats, rng.randint(1, 9, len(lons)))]
+    km = geometria.distancia_trazos_km(trazos, lons, lats)
+
+    esperado = []
+    for x, y, t in zip(lons, lats, trazos):
+        extremos = [(t[k], t[min(k + 1, len(t) - 1)]) for k in range(max(len(t) - 1, 1))]
+        esperado.append(min(float(geometria.distancia_segmento_km(x, y, a[0], a[1], b[0], b[1])) for a, b in extremos))
+    assert np.allclose(km, esperado)
+
+
+def test_distancia_trazos_vacio():
+    with pytest.raises(ValueError):
+        geometria.distancia_trazos_km([np.zeros((0, 2))], [-70.0], [-33.0])
+
+
+@pytest.mark.parametrize('k', [1, 3])
+def test_arbol_kd_igual_a_busqueda_exhaustiva(k):
+    lon_e, lat_e = puntos(400, 1)
+    lon_i, lat_i = puntos(300, 2)
+    ids, km = geometria.ArbolKD(lon_e, lat_e).consultar(lon_i, lat_i, k)
+
+    for j, (x, y) in enumerate(zip(lon_i, lat_i)):
+        d = geometria.distancia_km(x, y, lon_e, lat_e)
+        assert ids[j].tolist() == np.argsort(d, kind='stable')[:k].tolist()
+        assert np.allclose(km[j], np.sort(d)[:k])
+
+
+def test_arbol_kd_guardar_y_cargar(tmp_path):
+    lon_e, lat_e = puntos(100, 1)
+    arbol = geometria.ArbolKD(lon_e, lat_e, ids=np.arange(100) + 1000)
+    archivo = str(tmp_path / 'estaciones.npz')
+    arbol.guardar(archivo)
+    cargado = geometria.ArbolKD.cargar(archivo)
+
+    lon_i, lat_i = puntos(20, 2)
+    assert len(cargado) == len(arbol)
+    assert (cargado.consultar(lon_i, lat_i, 2)[0] == arbol.consultar(lon_i, lat_i, 2)[0]).all()
+
+
+def test_poligono_viento_cerrado_y_con_el_area_del_circulo():
+    anillo = geometria.poligono_viento(-70.5, -33.4, 2.0, 90.0, 30.0)
+    assert (anillo[0] == anillo[-1]).all()
+    x = (anillo[:, 0] + 70.5) * geometria.KM_POR_GRADO * np.cos(np.radians(-33.4))
+    y = (anillo[:, 1] + 33.4) * geometria.KM_POR_GRADO
+    area = 0.5 * abs(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+    assert area == pytest.approx(np.pi * 2.0 ** 2, rel=0.01)
+
+
+def test_dentro_de_poligono():
+    cuadrado = [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)]
+    dentro = geometria.dentro_de_poligono([0.5, 1.5, 0.2, -0.1], [0.5, 0.5, 0.9, 0.5], cuadrado)
+    assert dentro.tolist() == [True, False, True, False]
+
+
+def test_poligono_viento_cerrado_y_contiene_el_incendio():
+    anillo = geometria.poligono_viento(-70.5, -33.4, 2.0, 90.0, 30.0)
+    assert (anillo[0] == anillo[-1]).all()
+    assert geometria.dentro_de_poligono([-70.5], [-33.4], anillo)[0]
+
+
+def test_simplificar_wkb():
+    angulos = np.linspace(0, 2 * np.pi, 361)
+    anillo = np.column_stack((-70.5 + 0.02 * np.cos(angulos), -33.4 + 0.02 * np.sin(angulos)))
+    wkb = geometria.escribir_wkb_poligonos([[anillo]])
+    assert [[a.tolist() for a in p] for p in geometria.leer_wkb_poligonos(wkb)] == [[anillo.tolist()]]
+
+    # Sin tolerancia no se modifica
+    assert geometria.simplificar_wkb(wkb, 0) is wkb
+    simplificado = geometria.leer_wkb_poligonos(geometria.simplificar_wkb(wkb, 25))[0][0]
+    assert 4 <= len(simplificado) < len(anillo)
+    assert (simplificado[0] == simplificado[-1]).all()
@@ -0,0 +1,46 @@
+#-------------------------------------------------------------------------------
+# Name:         test_historial_sec
+# Purpose:      Pruebas del historial de cortes de la SEC (máximos y estado vigente).
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+from datetime import datetime, timedelta
+import historial_sec
+import sec
+
+
+def registro(comuna, clientes):
+    return {'NOMBRE_COMUNA': comuna, 'CLIENTES_AFECTADOS': clientes}
+
+
+def test_historial_pico_igual_a_respuestas(tmp_path, ajustes, monkeypatch):
+    monkeypatch.setenv('SEC_HISTORIAL_DIR', str(tmp_path))
+    monkeypatch.setattr(historial_sec, '_codigos', None)
+    inicio = datetime(2026, 7, 1)
+    horas = [inicio + timedelta(hours=h) for h in range(48)]
+    respuestas = [[registro('COMUNA {0}'.format(i), (i * 37 + h * 11) % 50)
+                   for i in range(5) if (i + h) % 3] for h in range(len(horas))]
+    for h, r in zip(horas, respuestas):
+        historial_sec.agregar(h, r)
+
+    esperado = {}
+    for h, r in zip(horas, respuestas):
+        for comuna, n in sec.agrupar_por_comuna(r).items():
+            nombre = sec.normalizar_comuna(comuna)
+            if n > esperado.get(nombre, (0, None))[0]:
+                esperado[nombre] = (n, h)
+    assert historial_sec.pico(horas[0], horas[-1]) == esperado
+
+
+def test_historial_estado(tmp_path, ajustes, monkeypatch):
+    monkeypatch.setenv('SEC_HISTORIAL_DIR', str(tmp_path))
+    monkeypatch.setattr(historial_sec, '_codigos', None)
+    hora = datetime(2026, 7, 1, 10)
+    historial_sec.agregar(hora, [registro('A', 10), registro('B', 4)])
+    historial_sec.agregar(hora + timedelta(hours=1), [registro('A', 12)])
+    assert historial_sec.estado(hora) == {'A': 10, 'B': 4}
+    assert historial_sec.estado(hora + timedelta(hours=1)) == {'A': 12}
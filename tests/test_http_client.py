@@ -0,0 +1,63 @@
+#-------------------------------------------------------------------------------
+# Name:         test_http_client
+# Purpose:      Pruebas del circuit breaker del cliente http.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import requests
+import pytest
+import http_client
+
+
+class SesionCaida:
+    """Sesión que falla todas las peticiones con un error de red."""
+
+    def __init__(self):
+        self.peticiones = 0
+
+    def request(self, metodo, url, **kwargs):
+        self.peticiones += 1
+        raise requests.ConnectionError('sin conexión')
+
+
+@pytest.fixture
+def sesion(monkeypatch):
+    sesion = SesionCaida()
+    monkeypatch.setattr(http_client, '_circuitos', {})
+    monkeypatch.setattr(http_client, 'obtener_sesion', lambda nombre_host: sesion)
+    monkeypatch.setattr(http_client.time, 'sleep', lambda segundos: None)
+    return sesion
+
+
+def test_un_fallo_por_peticion(sesion):
+    assert http_client.get('http://caido.test/', reintentos=2) is None
+    assert sesion.peticiones == 3
+    assert http_client.obtener_circuito('caido.test').consecutivos == 1
+
+
+def test_circuito_abre_tras_peticiones_fallidas(sesion):
+    circuito = http_client.obtener_circuito('caido.test')
+    for _ in range(circuito.fallos - 1):
+        http_client.get('http://caido.test/', reintentos=2)
+    assert circuito.abierto_desde is None
+
+    http_client.get('http://caido.test/', reintentos=2)
+    assert circuito.abierto_desde is not None
+    peticiones = sesion.peticiones
+    assert http_client.get('http://caido.test/') is None
+    assert sesion.peticiones == peticiones
+
+
+def test_prueba_fallida_reabre_el_circuito(sesion):
+    circuito = http_client.obtener_circuito('caido.test')
+    circuito.espera = 0
+    for _ in range(circuito.fallos):
+        http_client.get('http://caido.test/', reintentos=0)
+    # La petición de prueba falla y sus reintentos se rechazan: el circuito vuelve a abrirse
+    http_client.get('http://caido.test/', reintentos=2)
+    assert circuito.abierto_desde is not None
+    assert not circuito.en_prueba
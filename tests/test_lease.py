@@ -0,0 +1,96 @@
+#-------------------------------------------------------------------------------
+# Name:         test_lease
+# Purpose:      Pruebas de la exclusión entre ejecuciones de un pipeline (leases,
+#               vencimiento y políticas 'omitir' y 'agrupar').
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import socket
+import json
+import time
+import os
+import pytest
+import lease
+
+
+@pytest.fixture(autouse=True)
+def carpeta(tmp_path, ajustes, monkeypatch):
+    monkeypatch.setenv('LEASE_DIR', str(tmp_path))
+    monkeypatch.setenv('LEASE_TTL_SEGUNDOS', '120')
+    return tmp_path
+
+
+def escribir_lease(ruta, **datos):
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(dict({'token': 'otro', 'host': socket.gethostname(), 'pid': os.getpid(),
+                        'espacio': None, 'renovado': time.time()}, **datos), archivo)
+
+
+def test_adquirir_exclusivo_y_liberar():
+    primero = lease.Lease('prueba')
+    segundo = lease.Lease('prueba')
+    assert primero.adquirir()
+    try:
+        assert not segundo.adquirir()
+    finally:
+        primero.liberar()
+    assert not os.path.exists(primero.ruta)
+    assert segundo.adquirir()
+    segundo.liberar()
+
+
+def test_liberar_no_elimina_lease_ajeno():
+    actual = lease.Lease('prueba')
+    assert actual.adquirir()
+    escribir_lease(actual.ruta)
+    assert not actual.renovar()
+    assert actual.perdido
+    actual.liberar()
+    assert os.path.exists(actual.ruta)
+
+
+def test_vencido(carpeta):
+    ruta = str(carpeta / 'prueba.lease')
+    assert not lease.vencido(ruta, {'renovado': time.time(), 'host': socket.gethostname(), 'pid': os.getpid()})
+    assert lease.vencido(ruta, {'renovado': time.time() - 1000, 'host': socket.gethostname(), 'pid': os.getpid()})
+    # Lease a medio escribir y sin archivo
+    assert lease.vencido(ruta, {})
+
+
+def test_toma_lease_vencido():
+    nuevo = lease.Lease('prueba')
+    escribir_lease(nuevo.ruta, renovado=time.time() - 1000)
+    assert nuevo.adquirir()
+    with open(nuevo.ruta, encoding='utf-8') as archivo:
+        assert json.load(archivo)['token'] == nuevo.token
+    nuevo.liberar()
+
+
+def test_politica_omitir():
+    ejecuciones = []
+
+    def funcion():
+        ejecuciones.append(1)
+        assert lease.ejecutar('prueba', lambda: ejecuciones.append(2), 'omitir') == 0
+
+    assert lease.ejecutar('prueba', funcion, 'omitir') == 1
+    assert ejecuciones == [1]
+
+
+def test_politica_agrupar():
+    ejecuciones = []
+
+    def funcion():
+        ejecuciones.append(1)
+        if len(ejecuciones) == 1:
+            # Dos solicitudes durante la ejecución se agrupan en una sola re-ejecución
+            assert lease.ejecutar('prueba', funcion, 'agrupar') == 0
+            assert lease.ejecutar('prueba', funcion, 'agrupar') == 0
+
+    assert lease.ejecutar('prueba', funcion, 'agrupar') == 2
+    assert ejecuciones == [1, 1]
+    assert not os.path.exists(lease.Lease('prueba').ruta_pendiente)
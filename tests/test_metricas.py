@@ -0,0 +1,19 @@
+#-------------------------------------------------------------------------------
+# Name:         test_metricas
+# Purpose:      Pruebas del escape de etiquetas en el formato de exposición.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import pytest
+import metricas
+
+
+@pytest.mark.parametrize('valor', ['simple', 'con "comillas"', 'ruta\\windows', 'dos\nlíneas', '\\n literal'])
+def test_escape_de_etiquetas(valor):
+    escapado = metricas._escapar(valor)
+    assert '\n' not in escapado
+    assert metricas._desescapar(escapado) == valor
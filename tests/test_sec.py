@@ -0,0 +1,93 @@
+#-------------------------------------------------------------------------------
+# Name:         test_sec
+# Purpose:      Pruebas de la agrupación de clientes afectados de la SEC y el índice
+#               de nombres de comunas.
+#
+# Author:       Fredys Barrera Artiaga <fbarrera@esri.cl>
+# Created:      19-10-2026
+# Copyright:    (c) fbarrera 2020
+# Licence:      <your licence>
+#-------------------------------------------------------------------------------
+
+import pytest
+import sec
+
+COMUNAS = [(1, 'Santiago', 'SANTIAGO'), (2, 'Ñuñoa', 'NUNOA'), (3, 'Padre Las Casas', None)]
+
+
+def registro(comuna, clientes):
+    return {'NOMBRE_COMUNA': comuna, 'CLIENTES_AFECTADOS': clientes}
+
+
+def test_agrupar_por_comuna():
+    registros = [registro('A', 10), registro('B', 5), registro('A', 7)]
+    assert sec.agrupar_por_comuna(registros) == {'A': 17, 'B': 5}
+
+
+def test_normalizar_comuna():
+    assert sec.normalizar_comuna('  Ñuñoa ') == 'NUNOA'
+    assert sec.normalizar_comuna('Padre  Las-Casas') == 'PADRE LAS CASAS'
+    assert sec.normalizar_comuna(None) == ''
+
+
+@pytest.mark.parametrize('actual, nuevo, esperado', [
+    ((10, 1.0, 'f'), (10, 1.0), False),
+    ((10, 1.0, 'f'), (11, 1.1), True),
+    ((10, 1.0, 'f'), (10, 1.5), True),
+    ((10, None, 'f'), (10, 1.0), True),
+    ((0, 0.0, None), (0, 0.0), False),
+    # Comuna sin afectados que conserva la fecha de un corte anterior
+    ((0, 0.0, 'f'), (0, 0.0), True),
+])
+def test_cambio_afectados(actual, nuevo, esperado):
+    assert sec.cambio_afectados(*(actual + nuevo)) is esperado
+
+
+def test_firma_comunas_ignora_nom_sec_y_orden():
+    firma = sec.firma_comunas(COMUNAS)
+    assert sec.firma_comunas(list(reversed(COMUNAS))) == firma
+    assert sec.firma_comunas([(c[0], c[1], 'OTRO') for c in COMUNAS]) == firma
+    assert sec.firma_comunas(COMUNAS[:2]) != firma
+
+
+def test_indice_resuelve_y_agrupa(ajustes, monkeypatch):
+    monkeypatch.setenv('SEC_FUZZY_CORTE', '0.88')
+    indice = sec.IndiceComunas(COMUNAS)
+    assert indice.resolver('SANTIAGO') == 1
+    assert indice.resolver('ñuñoa') == 2
+    # Por similitud
+    assert indice.resolver('PADRE LAS CASA') == 3
+    assert indice.resolver('NO EXISTE') is None
+
+    afectados, nombres, no_resueltos = indice.agrupar(
+        [registro('SANTIAGO', 10), registro('Santiago', 5), registro('NUNOA', 3), registro('NO EXISTE', 1)])
+    assert afectados == {1: 15, 2: 3}
+    assert nombres[2] == 'NUNOA'
+    assert no_resueltos == ['NO EXISTE']
+
+
+def test_agrupar_no_entrega_nombres_por_similitud(ajustes, monkeypatch):
+    monkeypatch.setenv('SEC_FUZZY_CORTE', '0.88')
+    indice = sec.IndiceComunas(COMUNAS)
+    afectados, nombres, no_resueltos = indice.agrupar([registro('PADRE LAS CASA', 4), registro('Santiago', 2)])
+    assert afectados == {3: 4, 1: 2}
+    # La asociación aproximada queda solo en el índice, no se escribe en NOM_SEC
+    assert 3 not in nombres
+    assert nombres[1] == 'Santiago'
+    assert indice.aproximado('PADRE LAS CASA')
+    assert not indice.aproximado('SANTIAGO')
+
+
+def test_indice_guardar_y_cargar(tmp_path, ajustes, monkeypatch):
+    monkeypatch.setenv('SEC_ALIAS_COMUNAS', '')
+    archivo = str(tmp_path / 'sec_comunas.json')
+    indice = sec.IndiceComunas(COMUNAS)
+    indice.resolver('PADRE LAS CASA')
+    indice.guardar(archivo)
+    assert not indice.modificado
+
+    cargado = sec.IndiceComunas.cargar(archivo)
+    assert cargado.firma == indice.firma
+    assert cargado.resolver('ÑUÑOA') == 2
+    assert cargado.resueltos == indice.resueltos
+    assert sec.IndiceComunas.cargar(str(tmp_path / 'no_existe.json')) is None
@@ -8,41 +8,40 @@
 # Licence:      <your licence>
 #-------------------------------------------------------------------------------
 
-import arcpy
-import envia_email as email
-from bs4 import BeautifulSoup
 from datetime import datetime
 import constants as const
+import diferido
+import logs
+import spans
+import http_client
+import conaf
+import lease
 import xml.etree.ElementTree as et
-import urllib.request as ur
-import requests
 import traceback
 import json
 import os
 
+# Módulos pesados o que dependen de utils: se importan en el primer uso
+arcpy = diferido.importar('arcpy')
+email = diferido.importar('envia_email')
+agromet = diferido.importar('agromet')
+catalogo_agromet = diferido.importar('catalogo_agromet')
+
 script_dir = os.path.dirname(__file__)
 
-# DATASET
-dataset = const.DATASET
-# Workspace
-arcpy.env.workspace = const.WORKSPACE
-# Folder local
-folder_local = const.WORKSPACE_LOCAL
-# Sobreescribo la misma capa de salida
-arcpy.env.overwriteOutput = True
-# Set the preserveGlobalIds environment to True
-arcpy.env.preserveGlobalIds = True
-# Buffer incendios temporal
-capa_buffer_incendios = const.BUFFER_INCENDIOS
-# Capa estaciones meteorológicas
-capa_estaciones_meteorologicas = const.ESTACIONES_METEOROLOGICAS
-# Prefijo del nombre de los datos
-USER_DATOS = const.USER_DATOS
+# El entorno de arcpy (workspace, overwriteOutput, preserveGlobalIds) lo configura cada
+# pipeline en configurar_entorno(); la configuración se lee desde const.ajustes al usarse.
 
+@spans.medido('descarga_kml')
 def get_data_kml(url):
     """Obtiene la data desde el servicio de Conaf (KML)."""
     try:
-        data = et.ElementTree(file=ur.urlopen(url))
+        response = http_client.get(url)
+        if response is None:
+            raise IOError("No se pudo obtener el KML de Conaf")
+        contenido = response.content
+        spans.anotar(bytes=len(contenido))
+        data = et.ElementTree(et.fromstring(contenido))
         return data
     except:
         print("Failed get_data_kml (%s)" %
@@ -54,8 +53,8 @@ def get_data_kml(url):
 def post_request_json_raw_data(url, raw_data):
     """Realiza una peticion http de tipo POST con raw_data en formato json."""
     try:
-        response = requests.post(url, json=raw_data)
-        if response.status_code == 200:
+        response = http_client.post(url, json=raw_data)
+        if response is not None:
             data = response.json()
             return data
         return False
@@ -66,35 +65,20 @@ def post_request_json_raw_data(url, raw_data):
                         traceback.format_exc())
 
 
+@spans.medido('scraping_iframe')
 def get_data_iframe(id_incendio):
     """Retorna el detalle de un incendio desde el iframe."""
     try:
         arcpy.AddMessage("Obteniendo data iframe de incendio_id: " + id_incendio)
 
         # open iframe src url
-        response = ur.urlopen('http://sidco.conaf.cl/mapa/popup.php?id=' + id_incendio + '&key=mEiNnE2k18')
-
-        iframe_soup = BeautifulSoup(response, "html.parser")
-
-        # Busco sonbre el div dentro del iframe que contiene la información adicional del incendio.
-        entradas = iframe_soup.find_all('div', {'id': 'tabla-ficha-' + id_incendio + '_div'})
-
-        data = []
-
-        for entrada in entradas:
-            # fecha y hora de inicio del incendio
-            data.append(entrada.find(
-                'span', {'class': 'incendio-fecha'}).getText())
-            # comuna del incendio
-            data.append(entrada.find(
-                'span', {'class': 'incendio-comuna'}).getText())
-            # superficie afectada
-            data.append(entrada.find(
-                'span', {'class': 'incendio-superficie'}).getText())
-            # Estado del incendio
-            data.append(entrada.find('strong').getText())
+        response = conaf.descargar_popup(id_incendio)
+        if response is None:
+            raise IOError("No se pudo obtener el detalle del incendio " + id_incendio)
+        spans.anotar(bytes=len(response))
 
-        return data
+        # Busco el div dentro del iframe que contiene la información adicional del incendio.
+        return conaf.leer_popup(response, id_incendio)
 
     except:
         print("Failed get_data_iframe (%s)" % traceback.format_exc())
@@ -115,7 +99,7 @@ def truncar_data_dataset(table):
     try:
         arcpy.AddMessage("Limpiando capa " + table + "...")
 
-        fc = os.path.join(arcpy.env.workspace, dataset, table)
+        fc = os.path.join(arcpy.env.workspace, const.DATASET, table)
 
         print('fc: ', fc)
 
@@ -134,9 +118,14 @@ def delete_temp_tables():
     """Elimina las tablas temporales creadas en el proceso."""
     try:
         tables = const.TABLES_SIGGRE
+        # Workspace temporal de la ejecución (si aún no se creó, no hay nada que eliminar)
+        folder_local = lease.espacio_trabajo(crear=False)
+        if folder_local is None:
+            return
+        capa_buffer_incendios = const.BUFFER_INCENDIOS
 
         for table in tables:
-            name = table.split(USER_DATOS)
+            name = table.split(const.USER_DATOS)
             # print('name: ', name)
             t = "cruce_" + name[1]
             # t = 'cruce_' + table
@@ -161,7 +150,38 @@ def delete_temp_tables():
                         traceback.format_exc())
 
 
-def enviar_correo_empresa(destinatario, id_incendio, comuna_incendio, superficie, instalaciones, nombre_incendio):
+def campos_faltantes(fc, campos):
+    """Retorna los campos [(campo, tipo)] que no existen en la capa (se agregan con migracion.py)."""
+    existentes = {f.name.lower() for f in arcpy.ListFields(fc)}
+    return [(campo, tipo) for campo, tipo in campos if campo.lower() not in existentes]
+
+
+def texto_meteo(meteo):
+    """Retorna el párrafo html con la estación meteorológica más cercana al incendio."""
+    if not meteo:
+        return ''
+    def valor(campo, formato='{0:.1f}'):
+        return formato.format(meteo[campo]) if meteo.get(campo) is not None else '-'
+    fecha = meteo.get('fecha_meteo')
+    return ('<p>Estación meteorológica más cercana: <b>{0}</b> ({1} km). '
+            'Dirección del viento: {2}°, velocidad media: {3}, temperatura media: {4} °C, '
+            'humedad media: {5} %. Actualizado: {6}.</p>').format(
+                meteo.get('estacion_meteo') or meteo.get('id_estacion_meteo'),
+                valor('distancia_estacion_km'),
+                valor('direccion_viento', '{0:.0f}'),
+                valor('velocidad_viento_media'),
+                valor('temperatura_media'),
+                valor('humedad_media', '{0:.0f}'),
+                fecha.strftime("%Y-%m-%d %H:%M") if fecha is not None else '-')
+
+
+def texto_distancia(instalacion):
+    """Distancia (m) de la instalación al incendio para las alertas, o '-' si no se calculó."""
+    distancia = instalacion.get('near_dist')
+    return str(int(distancia)) if distancia is not None else '-'
+
+
+def enviar_correo_empresa(destinatario, id_incendio, comuna_incendio, superficie, instalaciones, nombre_incendio, meteo=None):
     """Envía correo electrónico a la empresa afectada."""
     try:
         hora_reporte = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -173,7 +193,7 @@ def enviar_correo_empresa(destinatario, id_incendio, comuna_incendio, superficie
         texto_instalaciones += '<td>Tipo Infraestructura</td>'
         texto_instalaciones += '<td>Nombre Infraestructura</td>'
         texto_instalaciones += '<td>Empresa</td>'
-        # texto_instalaciones += '<td>Distancia Infraestructura hacia el foco de incendio(m)</td>'
+        texto_instalaciones += '<td>Distancia Infraestructura hacia el foco de incendio(m)</td>'
         texto_instalaciones += '<td>Hora del reporte</td>'
         texto_instalaciones += '</tr></thead>'
         texto_instalaciones += '<tbody>'
@@ -186,11 +206,12 @@ def enviar_correo_empresa(destinatario, id_incendio, comuna_incendio, superficie
             texto_instalaciones += '<td>' + instalacion['capa'] + '</td>'
             texto_instalaciones += '<td>' + instalacion['nombre'] + '</td>'
             texto_instalaciones += '<td>' + instalacion['propietario'] + '</td>'
-            # texto_instalaciones += '<td>' + str(int(instalacion['near_dist'])) + '</td>'
+            texto_instalaciones += '<td>' + texto_distancia(instalacion) + '</td>'
             texto_instalaciones += '<td>' + hora_reporte + '</td>'
             texto_instalaciones += '</tr>'
         texto_instalaciones += '</tbody>'
         texto_instalaciones += '</table>'
+        texto_instalaciones += texto_meteo(meteo)
 
         subject = "[Empresa] - Incendio " + nombre_incendio + ", " + comuna_incendio
 
@@ -202,7 +223,7 @@ def enviar_correo_empresa(destinatario, id_incendio, comuna_incendio, superficie
                         traceback.format_exc())
 
 
-def enviar_correo_admin(id_incendio, comuna_incendio, superficie, instalaciones, nombre_incendio):
+def enviar_correo_admin(id_incendio, comuna_incendio, superficie, instalaciones, nombre_incendio, meteo=None):
     """Envía correo electrónico al ministerio de energía."""
     try:
         hora_reporte = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -214,7 +235,7 @@ def enviar_correo_admin(id_incendio, comuna_incendio, superficie, instalaciones,
         texto_instalaciones += '<td>Tipo Infraestructura</td>'
         texto_instalaciones += '<td>Nombre Infraestructura</td>'
         texto_instalaciones += '<td>Empresa</td>'
-        # texto_instalaciones += '<td>Distancia Infraestructura hacia el foco de incendio(m)</td>'
+        texto_instalaciones += '<td>Distancia Infraestructura hacia el foco de incendio(m)</td>'
         texto_instalaciones += '<td>Hora del reporte</td>'
         texto_instalaciones += '</tr></thead>'
         texto_instalaciones += '<tbody>'
@@ -227,11 +248,12 @@ def enviar_correo_admin(id_incendio, comuna_incendio, superficie, instalaciones,
             texto_instalaciones += '<td>' + instalacion['capa'] + '</td>'
             texto_instalaciones += '<td>' + instalacion['nombre'] + '</td>'
             texto_instalaciones += '<td>' + instalacion['propietario'] + '</td>'
-            # texto_instalaciones += '<td>' + str(int(instalacion['near_dist'])) + '</td>'
+            texto_instalaciones += '<td>' + texto_distancia(instalacion) + '</td>'
             texto_instalaciones += '<td>' + hora_reporte + '</td>'
             texto_instalaciones += '</tr>'
         texto_instalaciones += '</tbody>'
         texto_instalaciones += '</table>'
+        texto_instalaciones += texto_meteo(meteo)
 
         subject = "[Admin] - Incendio " + nombre_incendio + ", " + comuna_incendio
 
@@ -280,58 +302,42 @@ def convert_seconds(seconds):
 
 
 def actualizar_agromet():
-    """Actualiza la variable de la direccion del viento de cada estacion meteorológica."""
+    """
+    Refresca el catálogo de variables de todas las estaciones meteorológicas
+    y copia los ids de las variables en la capa de estaciones.
+    """
     try:
         # Obtengo las estaciones meteorológicas
-        fc = os.path.join(arcpy.env.workspace, dataset, capa_estaciones_meteorologicas)
+        fc = os.path.join(arcpy.env.workspace, const.DATASET, const.ESTACIONES_METEOROLOGICAS)
         estaciones = []
-        datos = []
 
         with arcpy.da.SearchCursor(fc, ['id', 'nombre']) as cursor:
             for row in cursor:
                 estaciones.append(row[0])
         del cursor
 
-        # id_direccion_viento
-        # id_humedad_media
-        # id_temperatura_media
-        # id_velocidad_viento_max
-        # id_velocidad_viento_media
-
-        # Hago el llamado a la api por cada estacion para consultar el id de la variable de la direccion del viento
-        for id_estacion in estaciones:
-            url = 'http://agromet.inia.cl/api/variables?ema=' + str(id_estacion) + '&user=9532d75b835b8074ff3407fd701bd9ba1e8d292d'
-            response = requests.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                id_direccion_viento = data['variables'][0]['idEmaVariable']
-                id_humedad_media = data['variables'][1]['idEmaVariable']
-                id_temperatura_media = data['variables'][2]['idEmaVariable']
-                id_velocidad_viento_max = data['variables'][3]['idEmaVariable']
-                id_velocidad_viento_media = data['variables'][4]['idEmaVariable']
-                datos.append({
-                    "id_estacion": int(id_estacion),
-                    "id_direccion_viento": int(id_direccion_viento),
-                    "id_humedad_media": int(id_humedad_media),
-                    "id_temperatura_media": int(id_temperatura_media),
-                    "id_velocidad_viento_max": int(id_velocidad_viento_max),
-                    "id_velocidad_viento_media": int(id_velocidad_viento_media)
-                })
-
-        # # Por cada estacion, actualizo las variables
-        for k in datos:
-            with arcpy.da.UpdateCursor(fc, ['id', 'id_direccion_viento', 'id_humedad_media', 'id_temperatura_media', 'id_velocidad_viento_max', 'id_velocidad_viento_media']) as cursor:
-                for row in cursor:
-                    if row[0] == k['id_estacion']:
-                        row[1] = k['id_direccion_viento']
-                        row[2] = k['id_humedad_media']
-                        row[3] = k['id_temperatura_media']
-                        row[4] = k['id_velocidad_viento_max']
-                        row[5] = k['id_velocidad_viento_media']
-                        print('Se actualiza estacion: {0} con id_direccion_viento: {1}'.format(
-                            k['id_estacion'], k['id_direccion_viento']))
+        # Consulto en paralelo las variables de todas las estaciones y actualizo el catalogo
+        cambios = catalogo_agromet.refrescar(estaciones)
+        log("Catálogo de variables Agromet refrescado, estaciones con cambios: {0}".format(cambios))
+        variables = catalogo_agromet.obtener_variables(estaciones)
+
+        campos = ['id_' + variable for variable in agromet.VARIABLES]
+
+        # En una sola pasada, actualizo solo las estaciones cuyas variables cambiaron
+        actualizadas = 0
+        with arcpy.da.UpdateCursor(fc, ['id'] + campos) as cursor:
+            for row in cursor:
+                ids = variables.get(row[0])
+                if ids is None:
+                    continue
+                k = {'id_' + variable: id_variable for variable, id_variable in ids.items()}
+                if agromet.aplicar_cambios(row, k, campos):
+                    print('Se actualiza estacion: {0} con id_direccion_viento: {1}'.format(
+                        row[0], k.get('id_direccion_viento')))
                     cursor.updateRow(row)
-            del cursor
+                    actualizadas += 1
+        del cursor
+        log("Estaciones con ids de variables actualizados: {0}".format(actualizadas))
 
     except:
         print("Failed actualizar_agromet (%s)" % traceback.format_exc())
@@ -339,31 +345,19 @@ def actualizar_agromet():
                         traceback.format_exc())
 
 
-def log(text):
+def log(text, datos=None):
     """Registra un log de proceso. """
     try:
-        log_file = os.path.join(script_dir, 'log.txt')
-        f = open(log_file, "a", encoding='utf-8')
-        f.write(
-            "{0} -- {1}\n".format(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), text))
-        f.close()
+        logs.obtener_logger().info(text, extra={'datos': datos})
     except:
         print("Failed log (%s)" %
               traceback.format_exc())
-        error_log("Failed send (%s)" %
-                        traceback.format_exc())
 
 
-def error_log(text):
+def error_log(text, datos=None):
     """Registra un log de error. """
     try:
-        log_file = os.path.join(script_dir, 'error-log.txt')
-        f = open(log_file, "a")
-        f.write(
-            "{0} -- {1}\n".format(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), text))
-        f.write("---------------------------------------------------------------- \n")
-        f.close()
+        logs.obtener_logger().error(text, extra={'datos': datos})
     except:
         print("Failed error_log (%s)" %
               traceback.format_exc())
-              
\ No newline at end of file